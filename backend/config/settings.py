@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.data_version.DataVersionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,7 +83,8 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Spawned ingestion workers read their rows through this path too
+        'NAME': os.getenv('DATABASE_PATH', str(BASE_DIR / 'db.sqlite3')),
     }
 }
 
@@ -143,3 +147,106 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ]
 }
+
+
+# AI / vector search settings
+
+# Sentence-transformers model used for both ingestion and query embeddings
+# ("stub" = offline feature-hashing model, see core/embeddings.py)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Persistent document-embedding cache used by ingest_vectors ("" disables it)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", str(BASE_DIR / ".embedding_cache"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2000000"))
+
+# Vector store backend and its options. Mongo options apply to
+# core.mongo.MongoVectorStore, PATH to core.local_store.LocalVectorStore.
+VECTOR_STORE = {
+    "BACKEND": os.getenv("VECTOR_STORE_BACKEND", "core.mongo.MongoVectorStore"),
+    "OPTIONS": {
+        "URI": os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+        "DATABASE": os.getenv("MONGO_DATABASE", "bloodbank_ai"),
+        "COLLECTION": "vectors",
+        "MAX_POOL_SIZE": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        "SERVER_SELECTION_TIMEOUT_MS": int(os.getenv("MONGO_TIMEOUT_MS", "5000")),
+        "CONNECT_TIMEOUT_MS": int(os.getenv("MONGO_TIMEOUT_MS", "5000")),
+        "PATH": os.getenv("VECTOR_STORE_PATH", str(BASE_DIR / "vectors.sqlite3")),
+    },
+}
+
+# PCA projection written by fit_projection and applied by ingest_vectors
+VECTOR_PROJECTION_PATH = os.getenv("VECTOR_PROJECTION_PATH", str(BASE_DIR / "projection.npz"))
+
+# Split vector scoring across N long-lived worker processes (0 or 1 = in-process)
+VECTOR_SEARCH_SHARDS = int(os.getenv("VECTOR_SEARCH_SHARDS", "0"))
+
+# Seconds a sharded in-memory vector snapshot is served before reloading
+VECTOR_SNAPSHOT_MAX_AGE = int(os.getenv("VECTOR_SNAPSHOT_MAX_AGE", "60"))
+
+# Reuse vector_search results for near-duplicate queries with the same structured plan
+SEMANTIC_QUERY_CACHE = {
+    "ENABLED": os.getenv("SEMANTIC_QUERY_CACHE", "1") == "1",
+    "MAX_ENTRIES": int(os.getenv("SEMANTIC_QUERY_CACHE_ENTRIES", "512")),
+    "THRESHOLD": float(os.getenv("SEMANTIC_QUERY_CACHE_THRESHOLD", "0.95")),
+}
+
+# Opt-in cProfile of API requests: signed X-Profile header or random sampling
+PROFILING = {
+    "ENABLED": os.getenv("PROFILING_ENABLED", "0") == "1",
+    "DIR": os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles")),
+    "SAMPLE_RATE": float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+    "PATHS": ("/api/",),
+    "TOKEN_MAX_AGE": int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600")),
+}
+
+# Sampled JSONL log of AI searches for `replay_queries` (size-rotated)
+QUERY_LOG = {
+    "ENABLED": os.getenv("QUERY_LOG_ENABLED", "0") == "1",
+    "PATH": os.getenv("QUERY_LOG_PATH", str(BASE_DIR / "logs" / "ai_queries.jsonl")),
+    "SAMPLE_RATE": float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0")),
+    "MAX_BYTES": int(os.getenv("QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    "BACKUP_COUNT": int(os.getenv("QUERY_LOG_BACKUP_COUNT", "5")),
+}
+
+# Seconds a count / sum / group-by answer from AI search is cached
+AI_AGGREGATE_CACHE_TTL = int(os.getenv("AI_AGGREGATE_CACHE_TTL", "30"))
+
+# Django cache (aggregate answers, AI search cursors). The default is
+# per-process; with several workers (serve_ai) use a shared backend,
+# e.g. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Paged AI search: ranked results kept server-side under a cursor token
+AI_SEARCH_CURSOR = {
+    "TTL": int(os.getenv("AI_SEARCH_CURSOR_TTL", "300")),
+    "MAX_RESULTS": int(os.getenv("AI_SEARCH_CURSOR_MAX_RESULTS", "200")),
+    "MAX_PAGE_SIZE": int(os.getenv("AI_SEARCH_CURSOR_MAX_PAGE_SIZE", "100")),
+}
+
+# Admission control for AI search (per process): concurrent searches,
+# queue length and wait, per-search deadline in seconds, and searches
+# one client may hold at once (0 = unlimited)
+AI_ADMISSION = {
+    "ENABLED": os.getenv("AI_ADMISSION_ENABLED", "1") == "1",
+    "MAX_CONCURRENT": int(os.getenv("AI_ADMISSION_MAX_CONCURRENT", str(os.cpu_count() or 4))),
+    "MAX_QUEUE": int(os.getenv("AI_ADMISSION_MAX_QUEUE", "8")),
+    "QUEUE_TIMEOUT": float(os.getenv("AI_ADMISSION_QUEUE_TIMEOUT", "0.5")),
+    "DEADLINE": float(os.getenv("AI_ADMISSION_DEADLINE", "5.0")),
+    "PER_CLIENT": int(os.getenv("AI_ADMISSION_PER_CLIENT", "0")),
+}
+
+# Cross-worker invalidation: every write is logged in the DataChange
+# table and each worker applies new changes to its indexes before API
+# requests, reading the version at most once per CHECK_INTERVAL seconds
+DATA_VERSION = {
+    "ENABLED": os.getenv("DATA_VERSION_ENABLED", "1") == "1",
+    "CHECK_INTERVAL": float(os.getenv("DATA_VERSION_CHECK_INTERVAL", "1.0")),
+    "MAX_DELTA": int(os.getenv("DATA_VERSION_MAX_DELTA", "2000")),
+    "RETENTION_HOURS": float(os.getenv("DATA_VERSION_RETENTION_HOURS", "24")),
+    "PATHS": ("/api/",),
+}
@@ -0,0 +1,286 @@
+# core/admission.py
+"""
+Admission control and deadline-aware load shedding for AI search.
+
+AI searches are CPU-bound (embedding + vector scan). Without a limit a
+burst makes every in-flight search slower until all of them time out
+together, and CRUD requests on the same workers wait behind them.
+The controller bounds them per process:
+- at most MAX_CONCURRENT searches run; up to MAX_QUEUE more wait, each
+  for at most QUEUE_TIMEOUT seconds
+- a full queue, or a wait that runs out, is answered at once with 503
+  and a Retry-After estimated from recent service times
+- a client already holding PER_CLIENT slots / queue places gets 429
+- every admitted search carries a deadline (DEADLINE seconds from
+  arrival, or from the proxy's X-Request-Start when present) that is
+  checked between pipeline stages; a search past it stops with 503
+  instead of finishing an answer nobody is waiting for
+
+Counters for admitted, rejected and expired searches are served by
+GET /api/ai/stats/. With threaded servers keep MAX_CONCURRENT below the
+thread count so CRUD requests always find a free thread.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Weight of the newest sample in the service-time moving average
+EWMA_ALPHA = 0.2
+
+# Bounds of the Retry-After hint, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 30
+
+
+class Overloaded(Exception):
+    """
+    A search refused or abandoned to shed load; maps to an HTTP response.
+    """
+
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Overloaded):
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(503, "deadline_exceeded", retry_after)
+        self.stage = stage
+
+
+class Ticket:
+    """
+    An admitted search: its deadline and client, checked between stages.
+    """
+
+    def __init__(self, controller, client, deadline: float, admitted_at: float):
+        self.controller = controller
+        self.client = client
+        self.deadline = deadline
+        self.admitted_at = admitted_at
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def check(self, stage: str):
+        """
+        Raise DeadlineExceeded if the deadline has passed before `stage`.
+        """
+        if time.monotonic() > self.deadline:
+            self.controller._expired(stage)
+            raise DeadlineExceeded(stage, self.controller.retry_after())
+
+
+def request_arrival(header, now_wall=None, now=None):
+    """
+    Monotonic arrival time from an X-Request-Start header ("t=<epoch>" or
+    a bare epoch in s / ms / µs, as set by nginx, Heroku and others), or
+    None when absent or implausible.
+    """
+    if not header:
+        return None
+    try:
+        value = float(str(header).strip().removeprefix("t="))
+    except ValueError:
+        return None
+    # Normalise ms / µs epochs to seconds
+    while value > 1e11:
+        value /= 1000
+    now_wall = time.time() if now_wall is None else now_wall
+    now = time.monotonic() if now is None else now
+    waited = now_wall - value
+    # Clock skew guard: ignore future stamps and stamps over an hour old
+    if not 0 <= waited <= 3600:
+        return None
+    return now - waited
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        max_queue: int = 8,
+        queue_timeout: float = 0.5,
+        deadline: float = 5.0,
+        per_client: int = 0,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.per_client = per_client
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._clients = {}  # client -> admitted + waiting searches
+        self._service_s = None  # moving average of admitted search time
+        self.counters = {
+            "admitted": 0,
+            "completed": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_client_limit": 0,
+        }
+        self.expired = {}  # stage -> searches past their deadline there
+        self.max_waiting_seen = 0
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a retry is likely to be admitted: the queue ahead
+        drained at the recent service rate.
+        """
+        service = self._service_s if self._service_s is not None else 0.1
+        seconds = service * (self._waiting + 1) / self.max_concurrent
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+    def _expired(self, stage: str):
+        with self._cond:
+            self.expired[stage] = self.expired.get(stage, 0) + 1
+
+    def _leave(self, client):
+        count = self._clients.get(client, 0) - 1
+        if count > 0:
+            self._clients[client] = count
+        else:
+            self._clients.pop(client, None)
+
+    def acquire(self, client=None, arrived=None) -> Ticket:
+        """
+        Admit one search or raise Overloaded. `arrived` is the monotonic
+        time the request reached the server (default now).
+        """
+        now = time.monotonic()
+        deadline = (now if arrived is None else arrived) + self.deadline
+        with self._cond:
+            if now >= deadline:
+                self.expired["queue"] = self.expired.get("queue", 0) + 1
+                raise DeadlineExceeded("queue", self.retry_after())
+            if self.per_client and self._clients.get(client, 0) >= self.per_client:
+                self.counters["rejected_client_limit"] += 1
+                raise Overloaded(429, "client_limit", self.retry_after())
+
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.counters["rejected_queue_full"] += 1
+                    raise Overloaded(503, "queue_full", self.retry_after())
+                self.counters["queued"] += 1
+                self._clients[client] = self._clients.get(client, 0) + 1
+                self._waiting += 1
+                self.max_waiting_seen = max(self.max_waiting_seen, self._waiting)
+                wait_until = min(now + self.queue_timeout, deadline)
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = wait_until - time.monotonic()
+                        if remaining <= 0:
+                            self._leave(client)
+                            self.counters["rejected_queue_timeout"] += 1
+                            raise Overloaded(503, "queue_timeout", self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            else:
+                self._clients[client] = self._clients.get(client, 0) + 1
+
+            self._active += 1
+            self.counters["admitted"] += 1
+        return Ticket(self, client, deadline, time.monotonic())
+
+    def release(self, ticket: Ticket):
+        elapsed = time.monotonic() - ticket.admitted_at
+        with self._cond:
+            self._active -= 1
+            self._leave(ticket.client)
+            self.counters["completed"] += 1
+            if self._service_s is None:
+                self._service_s = elapsed
+            else:
+                self._service_s += EWMA_ALPHA * (elapsed - self._service_s)
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, client=None, arrived=None):
+        ticket = self.acquire(client, arrived)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_waiting_seen": self.max_waiting_seen,
+                **self.counters,
+                "expired": dict(self.expired),
+                "mean_service_ms": (
+                    round(self._service_s * 1000, 2) if self._service_s is not None else None
+                ),
+                "retry_after": self.retry_after(),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """
+    Process-wide controller, or None when disabled in settings.
+    """
+    global _controller
+    config = settings.AI_ADMISSION
+    if not config.get("ENABLED", True):
+        return None
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    max_concurrent=config.get("MAX_CONCURRENT", 4),
+                    max_queue=config.get("MAX_QUEUE", 8),
+                    queue_timeout=config.get("QUEUE_TIMEOUT", 0.5),
+                    deadline=config.get("DEADLINE", 5.0),
+                    per_client=config.get("PER_CLIENT", 0),
+                )
+    return _controller
+
+
+def reset_admission_controller():
+    """
+    Drop the controller (and its counters); the next use rebuilds it.
+    """
+    global _controller
+    with _controller_lock:
+        _controller = None
+
+
+@receiver(setting_changed)
+def _admission_setting_changed(sender, setting, **kwargs):
+    if setting == "AI_ADMISSION":
+        reset_admission_controller()
+
+
+@contextmanager
+def admitted(request):
+    """
+    Run an AI search under the process-wide controller; yields the
+    Ticket (None when admission control is disabled).
+    """
+    controller = get_admission_controller()
+    if controller is None:
+        yield None
+        return
+    arrived = request_arrival(request.META.get("HTTP_X_REQUEST_START"))
+    with controller.admit(request.META.get("REMOTE_ADDR"), arrived) as ticket:
+        yield ticket
@@ -0,0 +1,410 @@
+# core/allocation.py
+"""
+Batch allocation of eligible donors to every pending Request.
+
+Allocating one request at a time (greedy) hands scarce universal O-
+donors to whichever request comes first, leaving O- patients, who can
+receive nothing else, short. Here the whole queue is solved at once as
+a min-cost max-flow over buckets instead of individual records:
+- donors are bucketed by (blood group, city), requests by (blood
+  group, hospital city); with 8 groups the graph has a few nodes per
+  city whatever the number of donors and requests
+- the 8x8 compatibility matrix (from core/matching.py) is a numpy
+  boolean array; bucket supply and demand are `bincount`s
+- edges: donor bucket -> compatible request bucket in the same city,
+  and donor bucket -> per-group "transfer" node -> compatible request
+  bucket in any city (at CITY_COST), so cross-city edges grow with
+  cities x 64, not cities²
+- costs: 0 for an exact group, the donor group's reach (how many
+  recipient groups it serves; 8 for O-) for a substitute. The flow is
+  maximal first, so the plan fulfils as many units as possible, and
+  among those plans it conserves broad donor groups and stays local
+
+The bucket flow is then turned into donor ids: each bucket hands out
+its donors in eligibility order (longest-rested first) and each request
+bucket fills its requests oldest first, completing one request before
+starting the next. One donor gives one unit.
+"""
+
+import heapq
+import time
+from collections import deque
+
+import numpy as np
+
+from core.matching import BLOOD_GROUPS, COMPATIBILITY_MASK, DONOR_REACH, GROUP_BIT, normalize_city
+
+# Cost of sending a donor to another city; above every substitution
+# cost, so a local substitute is preferred to an exact match elsewhere
+CITY_COST = 10
+
+GROUP_INDEX = {bg: i for i, bg in enumerate(BLOOD_GROUPS)}
+
+# COMPATIBLE[d, r]: donor group d can give to recipient group r
+COMPATIBLE = np.array(
+    [[bool(COMPATIBILITY_MASK[r] & GROUP_BIT[d]) for r in BLOOD_GROUPS] for d in BLOOD_GROUPS]
+)
+
+# GROUP_COST[d, r]: cost of one unit from group d to group r
+GROUP_COST = np.where(
+    np.eye(len(BLOOD_GROUPS), dtype=bool),
+    0,
+    np.array([DONOR_REACH[d] for d in BLOOD_GROUPS])[:, None],
+)
+
+
+class MinCostFlow:
+    """
+    Min-cost max-flow by the primal-dual method: Dijkstra with node
+    potentials finds the current shortest-path cost, then a Dinic
+    blocking flow saturates every path of that cost at once. Bucket
+    graphs have small integer costs, so only a handful of phases run.
+    """
+
+    def __init__(self, nodes: int):
+        self.nodes = nodes
+        self.adj = [[] for _ in range(nodes)]
+        self.to, self.cap, self.cost = [], [], []
+        self.phases = 0
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> int:
+        """
+        Add u -> v and its residual twin; returns the edge index.
+        """
+        e = len(self.to)
+        self.to += [v, u]
+        self.cap += [cap, 0]
+        self.cost += [cost, -cost]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def flow(self, e: int) -> int:
+        return self.cap[e ^ 1]
+
+    def solve(self, source: int, sink: int):
+        """
+        Push the maximum flow at minimum cost; returns (flow, cost).
+        """
+        to, cap, cost, adj = self.to, self.cap, self.cost, self.adj
+        potential = [0] * self.nodes
+        total_flow = total_cost = 0
+        while True:
+            # Shortest reduced-cost distances over the residual graph
+            dist = [None] * self.nodes
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                for e in adj[u]:
+                    if cap[e] > 0:
+                        v = to[e]
+                        nd = d + cost[e] + potential[u] - potential[v]
+                        if dist[v] is None or nd < dist[v]:
+                            dist[v] = nd
+                            heapq.heappush(heap, (nd, v))
+            if dist[sink] is None:
+                break
+            # Capped update keeps every residual reduced cost >= 0
+            limit = dist[sink]
+            for v in range(self.nodes):
+                potential[v] += limit if dist[v] is None else min(dist[v], limit)
+            self.phases += 1
+
+            pushed = self._blocking_flows(source, sink, potential)
+            total_flow += pushed
+            total_cost += pushed * (potential[sink] - potential[source])
+        return total_flow, total_cost
+
+    def _blocking_flows(self, source, sink, potential) -> int:
+        """
+        Dinic max flow restricted to zero reduced-cost residual edges.
+        """
+        to, cap, cost, adj = self.to, self.cap, self.cost, self.adj
+
+        def admissible(u, e):
+            return cap[e] > 0 and cost[e] + potential[u] - potential[to[e]] == 0
+
+        pushed = 0
+        while True:
+            level = [-1] * self.nodes
+            level[source] = 0
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                for e in adj[u]:
+                    if level[to[e]] < 0 and admissible(u, e):
+                        level[to[e]] = level[u] + 1
+                        queue.append(to[e])
+            if level[sink] < 0:
+                return pushed
+            cursor = [0] * self.nodes
+
+            def augment(u, limit):
+                if u == sink:
+                    return limit
+                edges = adj[u]
+                while cursor[u] < len(edges):
+                    e = edges[cursor[u]]
+                    v = to[e]
+                    if level[v] == level[u] + 1 and admissible(u, e):
+                        sent = augment(v, min(limit, cap[e]))
+                        if sent:
+                            cap[e] -= sent
+                            cap[e ^ 1] += sent
+                            return sent
+                    cursor[u] += 1
+                return 0
+
+            while True:
+                sent = augment(source, float("inf"))
+                if not sent:
+                    break
+                pushed += sent
+
+
+class Allocation:
+    """
+    An allocation plan: `slot_donors[slot_requests == r]` are the donors
+    given to request r. `requested` / `allocated` are per-request unit
+    counts aligned with `request_ids` (the input order).
+    """
+
+    def __init__(self, request_ids, requested, allocated, slot_requests, slot_donors, stats):
+        self.request_ids = request_ids
+        self.requested = requested
+        self.allocated = allocated
+        self.slot_requests = slot_requests
+        self.slot_donors = slot_donors
+        self.stats = stats
+
+    def by_request(self) -> dict:
+        """
+        {request_id: [donor ids]} for requests given at least one donor.
+        """
+        plan = {}
+        for request_id, donor_id in zip(self.slot_requests.tolist(), self.slot_donors.tolist()):
+            plan.setdefault(request_id, []).append(donor_id)
+        return plan
+
+    def summary(self) -> dict:
+        return {
+            "requests": int(len(self.request_ids)),
+            "units_requested": int(self.requested.sum()),
+            "units_allocated": int(self.allocated.sum()),
+            "fully_met": int(np.count_nonzero(self.allocated == self.requested)),
+            "partially_met": int(
+                np.count_nonzero((self.allocated > 0) & (self.allocated < self.requested))
+            ),
+            "unmet": int(np.count_nonzero(self.allocated == 0)),
+            **self.stats,
+        }
+
+
+def _codes(values, vocabulary):
+    return np.fromiter((vocabulary[v] for v in values), dtype=np.int64, count=len(values))
+
+
+def allocate(requests, donors, cross_city: bool = True, city_cost: int = CITY_COST) -> Allocation:
+    """
+    Allocate donors to requests.
+
+    `requests`: (request_id, blood_group, city, units) in priority order
+    (oldest first). `donors`: (donor_id, blood_group, city) in the order
+    they should be used (longest-rested first). Cities are compared as
+    given; normalize them first. Unknown blood groups are ignored.
+    """
+    timings = {}
+    started = time.perf_counter()
+    groups = len(BLOOD_GROUPS)
+    requests = [r for r in requests if r[1] in GROUP_INDEX and r[3] > 0]
+    donors = [d for d in donors if d[1] in GROUP_INDEX]
+
+    names = sorted({r[2] for r in requests} | {d[2] for d in donors})
+    cities = {city: i for i, city in enumerate(names)}
+    n_cities = max(1, len(cities))
+
+    request_ids = np.fromiter((r[0] for r in requests), dtype=np.int64, count=len(requests))
+    requested = np.fromiter((r[3] for r in requests), dtype=np.int64, count=len(requests))
+    request_bucket = (
+        _codes([r[1] for r in requests], GROUP_INDEX) * n_cities
+        + _codes([r[2] for r in requests], cities)
+    )
+    donor_ids = np.fromiter((d[0] for d in donors), dtype=np.int64, count=len(donors))
+    donor_bucket = (
+        _codes([d[1] for d in donors], GROUP_INDEX) * n_cities
+        + _codes([d[2] for d in donors], cities)
+    )
+    supply = np.bincount(donor_bucket, minlength=groups * n_cities).reshape(groups, n_cities)
+    demand = np.bincount(request_bucket, weights=requested, minlength=groups * n_cities)
+    demand = demand.astype(np.int64).reshape(groups, n_cities)
+    timings["bucket"] = time.perf_counter() - started
+
+    # FLOW NETWORK
+    started = time.perf_counter()
+    buckets = groups * n_cities
+    source, sink = 2 * buckets + groups, 2 * buckets + groups + 1
+    graph = MinCostFlow(2 * buckets + groups + 2)
+
+    def donor_node(g, c):
+        return g * n_cities + c
+
+    def request_node(g, c):
+        return buckets + g * n_cities + c
+
+    def transfer_node(g):
+        return 2 * buckets + g
+
+    infinite = int(supply.sum())
+    local, transfer_in, transfer_out = [], [], []
+    for g, c in zip(*np.nonzero(demand)):
+        graph.add_edge(request_node(g, c), sink, int(demand[g, c]), 0)
+    for d, c in zip(*np.nonzero(supply)):
+        graph.add_edge(source, donor_node(d, c), int(supply[d, c]), 0)
+        # Vectorized: every compatible group with demand in this city
+        for r in np.flatnonzero(COMPATIBLE[d] & (demand[:, c] > 0)):
+            e = graph.add_edge(donor_node(d, c), request_node(r, c), infinite, int(GROUP_COST[d, r]))
+            local.append((d, c, r, c, e))
+        if cross_city:
+            e = graph.add_edge(donor_node(d, c), transfer_node(d), infinite, city_cost)
+            transfer_in.append((d, c, e))
+    if cross_city:
+        for d in np.flatnonzero(supply.sum(axis=1)):
+            for r, c in zip(*np.nonzero(COMPATIBLE[d][:, None] & (demand > 0))):
+                e = graph.add_edge(transfer_node(d), request_node(r, c), infinite, int(GROUP_COST[d, r]))
+                transfer_out.append((d, r, c, e))
+    timings["graph"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    units, cost = graph.solve(source, sink)
+    timings["solve"] = time.perf_counter() - started
+
+    # DONOR IDS
+    started = time.perf_counter()
+    # Units each (donor bucket -> request bucket) pair carries; the
+    # transfer node is split first-come between the cities feeding it
+    moves = [(d, c, r, rc, graph.flow(e)) for d, c, r, rc, e in local]
+    for d in range(groups):
+        inflow = deque([c, graph.flow(e)] for g, c, e in transfer_in if g == d and graph.flow(e))
+        for g, r, rc, e in transfer_out:
+            need = graph.flow(e) if g == d else 0
+            while need:
+                take = min(need, inflow[0][1])
+                moves.append((d, inflow[0][0], r, rc, take))
+                need -= take
+                inflow[0][1] -= take
+                if not inflow[0][1]:
+                    inflow.popleft()
+    # Exact and local matches are consumed first within each bucket
+    moves = [m for m in moves if m[4]]
+    moves.sort(key=lambda m: (m[0] != m[2], m[1] != m[3], m[0], m[1], m[2], m[3]))
+
+    donor_order = np.argsort(donor_bucket, kind="stable")
+    donor_start = np.concatenate(([0], np.cumsum(supply.ravel())))
+    taken = np.zeros(buckets, dtype=np.int64)
+    received = {}  # request bucket -> [donor id arrays]
+    for d, c, r, rc, count in moves:
+        b = donor_node(d, c)
+        lo = donor_start[b] + taken[b]
+        received.setdefault(r * n_cities + rc, []).append(donor_ids[donor_order[lo:lo + count]])
+        taken[b] += count
+
+    request_order = np.argsort(request_bucket, kind="stable")
+    request_start = np.concatenate(([0], np.cumsum(np.bincount(request_bucket, minlength=buckets))))
+    allocated = np.zeros(len(requests), dtype=np.int64)
+    slot_requests, slot_donors = [], []
+    for bucket, parts in received.items():
+        got = np.concatenate(parts)
+        members = request_order[request_start[bucket]:request_start[bucket + 1]]
+        # Oldest first, each request completed before the next one starts
+        before = np.concatenate(([0], np.cumsum(requested[members])[:-1]))
+        filled = np.clip(len(got) - before, 0, requested[members])
+        allocated[members] = filled
+        slot_requests.append(np.repeat(request_ids[members], filled))
+        slot_donors.append(got[:int(filled.sum())])
+    timings["assign"] = time.perf_counter() - started
+
+    stats = {
+        "donors": len(donors),
+        "cities": len(cities),
+        "cross_city": cross_city,
+        "units_cross_city": int(sum(m[4] for m in moves if m[1] != m[3])),
+        "units_substituted": int(sum(m[4] for m in moves if m[0] != m[2])),
+        "flow_cost": int(cost),
+        "graph": {"nodes": graph.nodes, "edges": len(graph.to) // 2, "phases": graph.phases},
+        "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+    }
+    empty = np.zeros(0, dtype=np.int64)
+    return Allocation(
+        request_ids,
+        requested,
+        allocated,
+        np.concatenate(slot_requests) if slot_requests else empty,
+        np.concatenate(slot_donors) if slot_donors else empty,
+        stats,
+    )
+
+
+def allocate_pending(when=None, cross_city: bool = True) -> Allocation:
+    """
+    Allocate donors eligible at `when` (default now, from the
+    eligibility index) to every pending Request, oldest first.
+    """
+    from core.eligibility import get_eligibility_index
+    from core.models import Request
+
+    started = time.perf_counter()
+    requests = [
+        (request_id, blood_group, normalize_city(location), units)
+        for request_id, blood_group, location, units in (
+            Request.objects.filter(status="pending")
+            .order_by("created_at", "id")
+            .values_list("id", "blood_group", "hospital__location", "units_requested")
+            .iterator(chunk_size=10000)
+        )
+    ]
+    donors = [
+        (donor_id, blood_group, city)
+        for (blood_group, city), donor_ids in get_eligibility_index().eligible_buckets(when).items()
+        for donor_id in donor_ids
+    ]
+    load = time.perf_counter() - started
+    allocation = allocate(requests, donors, cross_city=cross_city)
+    allocation.stats["timings_ms"] = {"load": round(load * 1000, 2), **allocation.stats["timings_ms"]}
+    return allocation
+
+
+def greedy_allocation(requests, donors, cross_city: bool = True) -> np.ndarray:
+    """
+    Baseline for benchmarks: requests in priority order, each taking the
+    first donors `DonorMatchIndex.match` would rank for it (same city
+    first, then the order of `compatible_donor_groups`). Returns units
+    allocated per request.
+    """
+    from core.matching import compatible_donor_groups
+
+    pools = {}
+    for _, blood_group, city in donors:
+        pools[(blood_group, city)] = pools.get((blood_group, city), 0) + 1
+    cities_of = {}
+    for blood_group, city in pools:
+        cities_of.setdefault(blood_group, []).append(city)
+
+    allocated = np.zeros(len(requests), dtype=np.int64)
+    for i, (_, blood_group, city, units) in enumerate(requests):
+        preferred = compatible_donor_groups(blood_group)
+        candidates = [(g, city) for g in preferred]
+        if cross_city:
+            candidates += [(g, c) for g in preferred for c in cities_of.get(g, ()) if c != city]
+        need = units
+        for key in candidates:
+            take = min(need, pools.get(key, 0))
+            if take:
+                pools[key] -= take
+                need -= take
+                if not need:
+                    break
+        allocated[i] = units - need
+    return allocated
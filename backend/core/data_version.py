@@ -0,0 +1,344 @@
+# core/data_version.py
+"""
+Cross-worker invalidation of in-process indexes and vector mirrors.
+
+Signals keep the match, geo, time, eligibility and suggest indexes (and the
+local vector store's in-memory mirror) current for writes made by the
+same process only. With several workers (serve_ai, gunicorn) a write
+handled by one worker is invisible to the others until restart.
+
+Protocol:
+- every Donor / Hospital / Request write and every vector-store write
+  appends a DataChange row in the writer's transaction; the highest
+  DataChange id is the data version
+- each worker remembers the last id it applied; at most once per
+  DATA_VERSION["CHECK_INTERVAL"] seconds (DataVersionMiddleware, before
+  an API request) it reads the current version, a single primary-key
+  index lookup, and stops there if nothing changed
+- otherwise it loads the new change rows and refreshes only what they
+  touch: index entries for the changed records (re-read in one query
+  per kind), and the rows of the vector store written since its last
+  load (delta, not a full reload)
+- more than DATA_VERSION["MAX_DELTA"] changes, a vector-store clear, or
+  a worker idle for longer than the retention window fall back to a
+  full rebuild
+
+Ids committed out of order by concurrent transactions leave gaps below
+the newest id read; those ids are re-polled for GAP_TIMEOUT seconds so a
+late commit is not skipped.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Seconds an id missing below the newest applied one is still expected
+GAP_TIMEOUT = 30.0
+
+# Seconds between pruning passes of old change rows
+PRUNE_INTERVAL = 3600.0
+
+
+def record_change(kind: str, record_id=None, deleted: bool = False):
+    """
+    Append one change row (no-op when DATA_VERSION is disabled).
+    """
+    if not settings.DATA_VERSION.get("ENABLED", True):
+        return
+    from core.models import DataChange
+
+    DataChange.objects.create(kind=kind, record_id=record_id, deleted=deleted)
+
+
+def current_version() -> int:
+    """
+    Highest change id: one primary-key index lookup.
+    """
+    from core.models import DataChange
+
+    return DataChange.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+# REFRESH (one query per record kind)
+
+def refresh_donors(donor_ids):
+    from core.eligibility import peek_eligibility_index
+    from core.geo import peek_geo_index
+    from core.matching import peek_match_index
+    from core.models import Donor
+    from core.suggest import refresh_records
+    from core.time_index import peek_time_index
+
+    refresh_records("donor", donor_ids)
+    match, geo = peek_match_index(), peek_geo_index()
+    eligibility, times = peek_eligibility_index(), peek_time_index()
+    if match is None and geo is None and eligibility is None and times is None:
+        return
+    rows = {
+        row[0]: row
+        for row in Donor.objects.filter(id__in=donor_ids).values_list(
+            "id", "blood_group", "city", "latitude", "longitude", "created_at", "next_eligible_at"
+        )
+    }
+    for donor_id in donor_ids:
+        row = rows.get(donor_id)
+        if row is None:
+            for index in (match, eligibility):
+                if index is not None:
+                    index.remove(donor_id)
+            if geo is not None:
+                geo.remove("donor", donor_id)
+            if times is not None:
+                times.remove("donor", donor_id)
+            continue
+        _, blood_group, city, lat, lon, created_at, next_eligible_at = row
+        if match is not None:
+            match.upsert(donor_id, blood_group, city)
+        if eligibility is not None:
+            eligibility.upsert(donor_id, blood_group, city, next_eligible_at)
+        if geo is not None:
+            geo.upsert("donor", donor_id, lat, lon, blood_group)
+        if times is not None:
+            times.upsert("donor", donor_id, created_at)
+
+
+def refresh_hospitals(hospital_ids):
+    from core.geo import peek_geo_index
+    from core.models import Hospital
+    from core.suggest import refresh_records
+    from core.time_index import peek_time_index
+
+    refresh_records("hospital", hospital_ids)
+    geo, times = peek_geo_index(), peek_time_index()
+    if geo is None and times is None:
+        return
+    rows = {
+        row[0]: row
+        for row in Hospital.objects.filter(id__in=hospital_ids).values_list(
+            "id", "latitude", "longitude", "created_at"
+        )
+    }
+    for hospital_id in hospital_ids:
+        row = rows.get(hospital_id)
+        if geo is not None:
+            if row is None:
+                geo.remove("hospital", hospital_id)
+            else:
+                geo.upsert("hospital", hospital_id, row[1], row[2])
+        if times is not None:
+            if row is None:
+                times.remove("hospital", hospital_id)
+            else:
+                times.upsert("hospital", hospital_id, row[3])
+
+
+def refresh_requests(request_ids):
+    from core.models import Request
+    from core.suggest import refresh_records
+    from core.time_index import peek_time_index
+
+    refresh_records("request", request_ids)
+    times = peek_time_index()
+    if times is None:
+        return
+    created = dict(Request.objects.filter(id__in=request_ids).values_list("id", "created_at"))
+    for request_id in request_ids:
+        if request_id in created:
+            times.upsert("request", request_id, created[request_id])
+        else:
+            times.remove("request", request_id)
+
+
+REFRESHERS = {"donor": refresh_donors, "hospital": refresh_hospitals, "request": refresh_requests}
+
+
+def rebuild_all():
+    """
+    Drop every in-process index (rebuilt lazily) and reload the vectors.
+    """
+    from core.eligibility import reset_eligibility_index
+    from core.geo import reset_geo_index
+    from core.matching import reset_match_index
+    from core.query_cache import get_query_cache
+    from core.suggest import reset_suggest_index
+    from core.time_index import reset_time_index
+    from core.vectorstore import get_vector_store
+
+    reset_match_index()
+    reset_geo_index()
+    reset_time_index()
+    reset_eligibility_index()
+    reset_suggest_index()
+    get_vector_store().refresh(full=True)
+    cache = get_query_cache()
+    if cache is not None:
+        cache.clear()
+
+
+class DataVersionWatcher:
+    """
+    Per-process cursor into the DataChange log.
+    """
+
+    def __init__(self, interval: float = 1.0, max_delta: int = 2000, retention_hours: float = 24):
+        self.interval = interval
+        self.max_delta = max_delta
+        self.retention = retention_hours * 3600
+        self.cursor = None  # last applied change id
+        self.gaps = {}  # missing id -> monotonic time first noticed
+        self._lock = threading.Lock()
+        self._checked = float("-inf")
+        self._applied_at = time.monotonic()
+        self._pruned = time.monotonic()
+        self.stats = {"checks": 0, "deltas": 0, "changes_applied": 0, "full_rebuilds": 0}
+
+    def check(self, force: bool = False) -> bool:
+        """
+        Apply changes made since the last check. Rate-limited unless
+        `force`; a concurrent caller skips instead of waiting. Returns
+        True when anything was refreshed.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked < self.interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked = now
+            self.stats["checks"] += 1
+            latest = current_version()
+            if self.cursor is None:
+                # Indexes are built lazily from the tables as they are now
+                self.cursor = latest
+                self._applied_at = now
+                return False
+            if latest < self.cursor or now - self._applied_at > self.retention / 2:
+                # The log was reset, or rows this worker has not seen may
+                # already be pruned
+                return self._rebuild(latest, now)
+            if latest == self.cursor and not self.gaps:
+                self._applied_at = now
+                return False
+            return self._apply_delta(latest, now)
+        finally:
+            self._lock.release()
+
+    def _rebuild(self, latest: int, now: float) -> bool:
+        rebuild_all()
+        self.cursor, self.gaps, self._applied_at = latest, {}, now
+        self.stats["full_rebuilds"] += 1
+        return True
+
+    def _apply_delta(self, latest: int, now: float) -> bool:
+        from core.models import DataChange
+        from core.vectorstore import get_vector_store
+
+        self.gaps = {gap: seen for gap, seen in self.gaps.items() if now - seen < GAP_TIMEOUT}
+        rows = list(
+            DataChange.objects.filter(Q(id__gt=self.cursor) | Q(id__in=list(self.gaps)))
+            .order_by("id")
+            .values_list("id", "kind", "record_id", "deleted")[:self.max_delta + 1]
+        )
+        if len(rows) > self.max_delta or any(kind == "vector.reload" for _, kind, _, _ in rows):
+            return self._rebuild(latest, now)
+
+        changed, vectors_deleted, vectors_written = {}, [], False
+        for _, kind, record_id, deleted in rows:
+            if kind in REFRESHERS:
+                changed.setdefault(kind, set()).add(record_id)
+            elif kind == "vector":
+                vectors_written = True
+            elif kind.startswith("vector."):
+                vectors_deleted.append((kind.split(".", 1)[1], record_id))
+
+        for kind, ids in changed.items():
+            REFRESHERS[kind](list(ids))
+        if vectors_written or vectors_deleted:
+            get_vector_store().refresh(deleted=vectors_deleted)
+
+        seen = {change_id for change_id, _, _, _ in rows}
+        newest = max(seen, default=self.cursor)
+        for gap in seen:
+            self.gaps.pop(gap, None)
+        for missing in range(self.cursor + 1, newest):
+            if missing not in seen:
+                self.gaps.setdefault(missing, now)
+        self.cursor = max(self.cursor, newest)
+        self._applied_at = now
+        self.stats["deltas"] += 1
+        self.stats["changes_applied"] += len(rows)
+
+        if now - self._pruned > PRUNE_INTERVAL:
+            self._pruned = now
+            prune_changes(self.retention)
+        return bool(rows)
+
+
+def prune_changes(retention_seconds: float) -> int:
+    from core.models import DataChange
+
+    cutoff = timezone.now() - timedelta(seconds=retention_seconds)
+    deleted, _ = DataChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_data_version_watcher():
+    """
+    Process-wide watcher, or None when disabled in settings.
+    """
+    global _watcher
+    config = settings.DATA_VERSION
+    if not config.get("ENABLED", True):
+        return None
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = DataVersionWatcher(
+                    interval=config.get("CHECK_INTERVAL", 1.0),
+                    max_delta=config.get("MAX_DELTA", 2000),
+                    retention_hours=config.get("RETENTION_HOURS", 24),
+                )
+    return _watcher
+
+
+def reset_data_version_watcher():
+    global _watcher
+    with _watcher_lock:
+        _watcher = None
+
+
+@receiver(setting_changed)
+def _data_version_setting_changed(sender, setting, **kwargs):
+    if setting == "DATA_VERSION":
+        reset_data_version_watcher()
+
+
+class DataVersionMiddleware:
+    """
+    Bring this worker's indexes up to date before API requests
+    (rate-limited to one version read per CHECK_INTERVAL).
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATA_VERSION.get("ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.paths = tuple(settings.DATA_VERSION.get("PATHS", ("/api/",)))
+
+    def __call__(self, request):
+        if request.path.startswith(self.paths):
+            watcher = get_data_version_watcher()
+            if watcher is not None:
+                watcher.check()
+        return self.get_response(request)
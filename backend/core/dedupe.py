@@ -0,0 +1,288 @@
+# core/dedupe.py
+"""
+Near-duplicate donor detection for `find_duplicate_donors`.
+
+Comparing every donor with every other is O(n²). Instead donors are
+grouped into blocks and only pairs sharing a block are compared:
+- LSH blocks: random-hyperplane signatures of the stored donor
+  embeddings, `tables` independent signatures of `bits` bits each.
+  Two vectors at angle θ share one signature with probability
+  (1 - θ/π)^bits, so near-identical records meet in at least one table
+  while unrelated ones rarely do
+- contact blocks: donors with the same normalized phone number
+  (formatting, spaces and country code stripped), embedded or not
+
+Blocks larger than `max_bucket` are not expanded into all their pairs;
+their members are sorted by normalized name and compared with their
+`window` neighbours only, which keeps the candidate count near-linear.
+Candidate pairs are then verified on the records themselves (name,
+contact, blood group, city) and verified pairs are merged into
+clusters with union-find.
+"""
+
+import math
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from itertools import combinations
+
+import numpy as np
+
+# Shortest digit string treated as a usable contact for blocking
+MIN_CONTACT_DIGITS = 7
+
+# Name similarity that confirms a pair sharing a phone number; lower
+# than the name-only threshold, but family members sharing a phone
+# ("Asha Verma" / "Ravi Verma") stay apart
+CONTACT_NAME_THRESHOLD = 0.6
+
+# Digit similarity counted as the same contact with a typo
+CONTACT_SIMILARITY = 0.8
+
+
+def normalize_name(name) -> str:
+    """
+    Lower-case, accent-free letters with single spaces.
+    """
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z ]+", " ", text.lower()).split())
+
+
+def normalize_contact(contact) -> str:
+    """
+    Digits only, keeping the last ten (drops +91 / leading 0 prefixes);
+    empty when too short to identify anyone.
+    """
+    digits = re.sub(r"\D", "", contact or "")[-10:]
+    return digits if len(digits) >= MIN_CONTACT_DIGITS else ""
+
+
+def name_similarity(a: str, b: str, minimum: float = 0.0) -> float:
+    """
+    Similarity of two normalized names in [0, 1], tolerant of swapped
+    first / last names. Comparisons whose cheap upper bound is below
+    `minimum` are skipped (and score 0).
+    """
+    if not a or not b:
+        return 0.0
+    best = 0.0
+    for x, y in ((a, b), (" ".join(sorted(a.split())), " ".join(sorted(b.split())))):
+        matcher = SequenceMatcher(None, x, y)
+        if matcher.real_quick_ratio() >= minimum and matcher.quick_ratio() >= minimum:
+            best = max(best, matcher.ratio())
+    return best
+
+
+class DonorKey:
+    """
+    Normalized view of one donor row used for blocking and verification.
+    """
+
+    __slots__ = ("id", "name", "contact", "blood_group", "city", "created_at")
+
+    def __init__(self, donor_id, name, contact, blood_group, city, created_at=None):
+        self.id = donor_id
+        self.name = normalize_name(name)
+        self.contact = normalize_contact(contact)
+        self.blood_group = blood_group
+        self.city = (city or "").strip().lower()
+        self.created_at = created_at
+
+
+def match_score(a: DonorKey, b: DonorKey, name_threshold: float):
+    """
+    Name similarity when the two rows describe the same donor, else None.
+
+    - different blood groups never match (merging them would be unsafe)
+    - same contact: names must be reasonably close
+    - otherwise: names must clear `name_threshold` and the donors share
+      a city or a contact that differs by a typo
+    """
+    if a.blood_group != b.blood_group:
+        return None
+    if a.contact and a.contact == b.contact:
+        threshold = CONTACT_NAME_THRESHOLD
+    elif (a.city and a.city == b.city) or (
+        a.contact and b.contact
+        and SequenceMatcher(None, a.contact, b.contact).ratio() >= CONTACT_SIMILARITY
+    ):
+        threshold = name_threshold
+    else:
+        return None
+    score = name_similarity(a.name, b.name, threshold)
+    return score if score >= threshold else None
+
+
+# BLOCKING
+
+def hyperplane_signatures(matrix, bits: int, tables: int, seed: int = 0, chunk: int = 65536):
+    """
+    (rows, tables) int64 LSH signatures: bit j of table t is the sign of
+    the row's projection on random hyperplane t * bits + j.
+    """
+    if not 1 <= bits <= 62:
+        raise ValueError("bits must be between 1 and 62")
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((matrix.shape[1], tables * bits)).astype(np.float32)
+    weights = np.left_shift(1, np.arange(bits, dtype=np.int64))
+    signatures = np.empty((len(matrix), tables), dtype=np.int64)
+    for start in range(0, len(matrix), chunk):
+        signs = (np.asarray(matrix[start:start + chunk], dtype=np.float32) @ planes) > 0
+        signatures[start:start + chunk] = signs.reshape(-1, tables, bits).astype(np.int64) @ weights
+    return signatures
+
+
+def auto_bits(rows: int) -> int:
+    """
+    Signature length giving about one donor per bucket on average.
+    """
+    return max(8, min(62, math.ceil(math.log2(max(2, rows)))))
+
+
+def collision_probability(cosine: float, bits: int, tables: int) -> float:
+    """
+    Chance that two vectors with this cosine share at least one table's
+    signature (i.e. become a candidate pair).
+    """
+    per_bit = 1 - math.acos(max(-1.0, min(1.0, cosine))) / math.pi
+    return 1 - (1 - per_bit ** bits) ** tables
+
+
+def signature_buckets(column):
+    """
+    Arrays of row positions sharing a signature, for buckets of two or more.
+    """
+    order = np.argsort(column, kind="stable")
+    ordered = column[order]
+    bounds = np.flatnonzero(ordered[1:] != ordered[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(column)]))
+    return [order[s:e] for s, e in zip(starts, ends) if e - s > 1]
+
+
+def bucket_pairs(members, keys, max_bucket: int, window: int):
+    """
+    Candidate (i, j) pairs (i < j) within one bucket: all of them for
+    small buckets, name-sorted neighbours within `window` for large ones.
+    """
+    members = [int(m) for m in members]
+    if len(members) <= max_bucket:
+        for i, j in combinations(members, 2):
+            yield (i, j) if i < j else (j, i)
+        return
+    members.sort(key=lambda m: keys[m].name)
+    for offset, i in enumerate(members):
+        for j in members[offset + 1:offset + 1 + window]:
+            yield (i, j) if i < j else (j, i)
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = self.parent.setdefault(x, x)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        # Path compression
+        while x != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self):
+        groups = {}
+        for x in self.parent:
+            groups.setdefault(self.find(x), []).append(x)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+# PIPELINE
+
+def find_duplicates(
+    keys: list,
+    vectors=None,
+    vector_rows=None,
+    bits: int = 0,
+    tables: int = 8,
+    max_bucket: int = 100,
+    window: int = 10,
+    name_threshold: float = 0.85,
+    seed: int = 0,
+    progress=None,
+):
+    """
+    Cluster duplicate donors.
+
+    `keys` are DonorKey rows; `vectors` is an optional embedding matrix
+    whose row r belongs to keys[vector_rows[r]]; `bits` 0 picks
+    `auto_bits`. `progress(stage, done, total)` is called as work
+    advances.
+
+    Returns (clusters, stats): clusters are (DonorKeys oldest first,
+    lowest verified pair score), largest first; stats records counts
+    and per-stage seconds.
+    """
+    report = progress or (lambda stage, done, total: None)
+    stats = {"donors": len(keys), "embedded": 0, "timings": {}}
+    candidates = set()
+
+    started = time.perf_counter()
+    if vectors is not None and len(vectors):
+        stats["embedded"] = len(vectors)
+        bits = bits or auto_bits(len(vectors))
+        stats["bits"] = bits
+        vector_rows = np.asarray(vector_rows)
+        signatures = hyperplane_signatures(vectors, bits, tables, seed=seed)
+        for table in range(tables):
+            for bucket in signature_buckets(signatures[:, table]):
+                candidates.update(bucket_pairs(vector_rows[bucket], keys, max_bucket, window))
+            report("lsh", table + 1, tables)
+    stats["lsh_pairs"] = len(candidates)
+    stats["timings"]["lsh"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    by_contact = {}
+    for position, key in enumerate(keys):
+        if key.contact:
+            by_contact.setdefault(key.contact, []).append(position)
+    for members in by_contact.values():
+        if len(members) > 1:
+            candidates.update(bucket_pairs(members, keys, max_bucket, window))
+    stats["contact_pairs"] = len(candidates) - stats["lsh_pairs"]
+    stats["candidate_pairs"] = len(candidates)
+    stats["timings"]["contact"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    union, scores = UnionFind(), {}
+    step = max(1, len(candidates) // 20)
+    for done, (i, j) in enumerate(candidates, 1):
+        score = match_score(keys[i], keys[j], name_threshold)
+        if score is not None:
+            union.union(i, j)
+            scores[(i, j)] = score
+        if done % step == 0:
+            report("verify", done, len(candidates))
+    stats["verified_pairs"] = len(scores)
+    stats["timings"]["verify"] = time.perf_counter() - started
+
+    root_scores = {}
+    for (i, _), score in scores.items():
+        root = union.find(i)
+        root_scores[root] = min(score, root_scores.get(root, 1.0))
+    clusters = [
+        (
+            sorted((keys[m] for m in members), key=lambda k: (k.created_at is None, k.created_at, k.id)),
+            root_scores[union.find(members[0])],
+        )
+        for members in union.groups()
+    ]
+    clusters.sort(key=lambda cluster: (-len(cluster[0]), cluster[0][0].id))
+    stats["clusters"] = len(clusters)
+    stats["duplicates"] = sum(len(members) - 1 for members, _ in clusters)
+    return clusters, stats
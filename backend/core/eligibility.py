@@ -0,0 +1,196 @@
+# core/eligibility.py
+"""
+Deferral-aware donor eligibility index.
+
+For every (blood_group, city) the index keeps one array of
+(next eligible epoch seconds, donor id) sorted ascending; donors who
+never donated sort first. Donors eligible at time t are therefore a
+prefix of each array, found with one bisect:
+- "eligible O- donors today" merges the O- prefixes (min-heap merge,
+  longest-rested donors first) and stops at the page size
+- counts are a sum of bisect positions
+- matching skips deferred donors with an O(1) lookup per donor
+
+Built once per process from Donor.next_eligible_at and kept current by
+Donor / Donation signals (see core/signals.py).
+"""
+
+import heapq
+import math
+import threading
+from bisect import bisect_right, insort
+
+from django.utils import timezone
+
+from core.matching import normalize_city
+
+NEVER_DONATED = -math.inf
+
+
+def _ts(next_eligible_at) -> float:
+    return NEVER_DONATED if next_eligible_at is None else next_eligible_at.timestamp()
+
+
+class DeferredDonors:
+    """
+    Container view of donors still deferred at one instant, for
+    `DonorMatchIndex.match(exclude=...)` and geo lookups.
+    """
+
+    def __init__(self, index, ts: float):
+        self.index = index
+        self.ts = ts
+
+    def __contains__(self, donor_id) -> bool:
+        entry = self.index.donors.get(donor_id)
+        return entry is not None and entry[1] > self.ts
+
+
+class EligibilityIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = {}  # (blood_group, city) -> sorted [(ts, donor_id)]
+        self.donors = {}   # donor_id -> ((blood_group, city), ts)
+        # Bumped on every change; part of cached search plans
+        self.version = 0
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Build from (donor_id, blood_group, city, next_eligible_at) tuples.
+        """
+        index = cls()
+        for donor_id, blood_group, city, next_eligible_at in rows:
+            key, ts = (blood_group, normalize_city(city)), _ts(next_eligible_at)
+            index.entries.setdefault(key, []).append((ts, donor_id))
+            index.donors[donor_id] = (key, ts)
+        for entries in index.entries.values():
+            entries.sort()
+        return index
+
+    # WRITES
+
+    def upsert(self, donor_id: int, blood_group: str, city: str, next_eligible_at):
+        key, ts = (blood_group, normalize_city(city)), _ts(next_eligible_at)
+        with self._lock:
+            old = self.donors.get(donor_id)
+            if old == (key, ts):
+                return
+            if old is not None:
+                self._discard(donor_id, *old)
+            insort(self.entries.setdefault(key, []), (ts, donor_id))
+            self.donors[donor_id] = (key, ts)
+            self.version += 1
+
+    def remove(self, donor_id: int):
+        with self._lock:
+            old = self.donors.pop(donor_id, None)
+            if old is not None:
+                self._discard(donor_id, *old)
+                self.version += 1
+
+    def _discard(self, donor_id, key, ts):
+        entries = self.entries.get(key, [])
+        pos = bisect_right(entries, (ts, donor_id)) - 1
+        if pos >= 0 and entries[pos] == (ts, donor_id):
+            del entries[pos]
+        if not entries:
+            self.entries.pop(key, None)
+
+    # QUERIES
+
+    def _keys(self, blood_groups, city):
+        city_key = normalize_city(city) if city else None
+        return [
+            key for key in self.entries
+            if (blood_groups is None or key[0] in blood_groups)
+            and (city_key is None or key[1] == city_key)
+        ]
+
+    def eligible(self, blood_groups=None, city=None, when=None, limit=None) -> list:
+        """
+        Ids of donors eligible at `when` (default now), longest-rested first.
+        `blood_groups` is an optional collection of groups to include.
+        """
+        ts = (when or timezone.now()).timestamp()
+        with self._lock:
+            prefixes = []
+            for key in self._keys(blood_groups, city):
+                entries = self.entries[key]
+                end = bisect_right(entries, (ts, math.inf))
+                # No prefix contributes more than `limit` to the merged page
+                prefixes.append(entries[:end if limit is None else min(end, limit)])
+        merged = heapq.merge(*prefixes)
+        if limit is not None:
+            merged = (entry for _, entry in zip(range(limit), merged))
+        return [donor_id for _, donor_id in merged]
+
+    def count(self, blood_groups=None, city=None, when=None) -> dict:
+        """
+        {"eligible": n, "deferred": n} among the matching donors.
+        """
+        ts = (when or timezone.now()).timestamp()
+        eligible = total = 0
+        with self._lock:
+            for key in self._keys(blood_groups, city):
+                entries = self.entries[key]
+                eligible += bisect_right(entries, (ts, math.inf))
+                total += len(entries)
+        return {"eligible": eligible, "deferred": total - eligible}
+
+    def eligible_buckets(self, when=None) -> dict:
+        """
+        {(blood_group, normalized city): [donor ids eligible at `when`,
+        longest-rested first]} for every non-empty bucket.
+        """
+        ts = (when or timezone.now()).timestamp()
+        with self._lock:
+            buckets = {}
+            for key, entries in self.entries.items():
+                end = bisect_right(entries, (ts, math.inf))
+                if end:
+                    buckets[key] = [donor_id for _, donor_id in entries[:end]]
+        return buckets
+
+    def deferred(self, when=None) -> DeferredDonors:
+        return DeferredDonors(self, (when or timezone.now()).timestamp())
+
+    def __len__(self):
+        return len(self.donors)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_eligibility_index() -> EligibilityIndex:
+    """
+    Process-wide index, built from the Donor table on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from core.models import Donor
+
+                rows = Donor.objects.values_list(
+                    "id", "blood_group", "city", "next_eligible_at"
+                ).iterator(chunk_size=10000)
+                _index = EligibilityIndex.build(rows)
+    return _index
+
+
+def peek_eligibility_index():
+    """
+    The index if it has been built, else None (signals skip unbuilt indexes).
+    """
+    return _index
+
+
+def reset_eligibility_index():
+    """
+    Drop the process-wide index so the next use rebuilds it.
+    """
+    global _index
+    with _index_lock:
+        _index = None
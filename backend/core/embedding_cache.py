@@ -0,0 +1,200 @@
+# core/embedding_cache.py
+"""
+Persistent, content-addressed cache of document embeddings.
+
+Rebuilding the vector store re-renders the same Donor / Hospital /
+Request documents over and over; only the changed ones need the model.
+
+Layout (one directory):
+- vectors.f32    append-only float32 rows, `dim` values each
+- index.sqlite3  key -> row, plus last-used time for garbage collection
+
+Keys are sha256(model name + NUL + document text), so switching the
+embedding model never returns stale vectors.
+
+Concurrency: any number of readers (ingestion workers); a single
+writer (the ingestion parent) appends and runs garbage collection.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory, readonly: bool = False):
+        self.directory = str(directory)
+        self.readonly = readonly
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key BLOB PRIMARY KEY,"
+            " row INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._mapped = None
+        self._mapped_rows = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    # READ
+
+    def _rows(self):
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _vectors(self):
+        rows = self._rows()
+        if rows != self._mapped_rows:
+            self._mapped = (
+                np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+                if rows else None
+            )
+            self._mapped_rows = rows
+        return self._mapped
+
+    def _lookup_rows(self, keys: list) -> dict:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                (bytes(key), row) for key, row in self._db.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                )
+            )
+        return found
+
+    def get_many(self, keys: list) -> dict:
+        """
+        {key: vector} for every key present in the cache.
+        """
+        if not keys or not self.dim:
+            self.misses += len(keys)
+            return {}
+
+        found = self._lookup_rows(keys)
+        vectors = self._vectors()
+        result = {}
+        for key, row in found.items():
+            if vectors is not None and row < len(vectors):
+                result[key] = np.array(vectors[row])
+
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+        return result
+
+    # WRITE (single writer)
+
+    def put_many(self, keys: list, vectors):
+        """
+        Append vectors for new keys; existing keys are only touched.
+        """
+        if self.readonly:
+            raise RuntimeError("EmbeddingCache opened read-only")
+        if not keys:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self.dim),))
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Cache holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+
+        existing = set(self._lookup_rows(keys))
+        # dict() also collapses identical documents within one batch
+        new = list({k: v for k, v in zip(keys, vectors) if k not in existing}.items())
+        now = time.time()
+        if new:
+            first_row = self._rows()
+            with open(self.vectors_path, "ab") as fh:
+                fh.write(np.stack([v for _, v in new]).astype(np.float32).tobytes())
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(k, first_row + i, now) for i, (k, _) in enumerate(new)],
+            )
+        self.touch([k for k in keys if k in existing], commit=False)
+        self._db.commit()
+
+    def touch(self, keys: list, commit: bool = True):
+        """
+        Mark keys as recently used so garbage collection keeps them.
+        """
+        if self.readonly or not keys:
+            return
+        now = time.time()
+        self._db.executemany(
+            "UPDATE entries SET last_used = ? WHERE key = ?",
+            [(now, k) for k in keys],
+        )
+        if commit:
+            self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def gc(self, max_entries: int) -> int:
+        """
+        Keep only the `max_entries` most recently used vectors.
+
+        Surviving rows are rewritten into a compact file, dropping both
+        evicted entries and vectors orphaned by earlier evictions.
+        Returns the number of entries evicted.
+        """
+        if self.readonly:
+            raise RuntimeError("EmbeddingCache opened read-only")
+
+        total = len(self)
+        if total <= max_entries and self._rows() == total:
+            return 0
+
+        keep = self._db.execute(
+            "SELECT key, row, last_used FROM entries ORDER BY last_used DESC LIMIT ?",
+            (max_entries,),
+        ).fetchall()
+
+        vectors = self._vectors()
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            if keep:
+                fh.write(np.asarray(vectors[[row for _, row, _ in keep]]).tobytes())
+
+        self._mapped, self._mapped_rows = None, 0
+        os.replace(tmp_path, self.vectors_path)
+
+        self._db.execute("DELETE FROM entries")
+        self._db.executemany(
+            "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+            [(key, i, last_used) for i, (key, _, last_used) in enumerate(keep)],
+        )
+        self._db.commit()
+        self._db.execute("VACUUM")
+        return total - len(keep)
+
+    def hit_rate(self) -> float:
+        looked_up = self.hits + self.misses
+        return self.hits / looked_up if looked_up else 0.0
+
+    def close(self):
+        self._mapped = None
+        self._db.close()
@@ -0,0 +1,57 @@
+# core/embeddings.py
+"""
+Embedding model loading.
+
+settings.EMBEDDING_MODEL names a sentence-transformers model, or the
+special value "stub": a deterministic feature-hashing model that needs
+no download, no torch and no network. It keeps the whole API usable
+offline (load tests, CI, air-gapped demos); its similarity only
+reflects shared words, so it is not for production ranking.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+STUB_MODEL = "stub"
+
+
+class HashingEmbeddingModel:
+    """
+    Bag-of-words feature hashing with the SentenceTransformer `encode` API.
+    """
+
+    TOKEN_RE = re.compile(r"[a-z0-9+\-]+")
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _encode_one(self, text: str):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in self.TOKEN_RE.findall(str(text).lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vec[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        if not len(sentences):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._encode_one(s) for s in sentences])
+
+
+def load_embedding_model(name: str):
+    """
+    Model for `name`; sentence-transformers is only imported when needed.
+    """
+    if name == STUB_MODEL:
+        return HashingEmbeddingModel()
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
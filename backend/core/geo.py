@@ -0,0 +1,226 @@
+# core/geo.py
+"""
+In-memory spatial index for donors and hospitals with coordinates.
+
+Points are bucketed into a uniform latitude/longitude grid (geohash-
+style cells, CELL_DEGREES on a side, ~11 km at the equator):
+- A radius query visits only the cells overlapping the query's
+  bounding box and checks exact haversine distance inside them
+- A k-nearest query runs radius queries with a doubling radius until
+  k points are inside it, so the answer is exact
+
+The index is built once per process and kept current by model
+signals (see core/signals.py), like the donor match index.
+"""
+
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+CELL_DEGREES = 0.1
+KINDS = ("donor", "hospital")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance between two WGS84 points.
+    """
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """
+    Grid buckets of ids per kind ("donor", "hospital").
+
+    Each point carries an optional tag (the donor's blood group) so
+    compatibility can be applied without touching the database.
+    """
+
+    def __init__(self, cell_degrees: float = CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.columns = round(360 / cell_degrees)
+        self._lock = threading.Lock()
+        self.points = {kind: {} for kind in KINDS}  # id -> (lat, lon, tag)
+        self.cells = {kind: {} for kind in KINDS}   # (row, col) -> set of ids
+        # Bumped on every change; part of cached search plans
+        self.version = 0
+
+    @classmethod
+    def build(cls, donors, hospitals):
+        """
+        Build from iterables of (id, latitude, longitude, tag) tuples.
+        """
+        index = cls()
+        for kind, rows in (("donor", donors), ("hospital", hospitals)):
+            for point_id, lat, lon, tag in rows:
+                index._add(kind, point_id, lat, lon, tag)
+        return index
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lon / self.cell_degrees) % self.columns,
+        )
+
+    def _add(self, kind, point_id, lat, lon, tag):
+        self.points[kind][point_id] = (lat, lon, tag)
+        self.cells[kind].setdefault(self._cell(lat, lon), set()).add(point_id)
+
+    def _discard(self, kind, point_id):
+        old = self.points[kind].pop(point_id, None)
+        if old is None:
+            return
+        cell = self._cell(old[0], old[1])
+        ids = self.cells[kind].get(cell)
+        if ids is not None:
+            ids.discard(point_id)
+            if not ids:
+                del self.cells[kind][cell]
+
+    # WRITES
+
+    def upsert(self, kind: str, point_id: int, lat, lon, tag=None):
+        """
+        Insert or move a point; a point without coordinates is removed.
+        """
+        with self._lock:
+            self._discard(kind, point_id)
+            if lat is not None and lon is not None:
+                self._add(kind, point_id, lat, lon, tag)
+            self.version += 1
+
+    def remove(self, kind: str, point_id: int):
+        with self._lock:
+            self._discard(kind, point_id)
+            self.version += 1
+
+    # QUERIES
+
+    def _candidate_cells(self, kind, lat, lon, radius_km):
+        """
+        Occupied cells that can hold points within `radius_km`.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        lo_row = math.floor((lat - dlat) / self.cell_degrees)
+        hi_row = math.floor((lat + dlat) / self.cell_degrees)
+
+        # Longitude degrees shrink towards the poles: size the box for
+        # the most poleward latitude it reaches
+        cos_lat = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        span = math.floor((lon + dlon) / self.cell_degrees) - math.floor((lon - dlon) / self.cell_degrees) + 1
+
+        occupied = self.cells[kind]
+        box = (hi_row - lo_row + 1) * min(span, self.columns)
+        if dlon >= 180 or box > len(occupied):
+            # Cheaper to filter the occupied cells than to probe the box
+            return [
+                ids for (row, col), ids in occupied.items()
+                if lo_row <= row <= hi_row
+                and (dlon >= 180 or self._col_in_span(col, lon, dlon))
+            ]
+
+        first_col = math.floor((lon - dlon) / self.cell_degrees)
+        return [
+            occupied[(row, col % self.columns)]
+            for row in range(lo_row, hi_row + 1)
+            for col in range(first_col, first_col + span)
+            if (row, col % self.columns) in occupied
+        ]
+
+    def _col_in_span(self, col, lon, dlon) -> bool:
+        first = math.floor((lon - dlon) / self.cell_degrees)
+        last = math.floor((lon + dlon) / self.cell_degrees)
+        return (col - first) % self.columns <= last - first
+
+    def within(self, kind: str, lat: float, lon: float, radius_km: float, tags=None, exclude=None) -> list:
+        """
+        [(distance_km, id)] of points within `radius_km`, nearest first.
+        `tags` optionally restricts to points whose tag is in the set;
+        `exclude` is an optional container of ids to skip.
+        """
+        hits = []
+        with self._lock:
+            points = self.points[kind]
+            for ids in self._candidate_cells(kind, lat, lon, radius_km):
+                for point_id in ids:
+                    p_lat, p_lon, tag = points[point_id]
+                    if tags is not None and tag not in tags:
+                        continue
+                    if exclude is not None and point_id in exclude:
+                        continue
+                    distance = haversine_km(lat, lon, p_lat, p_lon)
+                    if distance <= radius_km:
+                        hits.append((distance, point_id))
+        hits.sort()
+        return hits
+
+    def nearest(
+        self, kind: str, lat: float, lon: float, k: int, tags=None, max_radius_km=None, exclude=None
+    ) -> list:
+        """
+        [(distance_km, id)] of the `k` nearest points, optionally bounded
+        by `max_radius_km`.
+        """
+        limit = min(max_radius_km or HALF_CIRCUMFERENCE_KM, HALF_CIRCUMFERENCE_KM)
+        radius = min(self.cell_degrees * KM_PER_DEGREE, limit)
+        while True:
+            hits = self.within(kind, lat, lon, radius, tags=tags, exclude=exclude)
+            if len(hits) >= k or radius >= limit:
+                return hits[:k]
+            radius = min(radius * 2, limit)
+
+    def __len__(self):
+        return sum(len(points) for points in self.points.values())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_geo_index() -> GeoIndex:
+    """
+    Process-wide index, built from Donor and Hospital coordinates on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from core.models import Donor, Hospital
+
+                donors = (
+                    Donor.objects.filter(latitude__isnull=False, longitude__isnull=False)
+                    .values_list("id", "latitude", "longitude", "blood_group")
+                    .iterator(chunk_size=10000)
+                )
+                hospitals = (
+                    (hospital_id, lat, lon, None)
+                    for hospital_id, lat, lon in Hospital.objects.filter(
+                        latitude__isnull=False, longitude__isnull=False
+                    ).values_list("id", "latitude", "longitude")
+                )
+                _index = GeoIndex.build(donors, hospitals)
+    return _index
+
+
+def peek_geo_index():
+    """
+    The index if it has been built, else None (signals skip unbuilt indexes).
+    """
+    return _index
+
+
+def reset_geo_index():
+    """
+    Drop the process-wide index so the next use rebuilds it.
+    """
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,313 @@
+# core/ingest.py
+"""
+Vector ingestion pipeline shared by the `ingest_vectors` command.
+
+Responsibilities:
+- Render Donor / Hospital / Request rows into embedding documents
+  plus the structured metadata stored alongside each vector
+- Split each table into primary-key ranges so ingestion can be
+  spread across worker processes
+- Run a worker process that owns its own embedding model and streams
+  (record_type, ids, vectors, metadata) chunks back to a single writer
+- Consult the persistent embedding cache (core/embedding_cache.py)
+  so unchanged documents skip the model entirely
+- Keep the hospital fields denormalized into Request vector metadata
+  in step with Hospital edits (see core/signals.py)
+
+Model imports are deferred to function bodies: worker processes are
+started with the "spawn" method and must import this module before
+Django has been configured.
+"""
+
+import os
+import traceback
+
+import numpy as np
+
+from core.embedding_cache import EmbeddingCache, cache_key
+
+
+# DOCUMENT RENDERING
+
+def donor_document(donor):
+    """
+    Text and metadata for a Donor vector.
+    """
+    doc = (
+        f"Donor: {donor.name}, "
+        f"Age {donor.age}, "
+        f"Blood Group {donor.blood_group}, "
+        f"City {donor.city}, "
+        f"Contact {donor.contact}"
+    )
+    metadata = {
+        "name": donor.name,
+        "age": donor.age,
+        "blood_group": donor.blood_group,
+        "city": donor.city,
+        "contact": donor.contact,
+        "created_at": donor.created_at.isoformat(),
+    }
+    return doc, metadata
+
+
+def hospital_document(hospital):
+    """
+    Text and metadata for a Hospital vector.
+    """
+    doc = (
+        f"Hospital: {hospital.name}, "
+        f"Location {hospital.location}, "
+        f"Capacity {hospital.capacity}, "
+        f"Contact {hospital.contact}"
+    )
+    metadata = {
+        "name": hospital.name,
+        "location": hospital.location,
+        "capacity": hospital.capacity,
+        "contact": hospital.contact,
+        "created_at": hospital.created_at.isoformat(),
+    }
+    return doc, metadata
+
+
+def request_hospital_metadata(hospital) -> dict:
+    """
+    Hospital fields denormalized into every Request vector's metadata,
+    so AI search can filter requests by the hospital's city or capacity
+    without a join. Kept current by `sync_request_hospital`.
+    """
+    return {
+        "hospital": hospital.name,
+        "hospital_id": hospital.id,
+        "city": hospital.location,
+        "hospital_capacity": hospital.capacity,
+    }
+
+
+def request_document(req):
+    """
+    Text and metadata for a Request vector.
+    """
+    doc = (
+        f"Request: Patient {req.patient_name}, "
+        f"Age {req.patient_age}, "
+        f"Blood Group {req.blood_group}, "
+        f"Units {req.units_requested}, "
+        f"Hospital {req.hospital.name}, "
+        f"Status {req.status}"
+    )
+    metadata = {
+        "patient_name": req.patient_name,
+        "patient_age": req.patient_age,
+        "blood_group": req.blood_group,
+        "units_requested": req.units_requested,
+        **request_hospital_metadata(req.hospital),
+        "status": req.status,
+        "created_at": req.created_at.isoformat(),
+    }
+    return doc, metadata
+
+
+RECORD_TYPES = ("donor", "hospital", "request")
+
+DOCUMENT_BUILDERS = {
+    "donor": donor_document,
+    "hospital": hospital_document,
+    "request": request_document,
+}
+
+
+def get_queryset(record_type: str):
+    """
+    Base queryset for a record type, ordered by primary key.
+    """
+    from core.models import Donor, Hospital, Request
+
+    if record_type == "donor":
+        return Donor.objects.order_by("id")
+    if record_type == "hospital":
+        return Hospital.objects.order_by("id")
+    if record_type == "request":
+        return Request.objects.select_related("hospital").order_by("id")
+    raise ValueError(f"Unknown record type: {record_type}")
+
+
+def sync_request_hospital(hospital_id: int, chunk_size: int = 1000) -> int:
+    """
+    Rewrite the denormalized hospital fields of one hospital's Request
+    vectors after the hospital changed. Only that hospital's requests
+    are touched (found through the hospital_id foreign-key index), in
+    bulk metadata updates; embeddings are left as they are.
+    Returns the number of vectors updated.
+    """
+    from core.models import Hospital, Request
+    from core.vectorstore import get_vector_store
+
+    hospital = Hospital.objects.filter(pk=hospital_id).first()
+    if hospital is None:
+        return 0
+    values = request_hospital_metadata(hospital)
+    store = get_vector_store()
+
+    updated, ids = 0, []
+    request_ids = Request.objects.filter(hospital_id=hospital_id).values_list("id", flat=True)
+    for request_id in request_ids.iterator(chunk_size=chunk_size):
+        ids.append(request_id)
+        if len(ids) == chunk_size:
+            updated += store.update_metadata("request", ids, values)
+            ids = []
+    if ids:
+        updated += store.update_metadata("request", ids, values)
+    return updated
+
+
+# SHARDING
+
+def shard_id_ranges(min_id, max_id, shards: int) -> list:
+    """
+    Split the inclusive primary-key range [min_id, max_id] into at most
+    `shards` contiguous, non-overlapping inclusive ranges.
+    """
+    if min_id is None or max_id is None or shards < 1:
+        return []
+
+    span = max_id - min_id + 1
+    shards = min(shards, span)
+    step, extra = divmod(span, shards)
+
+    ranges = []
+    start = min_id
+    for i in range(shards):
+        end = start + step - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def plan_shards(shards: int) -> list:
+    """
+    Build one task list per worker.
+
+    Every worker receives one id range of each record type, so the
+    three tables are spread evenly instead of one worker owning donors.
+    """
+    from django.db.models import Max, Min
+
+    plan = [[] for _ in range(shards)]
+    for record_type in RECORD_TYPES:
+        bounds = get_queryset(record_type).aggregate(lo=Min("id"), hi=Max("id"))
+        for i, (lo, hi) in enumerate(shard_id_ranges(bounds["lo"], bounds["hi"], shards)):
+            plan[i].append((record_type, lo, hi))
+    return plan
+
+
+def iter_document_chunks(record_type: str, lo: int, hi: int, chunk_size: int):
+    """
+    Yield lists of (record_id, doc, metadata) for ids in [lo, hi].
+
+    Uses a server-side cursor so a shard never materializes in memory.
+    """
+    build = DOCUMENT_BUILDERS[record_type]
+    qs = get_queryset(record_type).filter(id__gte=lo, id__lte=hi)
+
+    chunk = []
+    for obj in qs.iterator(chunk_size=chunk_size):
+        doc, metadata = build(obj)
+        chunk.append((obj.id, doc, metadata))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_tasks(model, tasks: list, batch_size: int, emit, model_name: str = "", cache=None):
+    """
+    Encode every document covered by `tasks` and hand each chunk to `emit`.
+
+    `emit` receives (record_type, ids, vectors, metadata, keys, cached)
+    where vectors is a float32 array aligned with ids, keys are the
+    embedding-cache keys and `cached` flags rows served from `cache`
+    (empty lists when no cache is used). Only cache misses are encoded.
+    """
+    for record_type, lo, hi in tasks:
+        for chunk in iter_document_chunks(record_type, lo, hi, batch_size):
+            ids, docs, metas = zip(*chunk)
+
+            if cache is None:
+                vectors = model.encode(list(docs), batch_size=batch_size).astype("float32")
+                emit((record_type, list(ids), vectors, list(metas), [], []))
+                continue
+
+            keys = [cache_key(model_name, doc) for doc in docs]
+            found = cache.get_many(keys)
+            missing = [i for i, key in enumerate(keys) if key not in found]
+
+            encoded = {}
+            if missing:
+                fresh = model.encode([docs[i] for i in missing], batch_size=batch_size)
+                encoded = dict(zip(missing, np.asarray(fresh, dtype=np.float32)))
+
+            vectors = np.stack([
+                found[key] if key in found else encoded[i]
+                for i, key in enumerate(keys)
+            ]).astype("float32")
+            cached = [key in found for key in keys]
+            emit((record_type, list(ids), vectors, list(metas), keys, cached))
+
+
+# WORKER PROCESS
+
+def _setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+
+
+def worker_main(
+    tasks: list,
+    model_name: str,
+    num_threads: int,
+    batch_size: int,
+    out_queue,
+    cache_dir: str | None = None,
+):
+    """
+    Entry point for an ingestion worker process.
+
+    Loads a private copy of the embedding model with a bounded torch
+    intra-op thread pool, then streams encoded chunks to `out_queue`.
+    Workers only read the embedding cache; the parent writes it.
+    A final ("done", None) or ("error", traceback) message is always sent.
+    """
+    try:
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        _setup_django()
+
+        from core.embeddings import STUB_MODEL, load_embedding_model
+
+        if model_name != STUB_MODEL:
+            import torch
+            torch.set_num_threads(num_threads)
+        model = load_embedding_model(model_name)
+
+        cache = EmbeddingCache(cache_dir, readonly=True) if cache_dir else None
+        encode_tasks(
+            model,
+            tasks,
+            batch_size,
+            lambda chunk: out_queue.put(("chunk", chunk)),
+            model_name=model_name,
+            cache=cache,
+        )
+        out_queue.put(("done", None))
+    except Exception:
+        out_queue.put(("error", traceback.format_exc()))
+
+
+def threads_per_worker(workers: int) -> int:
+    """
+    Default torch intra-op threads so workers x threads <= cores.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
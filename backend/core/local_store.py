@@ -0,0 +1,351 @@
+# core/local_store.py
+"""
+Embedded vector-store backend for edge deployments and fast tests.
+
+Records persist in a SQLite file (float32 embedding blobs plus JSON
+metadata). On first use the whole table is loaded into an in-memory
+float32 matrix that is kept in step with every write, so searches
+never touch disk.
+
+Every insert, replace and metadata update stamps its rows with the
+next value of a change sequence (a one-row counter table bumped in the
+write's transaction, so values only grow and are never reused, unlike
+rowids). `refresh()` catches up with writes from other processes by
+loading only rows stamped above the highest sequence already mirrored.
+"""
+
+import json
+import sqlite3
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from core.vectorstore import VectorStore
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Options:
+    - PATH: SQLite file (":memory:" for a throwaway store)
+    """
+
+    def __init__(self, options: dict | None = None):
+        super().__init__(options)
+        self.path = str(self.options.get("PATH", "vectors.sqlite3"))
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " type TEXT NOT NULL,"
+            " record_id INTEGER NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " metadata TEXT NOT NULL,"
+            " seq INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (type, record_id))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(vectors)")}
+        if "seq" not in columns:
+            # Files written before change sequences: every row counts as seq 0
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_seq ON vectors (seq)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vector_seq ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " value INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO vector_seq (id, value) SELECT 1, COALESCE(MAX(seq), 0) FROM vectors"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS info (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        # In-memory mirror, loaded lazily
+        self._loaded = False
+        self._records = []
+        self._positions = {}
+        self._matrix = None
+        self._size = 0
+        self._snapshot = None
+        self._shared = False  # a snapshot handed out views self._matrix
+        self._seq = 0  # highest change sequence mirrored
+
+    # CHANGE SEQUENCE
+
+    def _next_seqs(self, count: int) -> int:
+        """
+        Reserve `count` sequence values inside the open write transaction
+        (the UPDATE takes SQLite's write lock); returns the first one.
+        """
+        self._conn.execute("UPDATE vector_seq SET value = value + ? WHERE id = 1", (count,))
+        last = self._conn.execute("SELECT value FROM vector_seq WHERE id = 1").fetchone()[0]
+        return last - count + 1
+
+    def _advance(self, first: int, count: int):
+        """
+        Move the cursor past this process's own write, unless another
+        process wrote in between (those rows still need a refresh).
+        """
+        if first == self._seq + 1:
+            self._seq = first + count - 1
+
+    # IN-MEMORY MIRROR
+
+    def _load(self):
+        if self._loaded:
+            return
+        # Sequence first: a write landing between the two reads is simply
+        # loaded again by the next refresh()
+        seq = self._conn.execute("SELECT value FROM vector_seq WHERE id = 1").fetchone()[0]
+        rows = self._conn.execute(
+            "SELECT rowid, type, record_id, embedding, metadata FROM vectors ORDER BY rowid"
+        ).fetchall()
+
+        self._records = []
+        self._positions = {}
+        vectors = []
+        for _, record_type, record_id, blob, metadata in rows:
+            self._positions[(record_type, record_id)] = len(self._records)
+            self._records.append({
+                "type": record_type,
+                "record_id": record_id,
+                "metadata": json.loads(metadata),
+            })
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+
+        self._matrix = np.vstack(vectors) if vectors else None
+        self._size = len(vectors)
+        self._snapshot, self._shared = None, False
+        self._seq = seq
+        self._loaded = True
+
+    def _mirror(self, rows):
+        """
+        Apply (record_type, record_id, vector, metadata) rows to the mirror.
+
+        Appends land past the rows any snapshot views; replacing a row a
+        snapshot may still be scanning copies the matrix first
+        (snapshots hold their own tuple of records).
+        """
+        self._ensure_capacity(len(rows[0][2]), len(rows))
+        if self._shared and any((t, rid) in self._positions for t, rid, _, _ in rows):
+            self._matrix = self._matrix.copy()
+            self._shared = False
+        for record_type, record_id, vec, metadata in rows:
+            record = {"type": record_type, "record_id": record_id, "metadata": metadata}
+            pos = self._positions.get((record_type, record_id))
+            if pos is None:
+                pos = self._size
+                self._positions[(record_type, record_id)] = pos
+                self._records.append(record)
+                self._size += 1
+            else:
+                self._records[pos] = record
+            self._matrix[pos] = vec
+        self._snapshot = None
+
+    def _unmirror(self, record_type: str, record_id: int) -> bool:
+        pos = self._positions.pop((record_type, record_id), None)
+        if pos is None:
+            return False
+        # Rare operation: rebuild the mirror without the row
+        self._matrix = np.delete(self._matrix[:self._size], pos, axis=0)
+        self._shared = False
+        del self._records[pos]
+        self._size -= 1
+        self._positions = {
+            (r["type"], r["record_id"]): i for i, r in enumerate(self._records)
+        }
+        self._snapshot = None
+        return True
+
+    def refresh(self, deleted=(), full: bool = False):
+        with self._lock:
+            if not self._loaded:
+                # Nothing mirrored yet: the first use loads everything
+                return
+            if full:
+                self._loaded = False
+                self._load()
+                self.version += 1
+                return
+
+            changed = False
+            for record_type, record_id in deleted:
+                # The record may have been inserted again since the delete
+                exists = self._conn.execute(
+                    "SELECT 1 FROM vectors WHERE type = ? AND record_id = ?", (record_type, record_id)
+                ).fetchone()
+                if exists is None:
+                    changed = self._unmirror(record_type, record_id) or changed
+            rows = self._conn.execute(
+                "SELECT seq, type, record_id, embedding, metadata FROM vectors "
+                "WHERE seq > ? ORDER BY seq",
+                (self._seq,),
+            ).fetchall()
+            if rows:
+                self._mirror([
+                    (record_type, record_id, np.frombuffer(blob, dtype=np.float32), json.loads(metadata))
+                    for _, record_type, record_id, blob, metadata in rows
+                ])
+                self._seq = rows[-1][0]
+                changed = True
+            if changed:
+                self.version += 1
+
+    def _ensure_capacity(self, dim: int, extra: int):
+        needed = self._size + extra
+        if self._matrix is None:
+            self._matrix = np.empty((max(needed, 1024), dim), dtype=np.float32)
+        elif needed > len(self._matrix):
+            # Geometric growth keeps appends amortized O(1); the old
+            # buffer stays valid for any snapshot still being scanned
+            grown = np.empty((max(needed, 2 * len(self._matrix)), dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+            self._shared = False
+
+    # STORAGE
+
+    def bulk_upsert(self, records: list) -> int:
+        if not records:
+            return 0
+
+        rows = []
+        for record_type, record_id, embedding, metadata in records:
+            vec = np.asarray(embedding, dtype=np.float32).ravel()
+            rows.append((record_type, record_id, vec, metadata))
+
+        with self._lock:
+            self._load()
+            first = self._next_seqs(len(rows))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (type, record_id, embedding, metadata, seq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (t, rid, vec.tobytes(), json.dumps(meta, default=str), first + i)
+                    for i, (t, rid, vec, meta) in enumerate(rows)
+                ],
+            )
+            self._conn.commit()
+
+            self._mirror(rows)
+            self._advance(first, len(rows))
+            self.mark_written()
+        return len(rows)
+
+    def delete(self, record_type: str, record_id: int) -> bool:
+        with self._lock:
+            self._load()
+            cur = self._conn.execute(
+                "DELETE FROM vectors WHERE type = ? AND record_id = ?",
+                (record_type, record_id),
+            )
+            self._conn.commit()
+
+            self._unmirror(record_type, record_id)
+            self.mark_written(deleted=(record_type, record_id))
+            return cur.rowcount > 0
+
+    def update_metadata(self, record_type: str, record_ids, values: dict) -> int:
+        with self._lock:
+            self._load()
+            rows = []
+            for record_id in record_ids:
+                pos = self._positions.get((record_type, record_id))
+                if pos is None:
+                    continue
+                # New dicts: snapshots already handed out keep their view
+                record = self._records[pos]
+                record = {**record, "metadata": {**record["metadata"], **values}}
+                self._records[pos] = record
+                rows.append((json.dumps(record["metadata"], default=str), record_type, record_id))
+
+            if rows:
+                # A new sequence value so other processes' refresh() sees the change
+                first = self._next_seqs(len(rows))
+                self._conn.executemany(
+                    "UPDATE vectors SET metadata = ?, seq = ? WHERE type = ? AND record_id = ?",
+                    [(metadata, first + i, t, rid) for i, (metadata, t, rid) in enumerate(rows)],
+                )
+                self._conn.commit()
+                self._advance(first, len(rows))
+                self._snapshot = None
+                self.mark_written()
+            return len(rows)
+
+    def count(self, record_type: str | None = None) -> int:
+        with self._lock:
+            if record_type:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM vectors WHERE type = ?", (record_type,)
+                ).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()
+            return row[0]
+
+    def get_info(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, value FROM info").fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def set_info(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    self._conn.execute("DELETE FROM info WHERE name = ?", (name,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO info (name, value) VALUES (?, ?)",
+                        (name, json.dumps(value)),
+                    )
+            self._conn.commit()
+            self.mark_written(reload=True)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.execute("DELETE FROM info")
+            self._conn.commit()
+            self._records, self._positions = [], {}
+            self._matrix, self._size, self._snapshot, self._shared = None, 0, None, False
+            # The counter keeps growing, so other processes never mistake
+            # new rows for ones they mirrored before the clear
+            self._seq = self._conn.execute("SELECT value FROM vector_seq WHERE id = 1").fetchone()[0]
+            self._loaded = True
+            self.mark_written(reload=True)
+
+    def load_vectors(self):
+        """
+        In-memory snapshot; rebuilt only after a write.
+        """
+        with self._lock:
+            self._load()
+            if self._snapshot is None:
+                if self._size:
+                    matrix = self._matrix[:self._size]
+                else:
+                    matrix = np.empty((0, 0), dtype=np.float32)
+                self._snapshot = (tuple(self._records), matrix)
+                self._shared = self._size > 0
+            return self._snapshot
+
+    def warm(self):
+        super().warm()
+        if settings.VECTOR_SEARCH_SHARDS <= 1:
+            self.load_vectors()
+
+    def after_fork(self):
+        super().after_fork()
+        self._lock = threading.RLock()
+        # SQLite connections must not be used across fork; ":memory:"
+        # stores have nothing else to reconnect to
+        if self.path != ":memory:":
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,90 @@
+# core/management/commands/bench_allocation.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from core.allocation import allocate, greedy_allocation
+from core.matching import BLOOD_GROUPS
+
+# Approximate population share of each group, in BLOOD_GROUPS order
+GROUP_SHARE = [0.066, 0.374, 0.063, 0.357, 0.015, 0.085, 0.006, 0.034]
+
+
+class Command(BaseCommand):
+    help = "Benchmark batch donor allocation (min-cost flow) against per-request greedy matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+        parser.add_argument("--donors", type=int, default=40000)
+        parser.add_argument("--cities", type=int, default=50)
+        parser.add_argument("--max-units", type=int, default=4, help="Units per request: 1..N")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per mode")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if min(options["requests"], options["donors"], options["cities"], options["max_units"]) < 1:
+            raise CommandError("--requests, --donors, --cities and --max-units must be positive")
+        requests, donors = self.synthetic(options)
+        demand = sum(units for _, _, _, units in requests)
+        self.stdout.write(self.style.NOTICE(
+            f"{len(requests)} pending requests ({demand} units), {len(donors)} eligible donors, "
+            f"{options['cities']} cities"
+        ))
+        self.stdout.write(
+            f"{'mode':>20} {'mean ms':>9} {'best ms':>9} {'units':>8} {'fully met':>10} "
+            f"{'cross-city':>10} {'substituted':>11}"
+        )
+
+        for cross_city in (True, False):
+            label = "any city" if cross_city else "same city"
+            timings, allocation = [], None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                allocation = allocate(requests, donors, cross_city=cross_city)
+                timings.append(time.perf_counter() - started)
+            stats = allocation.stats
+            self.report(
+                f"flow, {label}", timings, allocation.allocated, allocation.requested,
+                stats["units_cross_city"], stats["units_substituted"],
+            )
+
+            started = time.perf_counter()
+            greedy = greedy_allocation(requests, donors, cross_city=cross_city)
+            elapsed = time.perf_counter() - started
+            self.report(f"greedy, {label}", [elapsed], greedy, allocation.requested)
+            self.stdout.write(
+                f"{'':>20} graph {stats['graph']['nodes']} nodes / {stats['graph']['edges']} edges, "
+                f"{stats['graph']['phases']} phases; stage ms {stats['timings_ms']}"
+            )
+
+    def synthetic(self, options):
+        rng = np.random.default_rng(options["seed"])
+        share = np.array(GROUP_SHARE) / sum(GROUP_SHARE)
+        cities = [f"city-{i}" for i in range(options["cities"])]
+
+        n = options["requests"]
+        groups = rng.choice(len(BLOOD_GROUPS), n, p=share)
+        places = rng.integers(0, len(cities), n)
+        units = rng.integers(1, options["max_units"] + 1, n)
+        requests = [
+            (i, BLOOD_GROUPS[g], cities[c], int(u))
+            for i, (g, c, u) in enumerate(zip(groups, places, units))
+        ]
+
+        n = options["donors"]
+        groups = rng.choice(len(BLOOD_GROUPS), n, p=share)
+        places = rng.integers(0, len(cities), n)
+        donors = [(i, BLOOD_GROUPS[g], cities[c]) for i, (g, c) in enumerate(zip(groups, places))]
+        return requests, donors
+
+    def report(self, label, timings, allocated, requested, cross_city=None, substituted=None):
+        ms = np.array(timings) * 1000
+        fully_met = int(np.count_nonzero(allocated == requested))
+        cross_city = "-" if cross_city is None else cross_city
+        substituted = "-" if substituted is None else substituted
+        self.stdout.write(
+            f"{label:>20} {ms.mean():>9.1f} {ms.min():>9.1f} {int(allocated.sum()):>8} {fully_met:>10} "
+            f"{cross_city:>10} {substituted:>11}"
+        )
@@ -0,0 +1,80 @@
+# core/management/commands/bench_vector_search.py
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharded import ShardPool, local_top_k, normalize_rows
+
+
+class Command(BaseCommand):
+    help = "Benchmark in-process vs sharded scatter-gather vector search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vectors", type=int, default=200000)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--top-k", type=int, default=50)
+        parser.add_argument(
+            "--shards",
+            default="1,2,4,8",
+            help="Comma-separated shard counts to measure",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options["shards"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--shards must be comma-separated integers")
+
+        rng = np.random.default_rng(options["seed"])
+        matrix = normalize_rows(rng.standard_normal((options["vectors"], options["dim"])))
+        queries = normalize_rows(rng.standard_normal((options["queries"], options["dim"])))
+        top_k = options["top_k"]
+
+        self.stdout.write(self.style.NOTICE(
+            f"{options['vectors']} vectors x {options['dim']} dims, "
+            f"{options['queries']} queries, top_k={top_k}"
+        ))
+        self.stdout.write(f"{'mode':>12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'qps':>8} {'speedup':>8} {'recall':>7}")
+
+        # Baseline: single-process scan, one query at a time
+        expected = []
+        timings = []
+        for q in queries:
+            start = time.perf_counter()
+            _, idx = local_top_k((matrix @ q)[None, :], top_k)
+            timings.append(time.perf_counter() - start)
+            expected.append(set(idx[0].tolist()))
+        baseline = float(np.mean(timings))
+        self.report("in-process", timings, baseline, 1.0)
+
+        for shards in levels:
+            pool = ShardPool(shards)
+            try:
+                pool.load(matrix)
+                pool.search_many(queries[:1], top_k)  # warm up page mappings
+
+                timings, hits = [], 0
+                for q, want in zip(queries, expected):
+                    start = time.perf_counter()
+                    (_, rows), = pool.search_many(q[None, :], top_k)
+                    timings.append(time.perf_counter() - start)
+                    hits += len(want & set(rows))
+            finally:
+                pool.close()
+
+            recall = hits / (len(queries) * min(top_k, len(matrix)))
+            self.report(f"{shards} shard(s)", timings, baseline, recall)
+
+    def report(self, label, timings, baseline, recall):
+        ms = np.array(timings) * 1000
+        mean = float(ms.mean())
+        self.stdout.write(
+            f"{label:>12} {mean:>9.2f} {np.percentile(ms, 50):>9.2f} "
+            f"{np.percentile(ms, 95):>9.2f} {1000 / mean:>8.1f} "
+            f"{baseline * 1000 / mean:>7.2f}x {recall:>7.3f}"
+        )
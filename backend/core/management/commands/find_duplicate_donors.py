@@ -0,0 +1,152 @@
+# core/management/commands/find_duplicate_donors.py
+
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dedupe import DonorKey, auto_bits, collision_probability, find_duplicates
+from core.models import Donor
+from core.vectorstore import get_vector_store
+
+
+class Command(BaseCommand):
+    help = "Find near-duplicate donor records with LSH + contact blocking and print clusters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bits",
+            type=int,
+            default=0,
+            help="Hyperplanes per LSH signature (default: log2 of the embedded donor count)",
+        )
+        parser.add_argument("--tables", type=int, default=8, help="Independent LSH signatures")
+        parser.add_argument(
+            "--max-bucket",
+            type=int,
+            default=100,
+            help="Blocks larger than this compare name-sorted neighbours only",
+        )
+        parser.add_argument("--window", type=int, default=10, help="Neighbours compared in large blocks")
+        parser.add_argument("--name-threshold", type=float, default=0.85)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-lsh",
+            action="store_true",
+            help="Contact blocking only (no stored embeddings needed)",
+        )
+        parser.add_argument("--show", type=int, default=20, help="Clusters to print")
+        parser.add_argument("--json", dest="json_path", default="", help="Write every cluster to this file")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["bits"] <= 62 or options["tables"] < 1:
+            raise CommandError("--bits must be 0-62 and --tables positive")
+        if not 0 < options["name_threshold"] <= 1:
+            raise CommandError("--name-threshold must be in (0, 1]")
+        started = time.perf_counter()
+
+        keys = [
+            DonorKey(*row)
+            for row in Donor.objects.order_by("id").values_list(
+                "id", "name", "contact", "blood_group", "city", "created_at"
+            ).iterator(chunk_size=10000)
+        ]
+        vectors, vector_rows = None, None
+        if not options["no_lsh"]:
+            vectors, vector_rows = self.donor_vectors(keys)
+        load_seconds = time.perf_counter() - started
+
+        self.stdout.write(self.style.NOTICE(
+            f"{len(keys)} donors, {0 if vectors is None else len(vectors)} with embeddings "
+            f"(loaded in {load_seconds:.1f}s)"
+        ))
+        bits = options["bits"]
+        if vectors is not None:
+            bits = bits or auto_bits(len(vectors))
+            odds = ", ".join(
+                f"cos {c}: {collision_probability(c, bits, options['tables']):.0%}"
+                for c in (0.99, 0.95, 0.9)
+            )
+            self.stdout.write(f"LSH {options['tables']} x {bits} bits; pair recall {odds}")
+
+        clusters, stats = find_duplicates(
+            keys,
+            vectors,
+            vector_rows,
+            bits=bits,
+            tables=options["tables"],
+            max_bucket=options["max_bucket"],
+            window=options["window"],
+            name_threshold=options["name_threshold"],
+            seed=options["seed"],
+            progress=self.progress,
+        )
+        elapsed = time.perf_counter() - started
+
+        timings = stats["timings"]
+        self.stdout.write(
+            f"Candidates: {stats['lsh_pairs']} LSH + {stats['contact_pairs']} contact-only pairs "
+            f"({stats['candidate_pairs'] / max(1, len(keys)):.2f} per donor) in "
+            f"{timings['lsh'] + timings['contact']:.2f}s"
+        )
+        self.stdout.write(
+            f"Verified: {stats['verified_pairs']} pairs in {timings['verify']:.2f}s "
+            f"({stats['candidate_pairs'] / timings['verify'] if timings['verify'] else 0:.0f} pairs/s)"
+        )
+
+        for members, score in clusters[:options["show"]]:
+            self.stdout.write(f"\n  cluster of {len(members)} (min name similarity {score:.2f}):")
+            for position, key in enumerate(members):
+                label = "keep" if position == 0 else "dup "
+                self.stdout.write(
+                    f"    {label} #{key.id:<8} {key.name!r:<30} {key.contact or '-':<12} "
+                    f"{key.blood_group:<4} {key.city}"
+                )
+        if len(clusters) > options["show"]:
+            self.stdout.write(f"\n  … {len(clusters) - options['show']} more cluster(s)")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(
+                    {
+                        "stats": stats,
+                        "clusters": [
+                            {
+                                "keep": members[0].id,
+                                "duplicates": [key.id for key in members[1:]],
+                                "score": round(score, 4),
+                            }
+                            for members, score in clusters
+                        ],
+                    },
+                    fh,
+                    indent=2,
+                )
+            self.stdout.write(f"Wrote {len(clusters)} cluster(s) to {options['json_path']}")
+
+        summary = (
+            f"\n{stats['clusters']} cluster(s), {stats['duplicates']} duplicate record(s) "
+            f"in {elapsed:.1f}s ({len(keys) / elapsed if elapsed else 0:.0f} donors/s)"
+        )
+        self.stdout.write(self.style.WARNING(summary) if clusters else self.style.SUCCESS(summary))
+
+    def donor_vectors(self, keys):
+        """
+        (matrix, positions in `keys`) for donors with a stored embedding.
+        """
+        records, matrix = get_vector_store().load_vectors()
+        position = {key.id: i for i, key in enumerate(keys)}
+        rows, positions = [], []
+        for row, record in enumerate(records):
+            if record["type"] == "donor" and record["record_id"] in position:
+                rows.append(row)
+                positions.append(position[record["record_id"]])
+        if not rows:
+            self.stdout.write(self.style.WARNING("No stored donor embeddings; run ingest_vectors first"))
+            return None, None
+        return np.asarray(matrix)[rows], positions
+
+    def progress(self, stage, done, total):
+        self.stdout.write(f"  {stage}: {done}/{total}", ending="\r" if done < total else "\n")
+        self.stdout.flush()
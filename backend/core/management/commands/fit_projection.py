@@ -0,0 +1,144 @@
+# core/management/commands/fit_projection.py
+
+import random
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.embedding_cache import EmbeddingCache, cache_key
+from core.ingest import DOCUMENT_BUILDERS, RECORD_TYPES, get_queryset
+from core.projection import Projection, retrieval_agreement
+from core.utils import embedding_model
+
+
+class Command(BaseCommand):
+    help = "Fit a PCA projection on corpus embeddings and report top-k agreement with full dimension"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dims", type=int, default=128, help="Dimensions to keep (saved)")
+        parser.add_argument(
+            "--report-dims",
+            default="",
+            help="Extra comma-separated dimensions to include in the report only (e.g. 32,64,256)",
+        )
+        parser.add_argument("--sample", type=int, default=20000, help="Records to fit on")
+        parser.add_argument(
+            "--eval-queries",
+            type=int,
+            default=200,
+            help="Sampled records held out and used as agreement queries",
+        )
+        parser.add_argument("--queries", default="", help="File of extra natural-language queries")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--dry-run", action="store_true", help="Report only, do not save")
+
+    def handle(self, *args, **options):
+        try:
+            extra = [int(n) for n in options["report_dims"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--report-dims must be comma-separated integers")
+        dims = options["dims"]
+        if dims < 1:
+            raise CommandError("--dims must be positive")
+
+        rng = random.Random(options["seed"])
+        docs = self.sample_documents(options["sample"] + options["eval_queries"], rng)
+        if len(docs) <= options["eval_queries"]:
+            raise CommandError(f"Only {len(docs)} records; not enough to fit and evaluate")
+
+        vectors = self.embed(docs)
+        held_out, corpus = vectors[:options["eval_queries"]], vectors[options["eval_queries"]:]
+        queries = held_out
+        extra_queries = self.load_queries(options["queries"]) if options["queries"] else []
+        if extra_queries:
+            queries = np.vstack([held_out, self.embed(extra_queries)])
+
+        self.stdout.write(self.style.NOTICE(
+            f"Fitting on {len(corpus)} x {corpus.shape[1]}-d vectors, "
+            f"{len(queries)} agreement queries ({settings.EMBEDDING_MODEL})"
+        ))
+        self.stdout.write(f"{'dims':>6} {'variance':>9} {'top10':>7} {'top50':>7} {'MB/1M vec':>10}")
+        self.stdout.write(f"{corpus.shape[1]:>6} {1.0:>9.3f} {1.0:>7.3f} {1.0:>7.3f} "
+                          f"{corpus.shape[1] * 4:>10.0f}")
+
+        chosen = None
+        for d in sorted(set(extra + [dims])):
+            try:
+                projection = Projection.fit(corpus, d, model=settings.EMBEDDING_MODEL, seed=options["seed"])
+            except ValueError as e:
+                self.stdout.write(self.style.WARNING(f"{d:>6} skipped: {e}"))
+                continue
+            agreement = retrieval_agreement(projection, corpus, queries, ks=(10, 50))
+            self.stdout.write(
+                f"{d:>6} {projection.explained_variance:>9.3f} {agreement[10]:>7.3f} "
+                f"{agreement[50]:>7.3f} {d * 4:>10.0f}"
+            )
+            if d == dims:
+                chosen = projection
+
+        if chosen is None:
+            raise CommandError(f"Could not fit {dims} dimensions")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run: projection not saved"))
+            return
+
+        chosen.save(settings.VECTOR_PROJECTION_PATH)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {dims}-d projection {chosen.version} to {settings.VECTOR_PROJECTION_PATH}; "
+            f"run ingest_vectors to rebuild the index with it"
+        ))
+
+    def sample_documents(self, n, rng) -> list:
+        """
+        Documents for `n` records drawn uniformly across all record types.
+        """
+        keys = [
+            (record_type, record_id)
+            for record_type in RECORD_TYPES
+            for record_id in get_queryset(record_type).values_list("id", flat=True)
+        ]
+        picked = rng.sample(keys, min(n, len(keys)))
+
+        by_type = {}
+        for position, (record_type, record_id) in enumerate(picked):
+            by_type.setdefault(record_type, []).append((position, record_id))
+
+        docs = [None] * len(picked)
+        for record_type, wanted in by_type.items():
+            build = DOCUMENT_BUILDERS[record_type]
+            for start in range(0, len(wanted), 1000):
+                chunk = wanted[start:start + 1000]
+                objects = get_queryset(record_type).in_bulk([record_id for _, record_id in chunk])
+                for position, record_id in chunk:
+                    docs[position] = build(objects[record_id])[0]
+        return docs
+
+    def embed(self, texts) -> np.ndarray:
+        """
+        Full-dimension embeddings, served from the embedding cache when possible.
+        """
+        cache = None
+        if settings.EMBEDDING_CACHE_DIR:
+            cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR, readonly=True)
+
+        keys = [cache_key(settings.EMBEDDING_MODEL, text) for text in texts]
+        found = cache.get_many(keys) if cache is not None else {}
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        encoded = {}
+        if missing:
+            fresh = embedding_model.encode([texts[i] for i in missing], batch_size=64)
+            encoded = dict(zip(missing, np.asarray(fresh, dtype=np.float32)))
+        if cache is not None:
+            cache.close()
+
+        return np.stack([
+            found[key] if key in found else encoded[i] for i, key in enumerate(keys)
+        ]).astype(np.float32)
+
+    def load_queries(self, path) -> list:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                return [line.strip() for line in fh if line.strip()]
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
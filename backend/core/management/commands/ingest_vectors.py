@@ -1,97 +1,239 @@
 # core/management/commands/ingest_vectors.py
 
-from django.core.management.base import BaseCommand
-from pymongo import MongoClient
+import multiprocessing
+import queue as queue_module
+import time
 
-from core.models import Donor, Hospital, Request
-from core.utils import generate_embedding, vector_insert
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.embedding_cache import EmbeddingCache
+from core.ingest import encode_tasks, plan_shards, threads_per_worker, worker_main
+from core.projection import Projection
+from core.utils import embedding_model, vector_bulk_upsert
+from core.vectorstore import get_vector_store
 
 
 class Command(BaseCommand):
     help = "Wipe vector DB and ingest donors, hospitals, and requests"
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write(self.style.WARNING("Resetting vector database..."))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of encoder processes (each loads its own model)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=64,
+            help="Documents per encode call and per bulk upsert",
+        )
+        parser.add_argument(
+            "--threads-per-worker",
+            type=int,
+            default=None,
+            help="Torch intra-op threads per worker (default: cores / workers)",
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="store_true",
+            help="Encode without writing at 1, 2, 4 ... N workers and report scaling",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Ignore the persistent embedding cache and re-encode everything",
+        )
+        parser.add_argument(
+            "--no-projection",
+            action="store_true",
+            help="Store full-dimension vectors even if a PCA projection has been fitted",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        batch_size = options["batch_size"]
+        if workers < 1 or batch_size < 1:
+            raise CommandError("--workers and --batch-size must be positive")
+
+        if options["benchmark"]:
+            self.benchmark(workers, batch_size, options["threads_per_worker"])
+            return
 
-        # HARD RESET vector DB (only vectors collection)
-        client = MongoClient("mongodb://localhost:27017/")
-        db = client["bloodbank_ai"]
+        self.stdout.write(self.style.WARNING("Resetting vector database..."))
 
-        db["vectors"].delete_many({})
-        self.stdout.write(self.style.WARNING("Cleared collection: vectors"))
+        # HARD RESET vector DB (configured vector store only)
+        store = get_vector_store()
+        store.clear()
+        self.stdout.write(self.style.WARNING(f"Cleared vector store: {type(store).__name__}"))
 
         self.stdout.write(self.style.SUCCESS("Vector DB wiped successfully.\n"))
 
-        # INGEST DONORS
-        self.stdout.write(self.style.NOTICE("Ingesting donors..."))
-
-        for donor in Donor.objects.all():
-            doc = (
-                f"Donor: {donor.name}, "
-                f"Age {donor.age}, "
-                f"Blood Group {donor.blood_group}, "
-                f"City {donor.city}, "
-                f"Contact {donor.contact}"
+        projection = None
+        if not options["no_projection"]:
+            projection = Projection.load(settings.VECTOR_PROJECTION_PATH)
+        if projection is not None:
+            if projection.model != settings.EMBEDDING_MODEL:
+                raise CommandError(
+                    f"Projection was fitted for '{projection.model}', not "
+                    f"'{settings.EMBEDDING_MODEL}'; re-run fit_projection or pass --no-projection"
+                )
+            store.set_projection(projection)
+            self.stdout.write(self.style.NOTICE(
+                f"Storing {projection.dims}-d PCA vectors (projection {projection.version})"
+            ))
+
+        # INGEST DONORS, HOSPITALS AND REQUESTS
+        self.stdout.write(self.style.NOTICE(
+            f"Ingesting donors, hospitals and requests with {workers} worker(s)..."
+        ))
+
+        cache = None
+        if not options["no_cache"] and settings.EMBEDDING_CACHE_DIR:
+            cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR)
+
+        counts = {}
+        cache_hits = 0
+
+        def write(chunk):
+            nonlocal cache_hits
+            record_type, ids, vectors, metas, keys, cached = chunk
+            vector_bulk_upsert(list(zip([record_type] * len(ids), ids, vectors, metas)))
+
+            # Single writer: only this process appends to the cache
+            if cache is not None and keys:
+                fresh = [i for i, hit in enumerate(cached) if not hit]
+                cache.put_many([keys[i] for i in fresh], vectors[fresh])
+                cache.touch([key for key, hit in zip(keys, cached) if hit])
+                cache_hits += sum(cached)
+
+            counts[record_type] = counts.get(record_type, 0) + len(ids)
+            self.stdout.write(f"  {record_type}: {counts[record_type]} ingested")
+
+        total, elapsed = self.run_pipeline(
+            workers, batch_size, options["threads_per_worker"], write, cache=cache
+        )
+
+        for record_type, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"Ingested {count} {record_type} vector(s)"))
+        self.stdout.write(
+            f"{total} records in {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.1f} records/s, {workers} worker(s))"
+        )
+
+        if cache is not None:
+            evicted = cache.gc(settings.EMBEDDING_CACHE_MAX_ENTRIES)
+            self.stdout.write(
+                f"Embedding cache: {cache_hits}/{total} hits "
+                f"({100 * cache_hits / total if total else 0:.1f}%), "
+                f"{len(cache)} entries, {evicted} evicted"
             )
+            cache.close()
+        self.stdout.write(self.style.SUCCESS("\n✅ Ingestion completed successfully!"))
 
-            embedding = generate_embedding(doc)
-            metadata = {
-                "name": donor.name,
-                "age": donor.age,
-                "blood_group": donor.blood_group,
-                "city": donor.city,
-                "contact": donor.contact,
-            }
-
-            vector_insert("donor", donor.id, embedding, metadata)
-            self.stdout.write(self.style.SUCCESS(f"Ingested donor: {donor.name}"))
-
-        # INGEST HOSPITALS
-        self.stdout.write(self.style.NOTICE("\nIngesting hospitals..."))
-
-        for hospital in Hospital.objects.all():
-            doc = (
-                f"Hospital: {hospital.name}, "
-                f"Location {hospital.location}, "
-                f"Capacity {hospital.capacity}, "
-                f"Contact {hospital.contact}"
+    def run_pipeline(self, workers, batch_size, threads, emit, in_process=True, cache=None):
+        """
+        Encode every record and pass each chunk to `emit`.
+
+        With one worker the already-loaded model is used in-process;
+        otherwise one spawned process per shard streams chunks back and
+        this process acts as the single writer. Workers open `cache`
+        read-only by directory.
+        Returns (records, elapsed_seconds).
+        """
+        start = time.perf_counter()
+        total = 0
+
+        def counted(chunk):
+            nonlocal total
+            total += len(chunk[1])
+            emit(chunk)
+
+        if workers == 1 and in_process:
+            encode_tasks(
+                embedding_model,
+                plan_shards(1)[0],
+                batch_size,
+                counted,
+                model_name=settings.EMBEDDING_MODEL,
+                cache=cache,
             )
-
-            embedding = generate_embedding(doc)
-            metadata = {
-                "name": hospital.name,
-                "location": hospital.location,
-                "capacity": hospital.capacity,
-                "contact": hospital.contact,
-            }
-
-            vector_insert("hospital", hospital.id, embedding, metadata)
-            self.stdout.write(self.style.SUCCESS(f"Ingested hospital: {hospital.name}"))
-
-        # INGEST REQUESTS
-        self.stdout.write(self.style.NOTICE("\nIngesting requests..."))
-
-        for req in Request.objects.all():
-            doc = (
-                f"Request: Patient {req.patient_name}, "
-                f"Age {req.patient_age}, "
-                f"Blood Group {req.blood_group}, "
-                f"Units {req.units_requested}, "
-                f"Hospital {req.hospital.name}, "
-                f"Status {req.status}"
+            return total, time.perf_counter() - start
+
+        plan = [tasks for tasks in plan_shards(workers) if tasks]
+        threads = threads or threads_per_worker(workers)
+
+        # "spawn" gives each worker a clean interpreter and its own model
+        # instead of inheriting the parent's torch thread pools via fork.
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue(maxsize=workers * 4)
+        procs = [
+            ctx.Process(
+                target=worker_main,
+                args=(
+                    tasks,
+                    settings.EMBEDDING_MODEL,
+                    threads,
+                    batch_size,
+                    queue,
+                    cache.directory if cache is not None else None,
+                ),
+            )
+            for tasks in plan
+        ]
+        for proc in procs:
+            proc.start()
+
+        running = len(procs)
+        try:
+            while running:
+                try:
+                    kind, payload = queue.get(timeout=5)
+                except queue_module.Empty:
+                    if not any(proc.is_alive() for proc in procs):
+                        raise CommandError("Ingestion workers exited without finishing")
+                    continue
+                if kind == "chunk":
+                    counted(payload)
+                elif kind == "done":
+                    running -= 1
+                else:
+                    raise CommandError(f"Ingestion worker failed:\n{payload}")
+        finally:
+            for proc in procs:
+                if proc.is_alive() and running:
+                    proc.terminate()
+                proc.join()
+
+        return total, time.perf_counter() - start
+
+    def benchmark(self, max_workers, batch_size, threads):
+        """
+        Report encode throughput (no writes) as the worker count grows.
+        """
+        levels = []
+        n = 1
+        while n < max_workers:
+            levels.append(n)
+            n *= 2
+        levels.append(max_workers)
+
+        self.stdout.write(self.style.NOTICE(
+            "Benchmarking ingestion (encode only, model load included)..."
+        ))
+        self.stdout.write(f"{'workers':>8} {'threads':>8} {'records':>9} {'seconds':>9} "
+                          f"{'rec/s':>9} {'speedup':>8}")
+
+        baseline = None
+        for n in levels:
+            total, elapsed = self.run_pipeline(
+                n, batch_size, threads, lambda chunk: None, in_process=False
+            )
+            rate = total / elapsed if elapsed else 0.0
+            baseline = baseline or rate
+            self.stdout.write(
+                f"{n:>8} {threads or threads_per_worker(n):>8} {total:>9} {elapsed:>9.2f} "
+                f"{rate:>9.1f} {rate / baseline if baseline else 0:>7.2f}x"
             )
-
-            embedding = generate_embedding(doc)
-            metadata = {
-                "patient_name": req.patient_name,
-                "patient_age": req.patient_age,
-                "blood_group": req.blood_group,
-                "units_requested": req.units_requested,
-                "hospital": req.hospital.name,
-                "status": req.status,
-            }
-
-            vector_insert("request", req.id, embedding, metadata)
-            self.stdout.write(self.style.SUCCESS(f"Ingested request: {req.patient_name}"))
-
-        self.stdout.write(self.style.SUCCESS("\n✅ Ingestion completed successfully!"))
@@ -0,0 +1,234 @@
+# core/management/commands/loadtest.py
+
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+
+# route name -> (method, path under --prefix, needs a query body)
+ROUTES = {
+    "ai_search": ("POST", "/ai/search/", True),
+    "ai_batch": ("POST", "/ai/search/batch/", True),
+    "donors": ("GET", "/donors/", False),
+    "hospitals": ("GET", "/hospitals/", False),
+    "requests": ("GET", "/requests/", False),
+}
+
+DEFAULT_QUERIES = [
+    "O+ donors in Udaipur",
+    "donors with blood group A- above age 30",
+    "hospitals with capacity above 100",
+    "pending requests for B+ blood",
+    "AB- donors under age 40 in Jaipur",
+    "completed requests at City Hospital",
+]
+
+
+class InProcessTransport:
+    """
+    Drives the WSGI handler directly; one test Client per thread.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def send(self, method, path, body):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = Client(SERVER_NAME="localhost", raise_request_exception=False)
+        if method == "POST":
+            return client.post(path, data=json.dumps(body), content_type="application/json").status_code
+        return client.get(path).status_code
+
+    def close_thread(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """
+    Sends real HTTP requests to a running server.
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, method, path, body):
+        data = json.dumps(body).encode() if method == "POST" else None
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def close_thread(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Closed-loop load test of the API routes at increasing concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="",
+            help="Base URL of a running server (e.g. http://127.0.0.1:8000); in-process if omitted",
+        )
+        parser.add_argument("--prefix", default="/api", help="URL prefix of the core routes")
+        parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated client counts")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+        parser.add_argument(
+            "--mix",
+            default="ai_search=3,donors=1,requests=1",
+            help=f"Weighted route mix; routes: {', '.join(ROUTES)}",
+        )
+        parser.add_argument("--queries", default="", help="File with one AI search query per line")
+        parser.add_argument("--batch-size", type=int, default=10, help="Queries per ai_batch call")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options["concurrency"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+        if not levels or min(levels) < 1 or options["requests"] < 1:
+            raise CommandError("Need at least one concurrency level >= 1 and --requests >= 1")
+
+        mix = self.parse_mix(options["mix"])
+        queries = self.load_queries(options["queries"])
+        transport = (
+            HTTPTransport(options["url"], options["timeout"]) if options["url"]
+            else InProcessTransport()
+        )
+
+        self.stdout.write(self.style.NOTICE(
+            f"{options['url'] or 'in-process'}: {options['requests']} requests per level, "
+            f"mix {options['mix']}"
+        ))
+        self.stdout.write(f"{'clients':>7} {'route':>10} {'n':>6} {'err%':>6} {'rps':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+        rng = random.Random(options["seed"])
+        names, weights = zip(*mix.items())
+        best = (0.0, None)
+        for clients in levels:
+            schedule = [
+                self.build_call(name, rng, queries, options["prefix"], options["batch_size"])
+                for name in rng.choices(names, weights=weights, k=options["requests"])
+            ]
+            samples, wall = self.run_level(transport, schedule, clients)
+
+            for name in names:
+                self.report(clients, name, [s for s in samples if s[0] == name], wall)
+            self.report(clients, "all", samples, wall)
+
+            rps = len(samples) / wall if wall else 0.0
+            if rps > best[0]:
+                best = (rps, clients)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Peak throughput {best[0]:.1f} req/s at {best[1]} client(s)"
+        ))
+
+    # SETUP
+
+    def parse_mix(self, spec):
+        mix = {}
+        for part in spec.split(","):
+            name, _, weight = part.strip().partition("=")
+            if name not in ROUTES:
+                raise CommandError(f"Unknown route '{name}'; choose from {', '.join(ROUTES)}")
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f"Bad weight for route '{name}'")
+        if not any(w > 0 for w in mix.values()):
+            raise CommandError("--mix needs at least one positive weight")
+        return mix
+
+    def load_queries(self, path):
+        if not path:
+            return DEFAULT_QUERIES
+        try:
+            with open(path, encoding="utf-8") as fh:
+                queries = [line.strip() for line in fh if line.strip()]
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        if not queries:
+            raise CommandError(f"No queries in {path}")
+        return queries
+
+    def build_call(self, name, rng, queries, prefix, batch_size):
+        method, path, needs_query = ROUTES[name]
+        body = None
+        if name == "ai_batch":
+            body = {"queries": rng.choices(queries, k=batch_size)}
+        elif needs_query:
+            body = {"query": rng.choice(queries)}
+        return name, method, prefix.rstrip("/") + path, body
+
+    # RUN
+
+    def run_level(self, transport, schedule, clients):
+        """
+        `clients` threads each send their next request as soon as the
+        previous one completes. Returns ((route, ok, seconds), ...) and
+        the wall-clock duration.
+        """
+        samples = []
+        lock = threading.Lock()
+        calls = iter(schedule)
+
+        def client_loop():
+            try:
+                while True:
+                    with lock:
+                        call = next(calls, None)
+                    if call is None:
+                        return
+                    name, method, path, body = call
+                    start = time.perf_counter()
+                    try:
+                        ok = transport.send(method, path, body) < 400
+                    except Exception:
+                        ok = False
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        samples.append((name, ok, elapsed))
+            finally:
+                transport.close_thread()
+
+        threads = [threading.Thread(target=client_loop, daemon=True) for _ in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return samples, time.perf_counter() - start
+
+    def report(self, clients, name, samples, wall):
+        if not samples:
+            return
+        ms = np.array([s[2] for s in samples]) * 1000
+        errors = sum(1 for s in samples if not s[1])
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        line = (
+            f"{clients:>7} {name:>10} {len(samples):>6} {100 * errors / len(samples):>6.1f} "
+            f"{len(samples) / wall:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}"
+        )
+        self.stdout.write(self.style.WARNING(line) if errors else line)
@@ -0,0 +1,80 @@
+# core/management/commands/profile_report.py
+
+import glob
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import make_profile_token
+
+SORT_COLUMNS = {"cumulative": 3, "tottime": 2, "calls": 1}
+
+
+class Command(BaseCommand):
+    help = "Aggregate request profiles written by ProfilingMiddleware into top-N hot functions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="Profile directory (default: PROFILING['DIR'])")
+        parser.add_argument("--limit", type=int, default=25)
+        parser.add_argument("--sort", choices=sorted(SORT_COLUMNS), default="cumulative")
+        parser.add_argument(
+            "--path",
+            default="",
+            help="Only include profiles whose request path contains this text (e.g. ai_search)",
+        )
+        parser.add_argument(
+            "--project-only",
+            action="store_true",
+            help="Hide Django, DRF and standard-library frames",
+        )
+        parser.add_argument(
+            "--token",
+            action="store_true",
+            help="Print a signed X-Profile header value and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["token"]:
+            self.stdout.write(make_profile_token())
+            return
+
+        directory = options["dir"] or str(settings.PROFILING["DIR"])
+        files = sorted(
+            f for f in glob.glob(os.path.join(directory, "*.prof"))
+            if options["path"] in os.path.basename(f)
+        )
+        if not files:
+            raise CommandError(f"No profiles found in {directory}")
+
+        stats = pstats.Stats(*files)
+        entries = stats.stats.items()
+        if options["project_only"]:
+            base = str(settings.BASE_DIR)
+            entries = [e for e in entries if e[0][0].startswith(base) and "site-packages" not in e[0][0]]
+        rows = sorted(
+            entries,
+            key=lambda item: item[1][SORT_COLUMNS[options["sort"]]],
+            reverse=True,
+        )[:options["limit"]]
+
+        self.stdout.write(self.style.NOTICE(
+            f"{len(files)} profile(s), {stats.total_tt:.3f}s total, sorted by {options['sort']}"
+        ))
+        self.stdout.write(f"{'calls':>10} {'tottime s':>10} {'cumtime s':>10} "
+                          f"{'cum/req ms':>11}  function")
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows:
+            self.stdout.write(
+                f"{calls:>10} {tottime:>10.4f} {cumtime:>10.4f} "
+                f"{cumtime * 1000 / len(files):>11.2f}  {self.location(filename, line, name)}"
+            )
+
+    @staticmethod
+    def location(filename: str, line: int, name: str) -> str:
+        if filename == "~":
+            return name  # built-in
+        base = str(settings.BASE_DIR)
+        if filename.startswith(base):
+            filename = os.path.relpath(filename, base)
+        return f"{filename}:{line}({name})"
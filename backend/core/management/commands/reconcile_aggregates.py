@@ -0,0 +1,91 @@
+# core/management/commands/reconcile_aggregates.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from core.models import BloodDemandAggregate, Donor, DonorSupplyAggregate, Request
+
+
+class Command(BaseCommand):
+    help = "Recompute demand/supply aggregate tables from Request and Donor"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted buckets, do not repair them",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
+        with transaction.atomic():
+            demand_fixed = self.reconcile_demand(dry_run)
+            supply_fixed = self.reconcile_supply(dry_run)
+
+        verb = "Found" if dry_run else "Repaired"
+        style = self.style.WARNING if (demand_fixed or supply_fixed) else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{verb} {demand_fixed} demand bucket(s) and {supply_fixed} supply bucket(s)"
+        ))
+
+    def reconcile_demand(self, dry_run: bool) -> int:
+        expected = {
+            (row["hospital_id"], row["blood_group"]): (row["n"], row["units"])
+            for row in Request.objects.filter(status="pending")
+            .values("hospital_id", "blood_group")
+            .annotate(n=Count("id"), units=Sum("units_requested"))
+        }
+        stored = {
+            (b.hospital_id, b.blood_group): b
+            for b in BloodDemandAggregate.objects.select_for_update()
+        }
+
+        fixed = 0
+        for key in expected.keys() | stored.keys():
+            requests, units = expected.get(key, (0, 0))
+            bucket = stored.get(key)
+            if bucket and (bucket.pending_requests, bucket.pending_units) == (requests, units):
+                continue
+            if not bucket and not requests:
+                continue
+
+            fixed += 1
+            self.stdout.write(f"  demand {key}: {bucket and bucket.pending_units} -> {units} units")
+            if dry_run:
+                continue
+            if not bucket:
+                bucket = BloodDemandAggregate(hospital_id=key[0], blood_group=key[1])
+            bucket.pending_requests, bucket.pending_units = requests, units
+            bucket.save()
+        return fixed
+
+    def reconcile_supply(self, dry_run: bool) -> int:
+        expected = {
+            (row["city"], row["blood_group"]): row["n"]
+            for row in Donor.objects.values("city", "blood_group").annotate(n=Count("id"))
+        }
+        stored = {
+            (b.city, b.blood_group): b
+            for b in DonorSupplyAggregate.objects.select_for_update()
+        }
+
+        fixed = 0
+        for key in expected.keys() | stored.keys():
+            donors = expected.get(key, 0)
+            bucket = stored.get(key)
+            if bucket and bucket.donor_count == donors:
+                continue
+            if not bucket and not donors:
+                continue
+
+            fixed += 1
+            self.stdout.write(f"  supply {key}: {bucket and bucket.donor_count} -> {donors} donors")
+            if dry_run:
+                continue
+            if not bucket:
+                bucket = DonorSupplyAggregate(city=key[0], blood_group=key[1])
+            bucket.donor_count = donors
+            bucket.save()
+        return fixed
@@ -0,0 +1,151 @@
+# core/management/commands/replay_queries.py
+
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.query_log import log_files, read_query_log
+from core.views_ai import AISearchView
+
+
+class Command(BaseCommand):
+    help = "Re-run a sampled AI query log against the current code and report latency and result differences"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Log files to replay (default: QUERY_LOG['PATH'] and its rotated backups)",
+        )
+        parser.add_argument("--limit", type=int, default=0, help="Replay at most this many entries (newest)")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Runs per query; the fastest is reported (the first also warms caches)",
+        )
+        parser.add_argument("--show", type=int, default=10, help="Changed queries to list")
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help="Keep the semantic query cache on (default: off, so every replay searches)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print one JSON line per query instead")
+        parser.add_argument(
+            "--fail-on-diff",
+            action="store_true",
+            help="Exit non-zero if any query returns a different result set",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=None,
+            help="Exit non-zero if median total latency grew by more than this percentage",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or log_files(settings.QUERY_LOG["PATH"])
+        if not paths:
+            raise CommandError(f"No query log at {settings.QUERY_LOG['PATH']}")
+        try:
+            entries = read_query_log(paths)
+        except OSError as e:
+            raise CommandError(str(e))
+        if options["limit"]:
+            entries = entries[-options["limit"]:]
+        if not entries:
+            raise CommandError("Query log is empty")
+
+        cache = dict(settings.SEMANTIC_QUERY_CACHE, ENABLED=options["use_cache"])
+        with override_settings(SEMANTIC_QUERY_CACHE=cache):
+            rows = [self.replay(entry, max(1, options["repeat"])) for entry in entries]
+
+        if options["json"]:
+            for row in rows:
+                self.stdout.write(json.dumps(row, default=str))
+        else:
+            self.report(rows, options["show"])
+
+        changed = [row for row in rows if row["changed"]]
+        if options["fail_on_diff"] and changed:
+            raise CommandError(f"{len(changed)} of {len(rows)} queries returned different results")
+        if options["max_regression"] is not None:
+            delta = self.median_delta_pct(rows)
+            if delta > options["max_regression"]:
+                raise CommandError(
+                    f"Median latency regressed {delta:+.1f}% (limit {options['max_regression']}%)"
+                )
+
+    def replay(self, entry, repeat) -> dict:
+        best = None
+        for _ in range(repeat):
+            # Paged searches were logged with their larger ranking depth
+            _, plan, results, timings = AISearchView.search(
+                entry["query"], with_plan=True, top_k=entry.get("top_k")
+            )
+            if best is None or timings["total"] < best[2]["total"]:
+                best = (plan, results, timings)
+        plan, results, timings = best
+
+        old_ids = [tuple(r) for r in entry.get("results", [])]
+        new_ids = [(r.get("type"), r.get("record_id")) for r in results]
+        union = set(old_ids) | set(new_ids)
+        jaccard = len(set(old_ids) & set(new_ids)) / len(union) if union else 1.0
+        new_top = results[0].get("score") if results else None
+        old_top = entry.get("top_score")
+
+        return {
+            "query": entry["query"],
+            "old_ms": entry.get("timings_ms", {}).get("total"),
+            "new_ms": timings["total"],
+            "new_timings_ms": {name: round(ms, 3) for name, ms in timings.items()},
+            "old_count": len(old_ids),
+            "new_count": len(new_ids),
+            "jaccard": jaccard,
+            "reordered": jaccard == 1.0 and old_ids != new_ids,
+            "changed": set(old_ids) != set(new_ids),
+            "top_score_delta": (
+                new_top - old_top if new_top is not None and old_top is not None else None
+            ),
+            "plan_changed": entry.get("plan") is not None
+            and json.loads(json.dumps(plan, default=str)) != entry["plan"],
+        }
+
+    def median_delta_pct(self, rows) -> float:
+        pairs = [(row["old_ms"], row["new_ms"]) for row in rows if row["old_ms"]]
+        if not pairs:
+            return 0.0
+        old = float(np.median([p[0] for p in pairs]))
+        new = float(np.median([p[1] for p in pairs]))
+        return (new - old) / old * 100 if old else 0.0
+
+    def report(self, rows, show):
+        timed = [row for row in rows if row["old_ms"] is not None]
+        self.stdout.write(self.style.NOTICE(f"Replayed {len(rows)} queries"))
+
+        if timed:
+            self.stdout.write(f"{'latency':<8} {'p50':>9} {'p95':>9} {'p99':>9}")
+            for label, key in (("logged", "old_ms"), ("replay", "new_ms")):
+                p50, p95, p99 = np.percentile([row[key] for row in timed], [50, 95, 99])
+                self.stdout.write(f"{label:<8} {p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms")
+            self.stdout.write(f"median change: {self.median_delta_pct(timed):+.1f}%")
+
+        changed = [row for row in rows if row["changed"]]
+        reordered = sum(row["reordered"] for row in rows)
+        plans = sum(row["plan_changed"] for row in rows)
+        mean_jaccard = float(np.mean([row["jaccard"] for row in rows]))
+        summary = (
+            f"result sets: {len(rows) - len(changed)} identical, {len(changed)} changed, "
+            f"{reordered} reordered; mean Jaccard {mean_jaccard:.3f}; {plans} plan changes"
+        )
+        self.stdout.write(self.style.WARNING(summary) if changed or plans else self.style.SUCCESS(summary))
+
+        for row in sorted(changed, key=lambda r: r["jaccard"])[:show]:
+            score = row["top_score_delta"]
+            self.stdout.write(
+                f"  J={row['jaccard']:.2f} {row['old_count']}->{row['new_count']} results"
+                f"{'' if score is None else f', top score {score:+.3f}'}: {row['query']}"
+            )
@@ -1,10 +1,10 @@
 # core/management/commands/reset_vectors.py
 from django.core.management.base import BaseCommand
-from core.mongo import collection
+from core.vectorstore import get_vector_store
 
 class Command(BaseCommand):
     help = "Completely reset AI vector store"
 
     def handle(self, *args, **kwargs):
-        collection.drop()
+        get_vector_store().clear()
         self.stdout.write(self.style.SUCCESS("AI vector store reset successfully"))
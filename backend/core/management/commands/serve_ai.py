@@ -0,0 +1,152 @@
+# core/management/commands/serve_ai.py
+
+import gc
+import os
+import random
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from core.prefork import PreforkServer
+
+
+def _set_torch_threads(threads: int):
+    from core.embeddings import STUB_MODEL
+
+    if settings.EMBEDDING_MODEL != STUB_MODEL:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def load_shared_state():
+    """
+    Load everything a search touches: URLconf and views (which load the
+    embedding model), the vector store snapshot and the in-memory indexes.
+    """
+    from django.urls import get_resolver
+
+    from core.eligibility import get_eligibility_index
+    from core.geo import get_geo_index
+    from core.matching import get_match_index
+    from core.suggest import get_suggest_index
+    from core.time_index import get_time_index
+    from core.utils import generate_embedding
+    from core.vectorstore import get_vector_store
+
+    get_resolver().url_patterns
+    # One encode initialises tokenizer and kernel state; single-threaded
+    # so no OpenMP pool exists yet when the workers fork
+    _set_torch_threads(1)
+    generate_embedding("warm up blood donor search")
+    get_vector_store().warm()
+    get_match_index()
+    get_geo_index()
+    get_time_index()
+    get_eligibility_index()
+    get_suggest_index()
+
+
+class Command(BaseCommand):
+    help = "Serve the API from pre-forked workers sharing one copy of the model and vector snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default="127.0.0.1:8000", help="host:port to listen on")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="Worker processes (default: cores / --threads)",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="torch intra-op threads per worker (workers x threads should not exceed cores)",
+        )
+        parser.add_argument(
+            "--max-requests",
+            type=int,
+            default=0,
+            help="Recycle a worker after this many requests (0: never)",
+        )
+        parser.add_argument(
+            "--no-preload",
+            action="store_true",
+            help="Load the model and snapshot in every worker after forking (for comparison)",
+        )
+        parser.add_argument(
+            "--memory-report",
+            type=float,
+            default=0,
+            help="Log RSS / PSS / USS of every process at this interval in seconds (Linux)",
+        )
+        parser.add_argument("--access-log", action="store_true")
+        parser.add_argument("--graceful-timeout", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        if not hasattr(os, "fork"):
+            raise CommandError("serve_ai needs os.fork (POSIX)")
+        host, _, port = options["bind"].rpartition(":")
+        if not host or not port.isdigit():
+            raise CommandError("--bind must be host:port")
+
+        threads = max(1, options["threads"])
+        workers = options["workers"] or max(1, (os.cpu_count() or 1) // threads)
+        if workers * threads > (os.cpu_count() or 1):
+            self.stdout.write(self.style.WARNING(
+                f"{workers} workers x {threads} threads exceeds {os.cpu_count()} cores"
+            ))
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        preload = not options["no_preload"]
+        gc.disable()
+        app = get_wsgi_application()
+        if preload:
+            load_shared_state()
+        # Never hand an open database connection to several processes
+        connections.close_all()
+        # Move everything loaded so far out of the collector's reach: a
+        # worker's GC passes then never write to (and copy) shared pages
+        gc.collect()
+        gc.freeze()
+
+        def post_fork(number):
+            random.seed()
+            gc.enable()
+            if preload:
+                from core.vectorstore import get_vector_store
+
+                get_vector_store().after_fork()
+                _set_torch_threads(threads)
+            else:
+                load_shared_state()
+                _set_torch_threads(threads)
+                connections.close_all()
+
+        server = PreforkServer(
+            app,
+            host=host,
+            port=int(port),
+            workers=workers,
+            max_requests=options["max_requests"],
+            post_fork=post_fork,
+            access_log=options["access_log"],
+            graceful_timeout=options["graceful_timeout"],
+            memory_report=options["memory_report"],
+            log=lambda message: self.stderr.write(message),
+        )
+        server.bind()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: server.stop())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Serving on http://{host}:{server.port}/ with {workers} workers x {threads} torch threads "
+            f"({'shared preload' if preload else 'per-worker load'}, {settings.EMBEDDING_MODEL})"
+        ))
+        server.serve()
+        self.stdout.write("Stopped")
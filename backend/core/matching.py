@@ -0,0 +1,206 @@
+# core/matching.py
+"""
+ABO/Rh compatibility matching between blood Requests and Donors.
+
+Two precomputed structures keep a match independent of table size:
+- A compatibility bitmask per recipient blood group (one bit per
+  donor blood group), computed once from ABO/Rh antigen rules
+- Posting lists of donor ids keyed by (blood_group, city), built once
+  per process and kept current by model signals (see core/signals.py)
+
+A match walks only the posting lists selected by the bitmask, in
+ranking order, and stops as soon as `limit` donors are collected.
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+# Fixed bit order for the compatibility masks
+BLOOD_GROUPS = ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"]
+GROUP_BIT = {bg: 1 << i for i, bg in enumerate(BLOOD_GROUPS)}
+
+
+def _antigens(blood_group: str) -> set:
+    abo, rh = blood_group[:-1], blood_group[-1]
+    antigens = set() if abo == "O" else set(abo)
+    if rh == "+":
+        antigens.add("D")
+    return antigens
+
+
+def _build_masks() -> dict:
+    """
+    Recipient -> bitmask of donor groups it can safely receive.
+
+    A donor is compatible when every donor antigen is also present on
+    the recipient's red cells.
+    """
+    masks = {}
+    for recipient in BLOOD_GROUPS:
+        mask = 0
+        for donor in BLOOD_GROUPS:
+            if _antigens(donor) <= _antigens(recipient):
+                mask |= GROUP_BIT[donor]
+        masks[recipient] = mask
+    return masks
+
+
+COMPATIBILITY_MASK = _build_masks()
+
+# How many recipient groups each donor group can serve (O- serves all 8)
+DONOR_REACH = {
+    donor: sum(1 for mask in COMPATIBILITY_MASK.values() if mask & GROUP_BIT[donor])
+    for donor in BLOOD_GROUPS
+}
+
+
+def compatible_donor_groups(recipient: str) -> list:
+    """
+    Donor groups a recipient can receive, in preference order.
+
+    Exact match first, then substitutes with the smallest reach, so
+    universal O- donors are proposed last and conserved for patients
+    who have no alternative.
+    """
+    mask = COMPATIBILITY_MASK.get(recipient, 0)
+    groups = [bg for bg in BLOOD_GROUPS if mask & GROUP_BIT[bg]]
+    return sorted(groups, key=lambda bg: (bg != recipient, DONOR_REACH[bg], bg))
+
+
+def normalize_city(city) -> str:
+    return (city or "").strip().lower()
+
+
+class DonorMatchIndex:
+    """
+    In-memory posting lists of donor ids per (blood_group, city).
+
+    Lists are kept sorted by donor id so results are stable and updates
+    are a bisect away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = {}
+        self.donor_keys = {}
+        self.cities_by_group = {bg: set() for bg in BLOOD_GROUPS}
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Build from an iterable of (donor_id, blood_group, city) tuples.
+        """
+        index = cls()
+        for donor_id, blood_group, city in rows:
+            key = (blood_group, normalize_city(city))
+            index.postings.setdefault(key, []).append(donor_id)
+            index.donor_keys[donor_id] = key
+            index.cities_by_group.setdefault(blood_group, set()).add(key[1])
+        for ids in index.postings.values():
+            ids.sort()
+        return index
+
+    def upsert(self, donor_id: int, blood_group: str, city: str):
+        key = (blood_group, normalize_city(city))
+        with self._lock:
+            old = self.donor_keys.get(donor_id)
+            if old == key:
+                return
+            if old is not None:
+                self._discard(donor_id, old)
+            insort(self.postings.setdefault(key, []), donor_id)
+            self.donor_keys[donor_id] = key
+            self.cities_by_group.setdefault(blood_group, set()).add(key[1])
+
+    def remove(self, donor_id: int):
+        with self._lock:
+            old = self.donor_keys.pop(donor_id, None)
+            if old is not None:
+                self._discard(donor_id, old)
+
+    def _discard(self, donor_id: int, key: tuple):
+        ids = self.postings.get(key, [])
+        pos = bisect_left(ids, donor_id)
+        if pos < len(ids) and ids[pos] == donor_id:
+            del ids[pos]
+        if not ids:
+            self.postings.pop(key, None)
+            self.cities_by_group.get(key[0], set()).discard(key[1])
+
+    def match(self, recipient: str, city: str, limit: int = 50, exclude=None) -> dict:
+        """
+        Rank donors compatible with `recipient`.
+
+        Order: same city as the hospital first; within each tier the
+        blood-group preference of `compatible_donor_groups`; then donor id.
+        `exclude` is an optional set of donor ids to skip (e.g. deferred).
+
+        Returns {"groups", "total", "ranked": [(donor_id, same_city, blood_group)]}.
+        """
+        city_key = normalize_city(city)
+        groups = compatible_donor_groups(recipient)
+        exclude = exclude or ()
+        ranked = []
+        total = 0
+
+        with self._lock:
+            for bg in groups:
+                for c in self.cities_by_group.get(bg, ()):
+                    total += len(self.postings.get((bg, c), ()))
+
+            tiers = [
+                [(bg, city_key) for bg in groups],
+                [
+                    (bg, c)
+                    for bg in groups
+                    for c in sorted(self.cities_by_group.get(bg, ()))
+                    if c != city_key
+                ],
+            ]
+            for same_city, keys in zip((True, False), tiers):
+                for bg, c in keys:
+                    for donor_id in self.postings.get((bg, c), ()):
+                        if donor_id in exclude:
+                            continue
+                        ranked.append((donor_id, same_city, bg))
+                        if len(ranked) >= limit:
+                            return {"groups": groups, "total": total, "ranked": ranked}
+
+        return {"groups": groups, "total": total, "ranked": ranked}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_match_index() -> DonorMatchIndex:
+    """
+    Process-wide index, built from the Donor table on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from core.models import Donor
+
+                rows = Donor.objects.values_list("id", "blood_group", "city").iterator(
+                    chunk_size=10000
+                )
+                _index = DonorMatchIndex.build(rows)
+    return _index
+
+
+def peek_match_index():
+    """
+    The index if it has been built, else None (signals skip unbuilt indexes).
+    """
+    return _index
+
+
+def reset_match_index():
+    """
+    Drop the process-wide index so the next use rebuilds it.
+    """
+    global _index
+    with _index_lock:
+        _index = None
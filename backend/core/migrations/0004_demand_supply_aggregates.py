@@ -0,0 +1,66 @@
+# Generated by Django 5.0.4 on 2026-10-19 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_aggregates(apps, schema_editor):
+    Donor = apps.get_model('core', 'Donor')
+    Request = apps.get_model('core', 'Request')
+    BloodDemandAggregate = apps.get_model('core', 'BloodDemandAggregate')
+    DonorSupplyAggregate = apps.get_model('core', 'DonorSupplyAggregate')
+
+    DonorSupplyAggregate.objects.bulk_create([
+        DonorSupplyAggregate(city=row['city'], blood_group=row['blood_group'], donor_count=row['n'])
+        for row in Donor.objects.values('city', 'blood_group').annotate(n=Count('id'))
+    ])
+    BloodDemandAggregate.objects.bulk_create([
+        BloodDemandAggregate(
+            hospital_id=row['hospital_id'],
+            blood_group=row['blood_group'],
+            pending_requests=row['n'],
+            pending_units=row['units'],
+        )
+        for row in Request.objects.filter(status='pending')
+        .values('hospital_id', 'blood_group')
+        .annotate(n=Count('id'), units=Sum('units_requested'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_request_patient_age_request_patient_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorSupplyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('O+', 'O+'), ('O-', 'O-'), ('AB+', 'AB+'), ('AB-', 'AB-')], max_length=3)),
+                ('donor_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BloodDemandAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('O+', 'O+'), ('O-', 'O-'), ('AB+', 'AB+'), ('AB-', 'AB-')], max_length=3)),
+                ('pending_requests', models.IntegerField(default=0)),
+                ('pending_units', models.IntegerField(default=0)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_aggregates', to='core.hospital')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='donorsupplyaggregate',
+            constraint=models.UniqueConstraint(fields=('city', 'blood_group'), name='unique_supply_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='blooddemandaggregate',
+            constraint=models.UniqueConstraint(fields=('hospital', 'blood_group'), name='unique_demand_bucket'),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.4 on 2026-10-19 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_group', 'city'], name='donor_group_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', 'blood_group'], name='request_status_group_idx'),
+        ),
+    ]
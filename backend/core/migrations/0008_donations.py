@@ -0,0 +1,40 @@
+# Generated by Django 5.0.4 on 2026-10-19 12:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_aggregate_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='last_donation_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='next_eligible_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Donation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('whole_blood', 'Whole blood'), ('platelets', 'Platelets'), ('plasma', 'Plasma'), ('double_red_cells', 'Double red cells')], default='whole_blood', max_length=20)),
+                ('donated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('units', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='donations', to='core.donor')),
+            ],
+            options={
+                'ordering': ['-donated_at'],
+                'indexes': [models.Index(fields=['donor', '-donated_at'], name='donation_donor_date_idx')],
+            },
+        ),
+    ]
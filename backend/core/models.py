@@ -6,14 +6,26 @@ These models represent the core domain entities:
 - Donor: Individuals willing to donate blood
 - Hospital: Medical facilities requesting or storing blood
 - Request: Blood requests made by hospitals for patients
+- Donation: Donation history; drives each donor's deferral period
+- DataChange: Append-only change log whose highest id is the data
+  version other worker processes poll (see core/data_version.py)
 
 The models are intentionally simple and structured to support:
 - CRUD operations
 - Semantic search with structured metadata
 - Predictable, auditable AI behavior
+
+Aggregate tables (BloodDemandAggregate, DonorSupplyAggregate) are
+maintained incrementally in the same transaction as Donor / Request
+writes so dashboards never need a GROUP BY over the base tables.
 """
 
-from django.db import models
+from datetime import timedelta
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 
 
 class Donor(models.Model):
@@ -51,10 +63,29 @@ class Donor(models.Model):
     # City where the donor is located
     city = models.CharField(max_length=100)
 
-    # Audit fields
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Optional WGS84 coordinates for radius / nearest-donor queries
+    latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+
+    # Derived from Donation rows (see Donation.refresh_donor); never set directly.
+    # next_eligible_at is None for donors who have never donated.
+    last_donation_at = models.DateTimeField(null=True, blank=True)
+    next_eligible_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Audit fields (created_at indexed for time-window queries)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Count / group-by questions in AI search (core/query_aggregates.py)
+        indexes = [models.Index(fields=["blood_group", "city"], name="donor_group_city_idx")]
+
     def __str__(self):
         """
         Human-readable representation used in Django admin
@@ -62,6 +93,61 @@ class Donor(models.Model):
         """
         return f"{self.name} ({self.blood_group})"
 
+    def supply_key(self):
+        """
+        (city, blood_group) bucket this donor counts towards.
+        """
+        return (self.city, self.blood_group)
+
+    def is_eligible(self, when=None) -> bool:
+        """
+        True if the donor is out of any deferral period at `when` (default now).
+        """
+        return self.next_eligible_at is None or self.next_eligible_at <= (when or timezone.now())
+
+    def save(self, *args, **kwargs):
+        """
+        Save and move this donor between supply buckets atomically.
+
+        Eligibility fields are re-read from the row so a stale instance
+        cannot undo a donation recorded since it was loaded.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                row = (
+                    Donor.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("city", "blood_group", "last_donation_at", "next_eligible_at")
+                    .first()
+                )
+                if row:
+                    previous = row[:2]
+                    self.last_donation_at, self.next_eligible_at = row[2:]
+            super().save(*args, **kwargs)
+
+            if previous != self.supply_key():
+                if previous:
+                    DonorSupplyAggregate.apply_delta(*previous, -1)
+                DonorSupplyAggregate.apply_delta(*self.supply_key(), 1)
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete and leave the supply bucket of the row as stored, which a
+        stale instance may no longer describe.
+        """
+        with transaction.atomic():
+            previous = (
+                Donor.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("city", "blood_group")
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            if previous:
+                DonorSupplyAggregate.apply_delta(*previous, -1)
+        return result
+
 
 class Hospital(models.Model):
     """
@@ -79,14 +165,24 @@ class Hospital(models.Model):
     # Physical location or city
     location = models.CharField(max_length=150)
 
+    # Optional WGS84 coordinates for radius / nearest-donor queries
+    latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+
     # Hospital contact number
     contact = models.CharField(max_length=15)
 
     # Blood handling/storage capacity
     capacity = models.PositiveIntegerField()
 
-    # Audit fields
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Audit fields (created_at indexed for time-window queries)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -147,10 +243,14 @@ class Request(models.Model):
         default='pending'
     )
 
-    # Audit fields
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Audit fields (created_at indexed for time-window queries)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Count / sum / group-by questions in AI search (core/query_aggregates.py)
+        indexes = [models.Index(fields=["status", "blood_group"], name="request_status_group_idx")]
+
     def __str__(self):
         """
         Returns a concise summary of the request, useful for
@@ -160,3 +260,216 @@ class Request(models.Model):
             f"{self.patient_name} ({self.patient_age}) - "
             f"{self.blood_group} @ {self.hospital.name}"
         )
+
+    @staticmethod
+    def demand_contribution(hospital_id, blood_group, units, status):
+        """
+        ((hospital_id, blood_group), units) if the request counts as
+        open demand, else None. Only pending requests are open.
+        """
+        if status != "pending":
+            return None
+        return (hospital_id, blood_group), units
+
+    def save(self, *args, **kwargs):
+        """
+        Save and apply the change in pending demand atomically.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                row = (
+                    Request.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("hospital_id", "blood_group", "units_requested", "status")
+                    .first()
+                )
+                previous = row and Request.demand_contribution(*row)
+            super().save(*args, **kwargs)
+
+            current = Request.demand_contribution(
+                self.hospital_id, self.blood_group, self.units_requested, self.status
+            )
+            if previous != current:
+                if previous:
+                    BloodDemandAggregate.apply_delta(*previous[0], -1, -previous[1])
+                if current:
+                    BloodDemandAggregate.apply_delta(*current[0], 1, current[1])
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete and remove the pending demand of the row as stored.
+        """
+        with transaction.atomic():
+            row = (
+                Request.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("hospital_id", "blood_group", "units_requested", "status")
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            previous = row and Request.demand_contribution(*row)
+            if previous:
+                BloodDemandAggregate.apply_delta(*previous[0], -1, -previous[1])
+        return result
+
+
+class BloodDemandAggregate(models.Model):
+    """
+    Pending demand per (hospital, blood group).
+
+    Updated incrementally by Request.save()/delete(); rebuilt from
+    scratch by the `reconcile_aggregates` command to repair drift from
+    bulk operations that bypass save().
+    """
+
+    hospital = models.ForeignKey(
+        Hospital,
+        on_delete=models.CASCADE,
+        related_name="demand_aggregates"
+    )
+    blood_group = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_GROUP_CHOICES
+    )
+
+    # Number of pending requests and total units they ask for
+    pending_requests = models.IntegerField(default=0)
+    pending_units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hospital", "blood_group"],
+                name="unique_demand_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id}/{self.blood_group}: {self.pending_units} units"
+
+    @classmethod
+    def apply_delta(cls, hospital_id, blood_group, requests, units):
+        """
+        Add a signed change to one bucket, creating it on first use.
+        """
+        bucket, _ = cls.objects.get_or_create(hospital_id=hospital_id, blood_group=blood_group)
+        cls.objects.filter(pk=bucket.pk).update(
+            pending_requests=F("pending_requests") + requests,
+            pending_units=F("pending_units") + units,
+        )
+
+
+class DonorSupplyAggregate(models.Model):
+    """
+    Registered donor count per (city, blood group).
+
+    Updated incrementally by Donor.save()/delete(); see
+    BloodDemandAggregate for the reconciliation story.
+    """
+
+    city = models.CharField(max_length=100)
+    blood_group = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_GROUP_CHOICES
+    )
+    donor_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city", "blood_group"],
+                name="unique_supply_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.city}/{self.blood_group}: {self.donor_count} donors"
+
+    @classmethod
+    def apply_delta(cls, city, blood_group, donors):
+        """
+        Add a signed change to one bucket, creating it on first use.
+        """
+        bucket, _ = cls.objects.get_or_create(city=city, blood_group=blood_group)
+        cls.objects.filter(pk=bucket.pk).update(donor_count=F("donor_count") + donors)
+
+
+class Donation(models.Model):
+    """
+    One donation given by a donor.
+
+    Every save/delete (bulk queryset deletes and cascades included)
+    recomputes the donor's `last_donation_at` and `next_eligible_at` (the
+    latest end of a deferral period across the donor's history) in the
+    same transaction; see core/signals.py.
+    """
+
+    KIND_CHOICES = [
+        ('whole_blood', 'Whole blood'),
+        ('platelets', 'Platelets'),
+        ('plasma', 'Plasma'),
+        ('double_red_cells', 'Double red cells'),
+    ]
+
+    # Minimum days before the donor may give again, per donation kind
+    DEFERRAL_DAYS = {
+        'whole_blood': 56,
+        'platelets': 7,
+        'plasma': 28,
+        'double_red_cells': 112,
+    }
+
+    donor = models.ForeignKey(
+        Donor,
+        on_delete=models.CASCADE,
+        related_name="donations"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='whole_blood')
+    donated_at = models.DateTimeField(default=timezone.now)
+    units = models.PositiveIntegerField(default=1)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-donated_at"]
+        indexes = [models.Index(fields=["donor", "-donated_at"], name="donation_donor_date_idx")]
+
+    def __str__(self):
+        return f"{self.donor_id}: {self.kind} on {self.donated_at:%Y-%m-%d}"
+
+    def deferral_ends(self):
+        return self.donated_at + timedelta(days=self.DEFERRAL_DAYS[self.kind])
+
+    @classmethod
+    def refresh_donor(cls, donor_id):
+        """
+        Recompute a donor's eligibility fields from their donation history.
+        """
+        donations = list(cls.objects.filter(donor_id=donor_id).only("kind", "donated_at"))
+        Donor.objects.filter(pk=donor_id).update(
+            last_donation_at=max((d.donated_at for d in donations), default=None),
+            next_eligible_at=max((d.deferral_ends() for d in donations), default=None),
+        )
+
+
+class DataChange(models.Model):
+    """
+    One write to a Donor / Hospital / Request row or to the vector store.
+
+    The auto-increment id is a monotonically increasing data version:
+    workers read the highest id (one primary-key index lookup) and load
+    only the rows after the last one they applied. Old rows are pruned
+    after DATA_VERSION["RETENTION_HOURS"].
+    """
+
+    # kind: "donor", "hospital", "request", "vector" (vectors upserted),
+    # "vector.<record type>" (one vector deleted), "vector.reload"
+    kind = models.CharField(max_length=32)
+    record_id = models.BigIntegerField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.record_id or ''}{' deleted' if self.deleted else ''}"
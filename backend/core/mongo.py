@@ -1,45 +1,163 @@
 # core/mongo.py
-import os
+"""
+MongoDB vector-store backend.
+
+All Mongo connection handling (URI, pool size, timeouts) lives here;
+the rest of the system talks to `core.vectorstore.get_vector_store()`.
+"""
+
 import numpy as np
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient, UpdateOne
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = MongoClient(MONGO_URI)
-db = client["bloodbank_ai"]
-collection = db["vectors"]
+from core.vectorstore import VectorStore
 
-def insert(record_type: str, record_id: int, embedding: list, metadata: dict):
-    """
-    Insert a record into the vector store.
-    """
-    doc = {
-        "type": record_type,
-        "record_id": record_id,
-        "embedding": embedding,
-        "metadata": metadata,
-    }
-    collection.update_one(
-        {"type": record_type, "record_id": record_id},
-        {"$set": doc},
-        upsert=True
-    )
-
-def search(embedding: list, top_k: int = 5):
+
+def _as_list(embedding) -> list:
+    # numpy rows must become plain floats for BSON encoding
+    return embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+
+
+class MongoVectorStore(VectorStore):
     """
-    Naive vector search using cosine similarity.
+    Stores one document per record in a Mongo collection:
+    {type, record_id, embedding, metadata}. Store info lives in a
+    sibling "<COLLECTION>_info" collection as {_id: name, value}.
+
+    Options:
+    - URI, DATABASE, COLLECTION
+    - MAX_POOL_SIZE, SERVER_SELECTION_TIMEOUT_MS, CONNECT_TIMEOUT_MS
     """
-    results = []
-    query_vec = np.array(embedding)
-
-    for doc in collection.find():
-        vec = np.array(doc["embedding"])
-        sim = float(np.dot(vec, query_vec) / (np.linalg.norm(vec) * np.linalg.norm(query_vec) + 1e-9))
-        results.append({
-            "type": doc["type"],
-            "record_id": doc["record_id"],
-            "metadata": doc["metadata"],
-            "score": sim
-        })
-
-    results = sorted(results, key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+
+    def __init__(self, options: dict | None = None):
+        super().__init__(options)
+        self._connect()
+        self._indexed = False
+
+    def _connect(self):
+        opts = self.options
+        self.client = MongoClient(
+            opts.get("URI", "mongodb://localhost:27017"),
+            maxPoolSize=opts.get("MAX_POOL_SIZE", 50),
+            serverSelectionTimeoutMS=opts.get("SERVER_SELECTION_TIMEOUT_MS", 5000),
+            connectTimeoutMS=opts.get("CONNECT_TIMEOUT_MS", 5000),
+        )
+        database = self.client[opts.get("DATABASE", "bloodbank_ai")]
+        collection = opts.get("COLLECTION", "vectors")
+        self.collection = database[collection]
+        self.info_collection = database[f"{collection}_info"]
+
+    def after_fork(self):
+        # MongoClient is not fork-safe: the worker gets its own pool
+        super().after_fork()
+        self._connect()
+
+    def _ensure_index(self):
+        # Upserts match on (type, record_id); without an index each one scans
+        if not self._indexed:
+            self.collection.create_index(
+                [("type", ASCENDING), ("record_id", ASCENDING)],
+                unique=True,
+            )
+            self._indexed = True
+
+    def insert(self, record_type: str, record_id: int, embedding, metadata: dict):
+        """
+        Insert a record into the vector store.
+        """
+        self._ensure_index()
+        doc = {
+            "type": record_type,
+            "record_id": record_id,
+            "embedding": _as_list(embedding),
+            "metadata": metadata,
+        }
+        self.collection.update_one(
+            {"type": record_type, "record_id": record_id},
+            {"$set": doc},
+            upsert=True
+        )
+        self.mark_written()
+
+    def bulk_upsert(self, records: list) -> int:
+        """
+        Upsert many records in one round trip.
+        """
+        ops = [
+            UpdateOne(
+                {"type": record_type, "record_id": record_id},
+                {"$set": {
+                    "type": record_type,
+                    "record_id": record_id,
+                    "embedding": _as_list(embedding),
+                    "metadata": metadata,
+                }},
+                upsert=True,
+            )
+            for record_type, record_id, embedding, metadata in records
+        ]
+        if ops:
+            self._ensure_index()
+            self.collection.bulk_write(ops, ordered=False)
+            self.mark_written()
+        return len(ops)
+
+    def delete(self, record_type: str, record_id: int) -> bool:
+        result = self.collection.delete_one({"type": record_type, "record_id": record_id})
+        self.mark_written(deleted=(record_type, record_id))
+        return result.deleted_count > 0
+
+    def update_metadata(self, record_type: str, record_ids, values: dict) -> int:
+        """
+        One update_many over the (type, record_id) index; embeddings are
+        not rewritten.
+        """
+        record_ids = list(record_ids)
+        if not record_ids or not values:
+            return 0
+        result = self.collection.update_many(
+            {"type": record_type, "record_id": {"$in": record_ids}},
+            {"$set": {f"metadata.{key}": value for key, value in values.items()}},
+        )
+        self.mark_written()
+        return result.matched_count
+
+    def count(self, record_type: str | None = None) -> int:
+        query = {"type": record_type} if record_type else {}
+        return self.collection.count_documents(query)
+
+    def get_info(self) -> dict:
+        return {doc["_id"]: doc["value"] for doc in self.info_collection.find()}
+
+    def set_info(self, **values):
+        for name, value in values.items():
+            if value is None:
+                self.info_collection.delete_one({"_id": name})
+            else:
+                self.info_collection.replace_one({"_id": name}, {"value": value}, upsert=True)
+        self.mark_written(reload=True)
+
+    def clear(self):
+        self.collection.drop()
+        self.info_collection.drop()
+        self._indexed = False
+        self.mark_written(reload=True)
+
+    def load_vectors(self):
+        """
+        Fetch every stored vector.
+        """
+        records, rows = [], []
+        for doc in self.collection.find({}, {"_id": 0}):
+            rows.append(doc["embedding"])
+            records.append({
+                "type": doc["type"],
+                "record_id": doc["record_id"],
+                "metadata": doc["metadata"],
+            })
+
+        matrix = np.asarray(rows, dtype=np.float32)
+        return records, matrix
+
+    def close(self):
+        super().close()
+        self.client.close()
@@ -0,0 +1,254 @@
+# core/prefork.py
+"""
+Minimal pre-forking WSGI server (POSIX only).
+
+The parent binds one listening socket and forks `workers` children
+that accept on it and serve one request at a time. Whatever the caller
+loaded before serve() (embedding model, vector snapshot, indexes) is
+shared with the workers copy-on-write; `post_fork` runs in each worker
+to set up per-process state. The parent only supervises:
+- a worker that exits (crash or --max-requests recycling) is replaced
+- stop() sends SIGTERM; workers finish their current request and exit
+- workers that die straight after starting stop the server instead of
+  fork-looping
+
+See `python manage.py serve_ai`.
+"""
+
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+# A worker that dies faster than this after forking counts as a crash loop
+MIN_WORKER_LIFETIME = 1.0
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WorkerServer(WSGIServer):
+    """
+    wsgiref server accepting on an inherited, non-blocking listener.
+    """
+
+    def __init__(self, listener, app, access_log: bool = False):
+        handler = WSGIRequestHandler if access_log else QuietRequestHandler
+        super().__init__(listener.getsockname()[:2], handler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listener
+        self.server_address = listener.getsockname()[:2]
+        host, self.server_port = self.server_address
+        self.server_name = socket.getfqdn(host)
+        self.setup_environ()
+        self.set_app(app)
+        # handle_request() returns after this many seconds without traffic
+        self.timeout = 0.5
+        self.served = 0
+
+    def get_request(self):
+        # Every idle worker wakes for a new connection; the ones that lose
+        # the accept() race get BlockingIOError and go back to waiting
+        conn, address = self.socket.accept()
+        conn.setblocking(True)
+        return conn, address
+
+    def process_request(self, request, client_address):
+        super().process_request(request, client_address)
+        self.served += 1
+
+
+def memory_usage(pid: int):
+    """
+    {"rss", "pss", "uss"} in KiB from /proc/<pid>/smaps_rollup, or None
+    where that is unavailable. PSS splits shared pages between the
+    processes sharing them; USS counts only pages private to `pid`.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            # First line is the address range header
+            fields = dict(line.split(":", 1) for line in fh.read().splitlines()[1:] if ":" in line)
+    except OSError:
+        return None
+
+    def kib(name):
+        return int(fields.get(name, "0 kB").split()[0])
+
+    return {
+        "rss": kib("Rss"),
+        "pss": kib("Pss"),
+        "uss": kib("Private_Clean") + kib("Private_Dirty"),
+    }
+
+
+class PreforkServer:
+    def __init__(
+        self,
+        app,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: int = 2,
+        max_requests: int = 0,
+        post_fork=None,
+        access_log: bool = False,
+        backlog: int = 1024,
+        graceful_timeout: float = 10.0,
+        memory_report: float = 0.0,
+        log=None,
+    ):
+        self.app = app
+        self.host, self.port = host, port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.post_fork = post_fork
+        self.access_log = access_log
+        self.backlog = backlog
+        self.graceful_timeout = graceful_timeout
+        self.memory_report = memory_report
+        self.log = log or (lambda message: print(message, file=sys.stderr))
+        self.listener = None
+        self.children = {}  # pid -> (worker number, started at)
+        self.stopping = False
+        self._wake = threading.Event()
+
+    def bind(self):
+        """
+        Open the listening socket; with port 0 the chosen port is in self.port.
+        """
+        self.listener = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+
+    def stop(self):
+        self.stopping = True
+        self._wake.set()
+
+    # PARENT
+
+    def serve(self):
+        """
+        Fork the workers and supervise them until stop().
+        """
+        if self.listener is None:
+            self.bind()
+        for number in range(self.workers):
+            self._spawn(number)
+
+        last_report = time.monotonic()
+        try:
+            while not self.stopping:
+                self._reap()
+                if self.memory_report and time.monotonic() - last_report >= self.memory_report:
+                    self.report_memory()
+                    last_report = time.monotonic()
+                self._wake.wait(0.2)
+        finally:
+            self._shutdown()
+            self.listener.close()
+
+    def _spawn(self, number: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(number)
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (number, time.monotonic())
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            if pid not in self.children:
+                continue
+            number, started = self.children.pop(pid)
+            if self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and time.monotonic() - started < MIN_WORKER_LIFETIME:
+                self.log(f"Worker {number} (pid {pid}) failed on startup (exit {code}); stopping")
+                self.stop()
+                return
+            if code != 0:
+                self.log(f"Worker {number} (pid {pid}) exited with {code}; restarting")
+            self._spawn(number)
+
+    def _shutdown(self):
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.05)
+            else:
+                self.children.pop(pid, None)
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+    def report_memory(self):
+        """
+        Log RSS / PSS / USS of the parent and every worker.
+        """
+        rows = [("parent", os.getpid())] + [
+            (f"worker {number}", pid) for pid, (number, _) in sorted(self.children.items())
+        ]
+        totals = {"rss": 0, "pss": 0, "uss": 0}
+        for label, pid in rows:
+            usage = memory_usage(pid)
+            if usage is None:
+                return
+            for key in totals:
+                totals[key] += usage[key]
+            self.log(
+                f"{label:<10} pid {pid:<7} rss {usage['rss'] / 1024:7.1f} MiB  "
+                f"pss {usage['pss'] / 1024:7.1f} MiB  uss {usage['uss'] / 1024:7.1f} MiB"
+            )
+        self.log(
+            f"{'total':<10} {'':<11} rss {totals['rss'] / 1024:7.1f} MiB  "
+            f"pss {totals['pss'] / 1024:7.1f} MiB  uss {totals['uss'] / 1024:7.1f} MiB"
+        )
+
+    # WORKER
+
+    def _run_worker(self, number: int):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        # Ctrl-C reaches the whole process group; the parent coordinates
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        if self.post_fork is not None:
+            self.post_fork(number)
+
+        server = WorkerServer(self.listener, self.app, access_log=self.access_log)
+        while not stopping.is_set():
+            if self.max_requests and server.served >= self.max_requests:
+                break
+            server.handle_request()
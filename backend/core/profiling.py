@@ -0,0 +1,100 @@
+# core/profiling.py
+"""
+Opt-in per-request profiling.
+
+`ProfilingMiddleware` runs selected requests under cProfile and dumps
+the stats to settings.PROFILING["DIR"]. A request is profiled when:
+- it carries a valid signed `X-Profile` header (see `make_profile_token`),
+  so operators can profile one slow production query on demand, or
+- it is picked by the random SAMPLE_RATE
+
+Only paths under PROFILING["PATHS"] are considered (the API by default:
+AI search and the CRUD viewsets). cProfile allows one active profiler
+per process, so concurrent requests are simply not profiled.
+
+`python manage.py profile_report` aggregates the dumps into top-N hot
+functions.
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+TOKEN_SALT = "core.profiling"
+
+_profiler_lock = threading.Lock()
+
+
+def make_profile_token() -> str:
+    """
+    Signed value for the `X-Profile` header, valid for PROFILING["TOKEN_MAX_AGE"] seconds.
+    """
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign("profile")
+
+
+def valid_profile_token(token: str) -> bool:
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING.get("TOKEN_MAX_AGE", 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return value == "profile"
+
+
+def profile_filename(method: str, path: str, elapsed_ms: float) -> str:
+    """
+    `<epoch ms>-<METHOD>-<path slug>-<elapsed>ms.prof`
+    """
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return f"{int(time.time() * 1000)}-{method}-{slug}-{elapsed_ms:.0f}ms.prof"
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        config = settings.PROFILING
+        if not config.get("ENABLED"):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.directory = str(config["DIR"])
+        self.sample_rate = float(config.get("SAMPLE_RATE", 0.0))
+        self.paths = tuple(config.get("PATHS", ("/api/",)))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def should_profile(self, request) -> bool:
+        if not request.path.startswith(self.paths):
+            return False
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return valid_profile_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _profiler_lock.release()
+
+        filename = profile_filename(request.method, request.path, elapsed_ms)
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        response["X-Profile-File"] = filename
+        return response
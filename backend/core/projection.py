@@ -0,0 +1,131 @@
+# core/projection.py
+"""
+PCA projection of embeddings to fewer dimensions.
+
+MiniLM produces 384-d vectors; the blood-bank vocabulary is narrow
+enough that most of their variance lives in far fewer directions.
+Scanning 64/128-d vectors cuts scoring time and snapshot memory
+proportionally.
+
+Lifecycle:
+- `fit_projection` fits a PCA on a sample of the corpus, reports
+  top-k agreement with full-dimension search and saves the result to
+  settings.VECTOR_PROJECTION_PATH
+- `ingest_vectors` stores reduced vectors and embeds the projection
+  (with its version) in the vector store's info, so an index always
+  carries the exact projection its vectors were made with
+- Queries are projected by the store itself before scoring
+
+The fit is uncentered (truncated SVD, i.e. PCA without mean removal):
+search ranks by cosine similarity, and projecting onto the top right
+singular vectors preserves dot products between vectors, where
+centering first would shift every angle.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+
+class Projection:
+    def __init__(self, components, explained_variance: float = 0.0, model: str = ""):
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance = float(explained_variance)
+        self.model = model
+        self.version = hashlib.sha1(self.components.tobytes()).hexdigest()[:12]
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def input_dims(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, matrix, dims: int, model: str = "", seed: int = 0):
+        """
+        Uncentered PCA on the rows of `matrix` (samples x input dims).
+        """
+        from sklearn.decomposition import TruncatedSVD
+
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if dims >= min(matrix.shape):
+            raise ValueError(
+                f"Need more than {dims} samples and input dims to fit {dims} components "
+                f"(got {matrix.shape[0]} x {matrix.shape[1]})"
+            )
+        svd = TruncatedSVD(n_components=dims, algorithm="randomized", random_state=seed).fit(matrix)
+        return cls(svd.components_, svd.explained_variance_ratio_.sum(), model)
+
+    def transform(self, vectors):
+        """
+        float32 (n, dims) projection of (n, input dims) vectors.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.input_dims:
+            raise ValueError(
+                f"Projection expects {self.input_dims}-d vectors, got {vectors.shape[1]}-d"
+            )
+        return (vectors @ self.components.T).astype(np.float32)
+
+    # SERIALIZATION
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "model": self.model,
+            "explained_variance": self.explained_variance,
+            "components": self.components.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["components"], data.get("explained_variance", 0.0), data.get("model", ""))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as fh:
+            np.savez(
+                fh,
+                components=self.components,
+                explained_variance=self.explained_variance,
+                model=self.model,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Projection saved at `path`, or None if there is none.
+        """
+        if not path or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["components"], float(data["explained_variance"]), str(data["model"]))
+
+
+def _top_k(corpus, queries, k: int):
+    corpus = corpus / (np.linalg.norm(corpus, axis=1, keepdims=True) + 1e-9)
+    queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-9)
+    scores = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def retrieval_agreement(projection: Projection, corpus, queries, ks=(10, 50)) -> dict:
+    """
+    {k: mean overlap of projected top-k with full-dimension top-k}.
+    """
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    reduced_corpus = projection.transform(corpus)
+    reduced_queries = projection.transform(queries)
+
+    agreement = {}
+    for k in ks:
+        full = _top_k(corpus, queries, k)
+        reduced = _top_k(reduced_corpus, reduced_queries, k)
+        overlap = [len(set(a) & set(b)) / len(a) for a, b in zip(full, reduced)]
+        agreement[k] = float(np.mean(overlap))
+    return agreement
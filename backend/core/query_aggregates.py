@@ -0,0 +1,244 @@
+# core/query_aggregates.py
+"""
+Count / sum / group-by questions answered with SQL aggregates.
+
+"How many O+ donors are in Udaipur?" or "total units pending for A-
+requests" are not retrieval questions: vector search returns at most
+top_k rows, so its result count is not the answer. Such queries are
+recognised here and answered with one aggregate query instead:
+
+- count: number of donors / hospitals / requests matching the filters
+- sum: total `units_requested` (requests) or `capacity` (hospitals)
+- group by blood group, city or status ("by city", "per blood group")
+
+Pending-request and donor questions that only filter on blood group and
+city are read from the maintained rollup tables (BloodDemandAggregate,
+DonorSupplyAggregate); everything else runs against the base tables
+using their (blood_group, city) / (status, blood_group) / created_at
+indexes. Answers are cached for AI_AGGREGATE_CACHE_TTL seconds.
+"""
+
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from core.models import BloodDemandAggregate, Donor, DonorSupplyAggregate, Hospital, Request
+
+MODELS = {"donor": Donor, "hospital": Hospital, "request": Request}
+
+# entity -> field summed for "total units" / "total capacity"
+SUM_FIELDS = {"request": "units_requested", "hospital": "capacity"}
+
+# entity -> {plan key: model field}
+FIELDS = {
+    "donor": {"blood_group": "blood_group", "city": "city", "age": "age"},
+    "hospital": {"city": "location", "capacity": "capacity"},
+    "request": {
+        "blood_group": "blood_group",
+        "city": "hospital__location",
+        "status": "status",
+        "age": "patient_age",
+    },
+}
+
+GROUP_WORDS = {
+    "blood group": "blood_group",
+    "blood type": "blood_group",
+    "city": "city",
+    "location": "city",
+    "status": "status",
+}
+
+LABELS = {"blood_group": "blood group", "city": "city", "status": "status",
+          "age": "age", "capacity": "capacity", "created": "created",
+          "eligible": "eligible by"}
+
+COMPARISONS = {"gt": "gt", "lt": "lt", "eq": "exact"}
+
+
+def extract_aggregate_intent(query: str, now=None):
+    """
+    Detect an aggregation question.
+
+    Returns a JSON-friendly plan
+    {"op", "entity", "field", "group_by", "filters"} or None when the
+    query should go through semantic search.
+    """
+    from core.utils import (
+        extract_age_filter,
+        extract_blood_group,
+        extract_capacity_filter,
+        extract_city,
+        extract_eligibility,
+        extract_entity_type,
+        extract_status_filter,
+        extract_time_window,
+    )
+
+    q = query.lower()
+    total = re.search(
+        r"\b(?:total|sum of|how many)\s+(?:(?:blood|pending|requested)\s+)*(units|capacity)\b", q
+    )
+    if total:
+        op = "sum"
+        entity = "request" if total.group(1) == "units" else "hospital"
+    elif re.search(r"\b(?:how many|count|number of)\b", q):
+        op = "count"
+        entity = extract_entity_type(query)
+        if entity is None:
+            return None
+    else:
+        return None
+
+    group = re.search(r"\b(?:by|per|for each|each)\s+(blood group|blood type|city|location|status)\b", q)
+    group_by = GROUP_WORDS[group.group(1)] if group else None
+    if group_by is not None and group_by not in FIELDS[entity]:
+        return None
+
+    filters = {}
+    fields = FIELDS[entity]
+    if "blood_group" in fields and extract_blood_group(query):
+        filters["blood_group"] = extract_blood_group(query)
+    if "status" in fields and extract_status_filter(query):
+        filters["status"] = extract_status_filter(query)
+    if "age" in fields and extract_age_filter(query):
+        filters["age"] = list(extract_age_filter(query))
+    if "capacity" in fields and op == "count" and extract_capacity_filter(query):
+        filters["capacity"] = list(extract_capacity_filter(query))
+    city = extract_city(query)
+    if city:
+        filters["city"] = city
+
+    eligible_at = extract_eligibility(query, now=now)
+    if entity == "donor" and eligible_at:
+        filters["eligible"] = eligible_at.replace(second=0, microsecond=0).isoformat()
+
+    window = extract_time_window(query, now=now)
+    if window:
+        # Minute resolution keeps relative windows cacheable
+        filters["created"] = [
+            t and t.replace(second=0, microsecond=0).isoformat() for t in window
+        ]
+
+    return {
+        "op": op,
+        "entity": entity,
+        "field": SUM_FIELDS[entity] if op == "sum" else None,
+        "group_by": group_by,
+        "filters": filters,
+    }
+
+
+def _rollup(intent):
+    """
+    (queryset, value expression, group field) over a rollup table when
+    the plan can be answered from one, else None.
+    """
+    entity, filters, group_by = intent["entity"], intent["filters"], intent["group_by"]
+    lookups = {key: value for key, value in filters.items() if key in ("blood_group", "city")}
+
+    if entity == "donor" and intent["op"] == "count" and set(filters) <= {"blood_group", "city"}:
+        return DonorSupplyAggregate.objects.filter(**lookups), Sum("donor_count"), group_by
+
+    if (
+        entity == "request"
+        and filters.get("status") == "pending"
+        and set(filters) <= {"blood_group", "city", "status"}
+        and group_by != "status"
+    ):
+        if "city" in lookups:
+            lookups["hospital__location"] = lookups.pop("city")
+        value = Sum("pending_units") if intent["op"] == "sum" else Sum("pending_requests")
+        group = "hospital__location" if group_by == "city" else group_by
+        return BloodDemandAggregate.objects.filter(**lookups), value, group
+
+    return None
+
+
+def _base_query(intent):
+    """
+    (queryset, value expression, group field) over the entity's table.
+    """
+    entity, filters = intent["entity"], intent["filters"]
+    fields = FIELDS[entity]
+
+    conditions, lookups = [], {}
+    for key, value in filters.items():
+        if key in ("age", "capacity"):
+            comparison, number = value
+            lookups[f"{fields[key]}__{COMPARISONS[comparison]}"] = number
+        elif key == "created":
+            start, end = value
+            if start:
+                lookups["created_at__gte"] = start
+            if end:
+                lookups["created_at__lt"] = end
+        elif key == "eligible":
+            # Never donated, or the deferral has ended (next_eligible_at index)
+            conditions.append(Q(next_eligible_at__isnull=True) | Q(next_eligible_at__lte=value))
+        else:
+            lookups[fields[key]] = value
+
+    value = Sum(intent["field"]) if intent["op"] == "sum" else Count("id")
+    group = fields[intent["group_by"]] if intent["group_by"] else None
+    return MODELS[entity].objects.filter(*conditions, **lookups), value, group
+
+
+def run_aggregate(intent) -> dict:
+    """
+    {"value": total, "groups": [[label, value], ...] or None} for a plan
+    from `extract_aggregate_intent`, cached for AI_AGGREGATE_CACHE_TTL.
+    """
+    key = "ai-aggregate:" + hashlib.sha1(json.dumps(intent, sort_keys=True).encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    queryset, value, group = _rollup(intent) or _base_query(intent)
+    if group:
+        rows = (
+            queryset.values_list(group)
+            .annotate(value=value)
+            .order_by("-value", group)
+        )
+        groups = [[label, total or 0] for label, total in rows if total]
+        answer = {"value": sum(total for _, total in groups), "groups": groups}
+    else:
+        answer = {"value": queryset.aggregate(value=value)["value"] or 0, "groups": None}
+
+    cache.set(key, answer, settings.AI_AGGREGATE_CACHE_TTL)
+    return answer
+
+
+def aggregate_summary(intent, answer) -> str:
+    """
+    One-sentence answer in the style of `llm_summarize`.
+    """
+    nouns = {"donor": "donors", "hospital": "hospitals", "request": "requests"}
+    conditions = []
+    for key, value in intent["filters"].items():
+        if key in ("age", "capacity"):
+            comparison = {"gt": "above", "lt": "below", "eq": "="}[value[0]]
+            value = f"{comparison} {value[1]}"
+        elif key == "created":
+            start, end = value
+            value = f"{start or '…'} to {end or 'now'}"
+        conditions.append(f"{LABELS[key]} {value}")
+    scope = f" ({', '.join(conditions)})" if conditions else ""
+
+    if intent["op"] == "sum":
+        unit = "units requested" if intent["entity"] == "request" else "capacity"
+        headline = f"Total {unit} across {nouns[intent['entity']]}{scope}: {answer['value']}."
+    else:
+        headline = f"{answer['value']} {nouns[intent['entity']]} match{scope}."
+
+    if answer["groups"] is None:
+        return headline
+    if not answer["groups"]:
+        return headline + f" No {LABELS[intent['group_by']]} groups."
+    breakdown = ", ".join(f"{label} {value}" for label, value in answer["groups"])
+    return headline + f" By {LABELS[intent['group_by']]}: {breakdown}."
@@ -0,0 +1,137 @@
+# core/query_cache.py
+"""
+Semantic second-level cache for `vector_search` results.
+
+Operators phrase the same question many ways ("donors with O+ in
+Udaipur", "Udaipur O+ donors"). An exact-string cache misses these, so
+entries are matched on embedding similarity instead:
+
+- A lookup only considers entries whose parsed structured plan
+  (entity type, blood group, city, age, capacity, status, top_k) is
+  identical, so a near-identical sentence with a different filter
+  never reuses an answer
+- Among those, the most similar cached query embedding wins if its
+  cosine similarity is at least the configured threshold
+- Entries are tagged with the vector-store version; any write to the
+  store invalidates the whole cache
+- Size is bounded with LRU eviction; hits, misses, evictions and
+  invalidations are counted for the stats endpoint
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+
+class SemanticQueryCache:
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # entry id -> (plan key, unit vector, result)
+        self._by_plan = {}              # plan key -> {entry id: unit vector}
+        self._version = None
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(embedding):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        return vec / (np.linalg.norm(vec) + 1e-9)
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._by_plan.clear()
+            self._version = version
+
+    def lookup(self, embedding, plan_key, version):
+        """
+        Cached result for a near-duplicate query with the same plan, or None.
+        """
+        query = self._unit(embedding)
+        with self._lock:
+            self._check_version(version)
+
+            candidates = self._by_plan.get(plan_key)
+            if candidates:
+                ids = list(candidates)
+                sims = np.stack([candidates[i] for i in ids]) @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id = ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return copy.deepcopy(self._entries[entry_id][2])
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding, plan_key, version, result):
+        with self._lock:
+            self._check_version(version)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            vec = self._unit(embedding)
+            self._entries[entry_id] = (plan_key, vec, copy.deepcopy(result))
+            self._by_plan.setdefault(plan_key, {})[entry_id] = vec
+
+            while len(self._entries) > self.max_entries:
+                old_id, (old_plan, _, _) = self._entries.popitem(last=False)
+                plan_entries = self._by_plan.get(old_plan, {})
+                plan_entries.pop(old_id, None)
+                if not plan_entries:
+                    self._by_plan.pop(old_plan, None)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_plan.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            looked_up = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / looked_up if looked_up else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    """
+    Process-wide cache, or None when disabled in settings.
+    """
+    global _cache
+    config = settings.SEMANTIC_QUERY_CACHE
+    if not config.get("ENABLED", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticQueryCache(
+                    max_entries=config.get("MAX_ENTRIES", 512),
+                    threshold=config.get("THRESHOLD", 0.95),
+                )
+    return _cache
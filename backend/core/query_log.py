@@ -0,0 +1,171 @@
+# core/query_log.py
+"""
+Sampled log of production AI searches, for replay.
+
+When settings.QUERY_LOG["ENABLED"] is set, AISearchView appends one
+JSON line per sampled query to a size-rotated file:
+
+    {"ts", "query", "top_k", "plan", "results", "top_score", "timings_ms"}
+
+- plan: the structured filters the query was parsed into; relative
+  time phrases ("last 7 days", "this week", "eligible today") are
+  resolved against the fixed PLAN_NOW, so a plan compares equal when
+  replayed on another day
+- results: [type, record_id] pairs in rank order
+- timings_ms: per-stage durations (embed, filters, search, summary, total)
+
+`python manage.py replay_queries` re-runs a log against the current
+code and reports latency deltas and result-set differences.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+
+LOGGER_NAME = "core.query_log"
+
+# Stand-in for "now" when describing plans (a Monday, mid-morning UTC)
+PLAN_NOW = datetime(2000, 1, 3, 10, 0, tzinfo=dt_timezone.utc)
+
+_lock = threading.Lock()
+_configured = None  # (path, max_bytes, backups) the handler was built for
+
+
+class StageTimer:
+    """
+    Collects wall-clock milliseconds per named stage.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def finish(self) -> dict:
+        self.timings["total"] = (time.perf_counter() - self._start) * 1000
+        return self.timings
+
+
+def _logger():
+    """
+    Logger writing to QUERY_LOG["PATH"], rebuilt if the settings change.
+    """
+    global _configured
+    config = settings.QUERY_LOG
+    wanted = (
+        str(config["PATH"]),
+        config.get("MAX_BYTES", 10 * 1024 * 1024),
+        config.get("BACKUP_COUNT", 5),
+    )
+    logger = logging.getLogger(LOGGER_NAME)
+
+    if _configured != wanted:
+        with _lock:
+            if _configured != wanted:
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+                os.makedirs(os.path.dirname(os.path.abspath(wanted[0])), exist_ok=True)
+                handler = RotatingFileHandler(wanted[0], maxBytes=wanted[1], backupCount=wanted[2])
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _configured = wanted
+    return logger
+
+
+def should_log() -> bool:
+    config = settings.QUERY_LOG
+    if not config.get("ENABLED"):
+        return False
+    return random.random() < float(config.get("SAMPLE_RATE", 1.0))
+
+
+def describe_plan(query: str, filters: dict) -> dict:
+    """
+    JSON-friendly summary of how a query was parsed.
+    """
+    from core.utils import (
+        extract_age_filter,
+        extract_capacity_filter,
+        extract_eligibility,
+        extract_entity_type,
+        extract_geo_filter,
+        extract_status_filter,
+        extract_time_window,
+    )
+
+    window = extract_time_window(query, now=PLAN_NOW)
+    eligible_at = extract_eligibility(query, now=PLAN_NOW)
+    return {
+        "entity_type": extract_entity_type(query),
+        "filters": filters,
+        "age": extract_age_filter(query),
+        "capacity": extract_capacity_filter(query),
+        "status": extract_status_filter(query),
+        "geo": extract_geo_filter(query),
+        "time_window": [t and t.isoformat() for t in window] if window else None,
+        "eligible_at": eligible_at and eligible_at.isoformat(),
+    }
+
+
+def log_query(query: str, top_k: int, plan: dict, results: list, timings: dict):
+    entry = {
+        "ts": time.time(),
+        "query": query,
+        "top_k": top_k,
+        "plan": plan,
+        "results": [[r.get("type"), r.get("record_id")] for r in results],
+        "top_score": results[0].get("score") if results else None,
+        "timings_ms": {name: round(ms, 3) for name, ms in timings.items()},
+    }
+    _logger().info(json.dumps(entry, default=str))
+
+
+def log_files(path) -> list:
+    """
+    `path` and its rotated backups, oldest first.
+    """
+    path = str(path)
+    backups = []
+    n = 1
+    while os.path.exists(f"{path}.{n}"):
+        backups.append(f"{path}.{n}")
+        n += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_query_log(paths) -> list:
+    """
+    Entries from JSONL files, in file order; malformed lines are skipped.
+    """
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("query"):
+                    entries.append(entry)
+    return entries
@@ -0,0 +1,92 @@
+# core/result_cursor.py
+"""
+Server-side cursors over ranked AI search results.
+
+The first paged call of a query runs the full search once (up to
+AI_SEARCH_CURSOR["MAX_RESULTS"] ranked, filtered results) and keeps the
+list in the Django cache under a random token for AI_SEARCH_CURSOR["TTL"]
+seconds. Every later page is a slice of that list: no re-embedding and
+no re-scan.
+
+Cursors handed to clients are "<token>:<offset>". With several server
+processes (serve_ai, gunicorn) the cache backend must be shared between
+them (settings.CACHES), or a cursor only resolves in the process that
+created it.
+"""
+
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = "ai-cursor:"
+
+# Returned for every result whatever `fields` asks for
+RESULT_KEYS = ("type", "record_id", "score")
+
+
+def parse_fields(value):
+    """
+    Metadata field names from a list or a comma-separated string; None
+    (no projection) when absent. Raises ValueError for other types.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)) or not all(isinstance(f, str) for f in value):
+        raise ValueError("fields must be a list of metadata field names")
+    return [f.strip() for f in value if f.strip()]
+
+
+def project(results: list, fields) -> list:
+    """
+    Results with their metadata narrowed to `fields` (all when None).
+    """
+    if fields is None:
+        return results
+    return [
+        {
+            **{key: result.get(key) for key in RESULT_KEYS},
+            "metadata": {
+                name: value
+                for name, value in (result.get("metadata") or {}).items()
+                if name in fields
+            },
+        }
+        for result in results
+    ]
+
+
+def open_cursor(query: str, results: list, ai_summary: str) -> str:
+    """
+    Keep a ranked result list server-side; returns its token.
+    """
+    token = secrets.token_urlsafe(12)
+    cache.set(
+        KEY_PREFIX + token,
+        {"query": query, "results": results, "ai_summary": ai_summary},
+        settings.AI_SEARCH_CURSOR["TTL"],
+    )
+    return token
+
+
+def make_cursor(token: str, offset: int, total: int):
+    """
+    Client cursor for the page starting at `offset`, or None past the end.
+    """
+    return f"{token}:{offset}" if offset < total else None
+
+
+def read_cursor(cursor):
+    """
+    (token, saved search, offset) for a client cursor. Raises ValueError
+    when it is malformed, unknown or expired.
+    """
+    token, _, offset = str(cursor).rpartition(":")
+    if not token or not offset.isdigit():
+        raise ValueError("Malformed cursor")
+    saved = cache.get(KEY_PREFIX + token)
+    if saved is None:
+        raise ValueError("Cursor is unknown or has expired; run the query again")
+    return token, saved, int(offset)
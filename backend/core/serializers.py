@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Donor, Hospital, Request
+from .models import Donation, Donor, Hospital, Request
 
 
 class DonorSerializer(serializers.ModelSerializer):
@@ -18,6 +18,8 @@ class DonorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Donor
         fields = "__all__"
+        # Maintained from donation history (POST /donors/<id>/donations/)
+        read_only_fields = ["last_donation_at", "next_eligible_at"]
 
 
 class HospitalSerializer(serializers.ModelSerializer):
@@ -84,3 +86,17 @@ class RequestSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
+
+
+class DonationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Donation model.
+
+    The donor comes from the URL (/donors/<id>/donations/), so it is
+    read-only here; `donated_at` defaults to now.
+    """
+
+    class Meta:
+        model = Donation
+        fields = ["id", "donor", "kind", "donated_at", "units", "created_at"]
+        read_only_fields = ["donor", "created_at"]
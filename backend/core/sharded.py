@@ -0,0 +1,200 @@
+# core/sharded.py
+"""
+Sharded scatter-gather vector scoring across long-lived worker processes.
+
+- The normalized vector matrix is written once to a memory-mapped
+  float32 file (on /dev/shm when available) that every worker maps
+  read-only, so shards share one copy of the data
+- Each worker owns a contiguous row range and answers "search"
+  messages with its local top-k
+- The parent broadcasts the query batch, gathers per-shard top-k and
+  merges them with a heap
+
+This module only depends on numpy so spawned workers start without
+importing Django or torch.
+"""
+
+import heapq
+import multiprocessing
+import os
+import tempfile
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+# Linux tmpfs keeps the mapped matrix in RAM; fall back to the temp dir
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def normalize_rows(matrix):
+    """
+    Unit-normalize rows (float32) so a dot product is cosine similarity.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / (norms + 1e-9)
+
+
+def local_top_k(scores, k: int):
+    """
+    Top-k (scores, indices) per row of a (queries x vectors) score array.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def shard_worker(conn):
+    """
+    Worker loop: ("load", path, shape, lo, hi) maps a shard,
+    ("search", queries, k) returns local top-k, ("stop",) exits.
+    """
+    shard = None
+    offset = 0
+    while True:
+        msg = conn.recv()
+        try:
+            if msg[0] == "load":
+                _, path, shape, lo, hi = msg
+                if path is None:
+                    shard, offset = None, 0
+                else:
+                    full = np.memmap(path, dtype=np.float32, mode="r", shape=shape)
+                    shard, offset = full[lo:hi], lo
+                conn.send(("ok", None))
+            elif msg[0] == "search":
+                _, queries, k = msg
+                if shard is None:
+                    shard = np.empty((0, queries.shape[1]), dtype=np.float32)
+                scores, idx = local_top_k(queries @ shard.T, k)
+                conn.send(("ok", (scores, idx + offset)))
+            elif msg[0] == "stop":
+                conn.send(("ok", None))
+                return
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+@contextmanager
+def _single_threaded_blas():
+    """
+    Spawned shards inherit the environment at start; one BLAS thread
+    each keeps N shards from oversubscribing the cores.
+    """
+    keys = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+    saved = {key: os.environ.get(key) for key in keys}
+    for key in keys:
+        os.environ[key] = "1"
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class ShardPool:
+    """
+    A fixed set of shard worker processes over one shared matrix.
+    """
+
+    def __init__(self, shards: int):
+        ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._path = None
+        self.rows = 0
+        self.workers = []
+
+        with _single_threaded_blas():
+            for _ in range(shards):
+                parent_conn, child_conn = ctx.Pipe()
+                proc = ctx.Process(target=shard_worker, args=(child_conn,), daemon=True)
+                proc.start()
+                self.workers.append((proc, parent_conn))
+
+    def _call_all(self, messages):
+        for (_, conn), msg in zip(self.workers, messages):
+            conn.send(msg)
+        replies = []
+        for _, conn in self.workers:
+            kind, payload = conn.recv()
+            if kind == "error":
+                raise RuntimeError(f"Vector shard failed:\n{payload}")
+            replies.append(payload)
+        return replies
+
+    def load(self, matrix):
+        """
+        Publish a new matrix (rows must already be normalized).
+        """
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        path = os.path.join(SHM_DIR, f"bloodbank-vectors-{uuid.uuid4().hex}.f32")
+
+        if matrix.size:
+            mapped = np.memmap(path, dtype=np.float32, mode="w+", shape=matrix.shape)
+            mapped[:] = matrix
+            mapped.flush()
+            del mapped
+        else:
+            path = None
+
+        bounds = np.linspace(0, len(matrix), len(self.workers) + 1).astype(int)
+        with self._lock:
+            self._call_all([
+                ("load", path, matrix.shape, int(bounds[i]), int(bounds[i + 1]))
+                for i in range(len(self.workers))
+            ])
+            old, self._path, self.rows = self._path, path, len(matrix)
+
+        # Workers have switched; the old file can go (mappings stay valid)
+        if old and os.path.exists(old):
+            os.unlink(old)
+
+    def search_many(self, queries, top_k: int):
+        """
+        Global top-k (scores, row indices) per query, merged from shards.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        if not self.rows:
+            return [([], []) for _ in range(len(queries))]
+
+        with self._lock:
+            replies = self._call_all([("search", queries, top_k)] * len(self.workers))
+
+        merged = []
+        for q in range(len(queries)):
+            candidates = heapq.nlargest(
+                top_k,
+                (
+                    (float(score), int(idx))
+                    for scores, idxs in replies
+                    for score, idx in zip(scores[q], idxs[q])
+                ),
+            )
+            merged.append(([c[0] for c in candidates], [c[1] for c in candidates]))
+        return merged
+
+    def close(self):
+        with self._lock:
+            for proc, conn in self.workers:
+                try:
+                    conn.send(("stop",))
+                    conn.recv()
+                except (EOFError, OSError):
+                    pass
+                proc.join(timeout=5)
+            self.workers = []
+            if self._path and os.path.exists(self._path):
+                os.unlink(self._path)
+            self._path = None
@@ -0,0 +1,204 @@
+# core/signals.py
+"""
+Model signal handlers that keep in-process indexes in sync with writes.
+
+Index updates are deferred with `transaction.on_commit` so a rolled
+back write never leaks into an index. Each write is also logged with
+`record_change` inside its transaction, so other worker processes
+refresh the same entries (core/data_version.py).
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.data_version import record_change
+from core.eligibility import peek_eligibility_index
+from core.geo import peek_geo_index
+from core.ingest import sync_request_hospital
+from core.matching import peek_match_index
+from core.models import Donation, Donor, Hospital, Request
+from core.suggest import peek_suggest_index, record_labels
+from core.time_index import peek_time_index
+
+logger = logging.getLogger(__name__)
+
+
+def _suggest_upsert(source, record_id, row):
+    index = peek_suggest_index()
+    if index is not None:
+        index.upsert(source, record_id, record_labels(source, row))
+
+
+def _suggest_remove(source, record_id):
+    index = peek_suggest_index()
+    if index is not None:
+        index.remove(source, record_id)
+
+
+def _time_upsert(kind, record_id, created_at):
+    index = peek_time_index()
+    if index is not None and created_at is not None:
+        index.upsert(kind, record_id, created_at)
+
+
+def _time_remove(kind, record_id):
+    index = peek_time_index()
+    if index is not None:
+        index.remove(kind, record_id)
+
+
+@receiver(post_save, sender=Donor)
+def donor_saved(sender, instance, **kwargs):
+    donor_id, blood_group, city = instance.id, instance.blood_group, instance.city
+    lat, lon, created_at = instance.latitude, instance.longitude, instance.created_at
+    next_eligible_at = instance.next_eligible_at
+    labels = {"name": instance.name, "city": city, "blood_group": blood_group}
+
+    def update():
+        index = peek_match_index()
+        if index is not None:
+            index.upsert(donor_id, blood_group, city)
+        eligibility = peek_eligibility_index()
+        if eligibility is not None:
+            eligibility.upsert(donor_id, blood_group, city, next_eligible_at)
+        geo = peek_geo_index()
+        if geo is not None:
+            geo.upsert("donor", donor_id, lat, lon, blood_group)
+        _time_upsert("donor", donor_id, created_at)
+        _suggest_upsert("donor", donor_id, labels)
+
+    record_change("donor", donor_id)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Donor)
+def donor_deleted(sender, instance, **kwargs):
+    donor_id = instance.id
+
+    def update():
+        index = peek_match_index()
+        if index is not None:
+            index.remove(donor_id)
+        eligibility = peek_eligibility_index()
+        if eligibility is not None:
+            eligibility.remove(donor_id)
+        geo = peek_geo_index()
+        if geo is not None:
+            geo.remove("donor", donor_id)
+        _time_remove("donor", donor_id)
+        _suggest_remove("donor", donor_id)
+
+    record_change("donor", donor_id, deleted=True)
+    transaction.on_commit(update)
+
+
+# Hospital fields copied into Request vector metadata
+REQUEST_HOSPITAL_FIELDS = ("name", "location", "capacity")
+
+
+@receiver(pre_save, sender=Hospital)
+def hospital_saving(sender, instance, **kwargs):
+    instance._denormalized_before = None
+    if instance.pk:
+        instance._denormalized_before = (
+            Hospital.objects.filter(pk=instance.pk).values_list(*REQUEST_HOSPITAL_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Hospital)
+def hospital_saved(sender, instance, created, **kwargs):
+    hospital_id, lat, lon = instance.id, instance.latitude, instance.longitude
+    created_at = instance.created_at
+    before = getattr(instance, "_denormalized_before", None)
+    after = tuple(getattr(instance, field) for field in REQUEST_HOSPITAL_FIELDS)
+    requests_stale = not created and before is not None and before != after
+    labels = {"name": instance.name, "location": instance.location}
+
+    def update():
+        geo = peek_geo_index()
+        if geo is not None:
+            geo.upsert("hospital", hospital_id, lat, lon)
+        _time_upsert("hospital", hospital_id, created_at)
+        _suggest_upsert("hospital", hospital_id, labels)
+        if requests_stale:
+            # The hospital row has committed: a vector store outage must
+            # not turn the save into an error (ingest_vectors repairs it)
+            try:
+                sync_request_hospital(hospital_id)
+            except Exception:
+                logger.exception("Request vectors of hospital %s were not updated", hospital_id)
+
+    record_change("hospital", hospital_id)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Hospital)
+def hospital_deleted(sender, instance, **kwargs):
+    hospital_id = instance.id
+
+    def update():
+        geo = peek_geo_index()
+        if geo is not None:
+            geo.remove("hospital", hospital_id)
+        _time_remove("hospital", hospital_id)
+        _suggest_remove("hospital", hospital_id)
+
+    record_change("hospital", hospital_id, deleted=True)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Request)
+def request_saved(sender, instance, **kwargs):
+    request_id, created_at = instance.id, instance.created_at
+    labels = {"patient_name": instance.patient_name}
+
+    def update():
+        _time_upsert("request", request_id, created_at)
+        _suggest_upsert("request", request_id, labels)
+
+    record_change("request", request_id)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Request)
+def request_deleted(sender, instance, **kwargs):
+    request_id = instance.id
+
+    def update():
+        _time_remove("request", request_id)
+        _suggest_remove("request", request_id)
+
+    record_change("request", request_id, deleted=True)
+    transaction.on_commit(update)
+
+
+def _refresh_eligibility(donor_id):
+    index = peek_eligibility_index()
+    if index is None:
+        return
+    row = Donor.objects.filter(pk=donor_id).values_list(
+        "blood_group", "city", "next_eligible_at"
+    ).first()
+    if row is None:
+        index.remove(donor_id)
+    else:
+        index.upsert(donor_id, *row)
+
+
+@receiver(post_save, sender=Donation)
+def donation_saved(sender, instance, **kwargs):
+    donor_id = instance.donor_id
+    Donation.refresh_donor(donor_id)
+    record_change("donor", donor_id)
+    transaction.on_commit(lambda: _refresh_eligibility(donor_id))
+
+
+@receiver(post_delete, sender=Donation)
+def donation_deleted(sender, instance, **kwargs):
+    donor_id = instance.donor_id
+    Donation.refresh_donor(donor_id)
+    record_change("donor", donor_id)
+    transaction.on_commit(lambda: _refresh_eligibility(donor_id))
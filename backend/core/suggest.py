@@ -0,0 +1,272 @@
+# core/suggest.py
+"""
+In-memory autocomplete for the search box (GET /api/ai/suggest/).
+
+Completions come from donor names, patient names, hospital names, the
+cities of donors and hospitals, and blood groups. Every distinct label
+is indexed once per word, as the normalized text from that word to the
+end ("dino jackson" -> "dino jackson", "jackson"), in one sorted list
+per kind (so thousands of names never crowd out a city):
+- a prefix lookup is one bisect plus a scan of the matching run, so
+  "jack" finds "Dino Jackson" and "Jackson Road Clinic" alike
+- labels count the records carrying them; the count ranks cities and
+  blood groups by how many donors / hospitals they cover
+- ranking: labels starting with the prefix before mid-label matches,
+  then by count, then shorter and alphabetical
+- answers are memoized per (prefix, limit, kinds) until the next write,
+  so the short prefixes every operator types first are dictionary hits
+
+Built once per process (serve_ai warms it) and kept current by model
+signals and the data version (core/signals.py, core/data_version.py).
+Lookups never touch SQL, the vector store or the embedding model.
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+KINDS = ("donor", "patient", "hospital", "city", "blood_group")
+
+# Label kinds whose record ids are returned with a completion
+RECORD_KINDS = ("donor", "patient", "hospital")
+
+# Matching entries examined per kind and lookup; one- and two-letter
+# prefixes can match most names, so their ranking is over the first ones
+MAX_SCAN = 1000
+
+# Record ids listed per completion
+MAX_IDS = 5
+
+# Memoized answers kept between writes
+MEMO_SIZE = 4096
+
+# Sorts after every character `normalize` keeps
+_END = "\x7f"
+
+_UNSAFE = re.compile(r"[^a-z0-9+\- ]+")
+
+
+def normalize(text) -> str:
+    """
+    Lower-case, accent-free words separated by single spaces; "+" and
+    "-" survive so blood groups ("O+", "AB-") stay distinct.
+    """
+    text = str(text or "")
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(_UNSAFE.sub(" ", text.lower()).split())
+
+
+def record_labels(source: str, row) -> list:
+    """
+    (kind, label) pairs one record contributes: `row` is a dict of the
+    fields read for `source` ("donor", "hospital" or "request").
+    """
+    if source == "donor":
+        labels = [("donor", row["name"]), ("city", row["city"]), ("blood_group", row["blood_group"])]
+    elif source == "hospital":
+        labels = [("hospital", row["name"]), ("city", row["location"])]
+    else:
+        labels = [("patient", row["patient_name"])]
+    return [(kind, label) for kind, label in labels if normalize(label)]
+
+
+# Fields read per source, for builds and refreshes
+SOURCE_FIELDS = {
+    "donor": ("id", "name", "city", "blood_group"),
+    "hospital": ("id", "name", "location"),
+    "request": ("id", "patient_name"),
+}
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = {kind: [] for kind in KINDS}  # sorted (suffix, label, suffix is label start)
+        self.labels = {}   # (kind, normalized label) -> [display text, {(source, id)}]
+        self.records = {}  # (source, id) -> [(kind, normalized label)]
+        self._memo = {}    # (prefix, limit, kinds) -> results
+
+    @classmethod
+    def build(cls, rows_by_source: dict):
+        """
+        Build from {source: iterable of field dicts (see SOURCE_FIELDS)}.
+        """
+        index = cls()
+        for source, rows in rows_by_source.items():
+            for row in rows:
+                index._attach(source, row["id"], record_labels(source, row), sort=False)
+        for entries in index.entries.values():
+            entries.sort()
+        return index
+
+    # WRITES
+
+    def upsert(self, source: str, record_id: int, labels: list):
+        """
+        Replace the labels of one record with (kind, label) pairs.
+        """
+        with self._lock:
+            new = [(kind, normalize(label)) for kind, label in labels]
+            if self.records.get((source, record_id)) == new:
+                return
+            self._detach(source, record_id)
+            self._attach(source, record_id, labels)
+            self._memo.clear()
+
+    def remove(self, source: str, record_id: int):
+        with self._lock:
+            if (source, record_id) in self.records:
+                self._detach(source, record_id)
+                self._memo.clear()
+
+    def _attach(self, source, record_id, labels, sort=True):
+        keys = []
+        for kind, label in labels:
+            norm = normalize(label)
+            key = (kind, norm)
+            keys.append(key)
+            entry = self.labels.get(key)
+            if entry is None:
+                self.labels[key] = [str(label).strip(), {(source, record_id)}]
+                for suffix in _suffixes(norm):
+                    entry = (suffix, norm, suffix == norm)
+                    if sort:
+                        insort(self.entries[kind], entry)
+                    else:
+                        self.entries[kind].append(entry)
+            else:
+                entry[1].add((source, record_id))
+        self.records[(source, record_id)] = keys
+
+    def _detach(self, source, record_id):
+        for key in self.records.pop((source, record_id), ()):
+            entry = self.labels.get(key)
+            if entry is None:
+                continue
+            entry[1].discard((source, record_id))
+            if entry[1]:
+                continue
+            del self.labels[key]
+            kind, norm = key
+            entries = self.entries[kind]
+            for suffix in _suffixes(norm):
+                entry = (suffix, norm, suffix == norm)
+                pos = bisect_left(entries, entry)
+                if pos < len(entries) and entries[pos] == entry:
+                    del entries[pos]
+
+    # QUERIES
+
+    def suggest(self, prefix: str, limit: int = 8, kinds=None) -> list:
+        """
+        Ranked completions for `prefix`: dicts with text, type, count
+        and (for donors, patients and hospitals) record ids.
+        `kinds` optionally restricts the label kinds returned.
+        """
+        query = normalize(prefix)
+        if not query:
+            return []
+        memo_key = (query, limit, frozenset(kinds) if kinds is not None else None)
+        with self._lock:
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                return cached
+            matches = {}
+            for kind, entries in self.entries.items():
+                if kinds is not None and kind not in kinds:
+                    continue
+                lo = bisect_left(entries, (query,))
+                hi = min(bisect_left(entries, (query + _END,), lo), lo + MAX_SCAN)
+                for _, norm, at_start in entries[lo:hi]:
+                    key = (kind, norm)
+                    # A label matched at its start beats a match on a later word
+                    if at_start or key not in matches:
+                        matches[key] = at_start
+            ranked = heapq.nsmallest(
+                limit,
+                matches.items(),
+                key=lambda item: (
+                    not item[1], -len(self.labels[item[0]][1]), len(item[0][1]), item[0][1], item[0][0]
+                ),
+            )
+            results = []
+            for (kind, norm), _ in ranked:
+                display, members = self.labels[(kind, norm)]
+                result = {"text": display, "type": kind, "count": len(members)}
+                if kind in RECORD_KINDS:
+                    result["ids"] = sorted(record_id for _, record_id in members)[:MAX_IDS]
+                results.append(result)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[memo_key] = results
+        return results
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def _suffixes(norm: str):
+    """
+    The label from each word start: "dino jackson" -> "dino jackson", "jackson".
+    """
+    starts = [0] + [m.end() for m in re.finditer(" ", norm)]
+    return {norm[start:] for start in starts}
+
+
+def refresh_records(source: str, record_ids):
+    """
+    Re-read some records of one source into a built index (one query).
+    """
+    index = peek_suggest_index()
+    if index is None:
+        return
+    from core.models import Donor, Hospital, Request
+
+    model = {"donor": Donor, "hospital": Hospital, "request": Request}[source]
+    rows = {row["id"]: row for row in model.objects.filter(id__in=record_ids).values(*SOURCE_FIELDS[source])}
+    for record_id in record_ids:
+        row = rows.get(record_id)
+        if row is None:
+            index.remove(source, record_id)
+        else:
+            index.upsert(source, record_id, record_labels(source, row))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """
+    Process-wide index, built from the Donor, Hospital and Request tables on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from core.models import Donor, Hospital, Request
+
+                _index = SuggestIndex.build({
+                    source: model.objects.values(*SOURCE_FIELDS[source]).iterator(chunk_size=10000)
+                    for source, model in (("donor", Donor), ("hospital", Hospital), ("request", Request))
+                })
+    return _index
+
+
+def peek_suggest_index():
+    """
+    The index if it has been built, else None (signals skip unbuilt indexes).
+    """
+    return _index
+
+
+def reset_suggest_index():
+    """
+    Drop the process-wide index so the next use rebuilds it.
+    """
+    global _index
+    with _index_lock:
+        _index = None
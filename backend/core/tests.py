@@ -1,12 +1,68 @@
 # core/tests.py
 
-from django.test import TestCase
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from unittest.mock import patch
 
-from .models import Donor, Hospital, Request
+from .admission import (
+    AdmissionController,
+    DeadlineExceeded,
+    Overloaded,
+    get_admission_controller,
+    reset_admission_controller,
+)
+from .allocation import greedy_allocation
+from .data_version import get_data_version_watcher, reset_data_version_watcher
+from .eligibility import get_eligibility_index, reset_eligibility_index
+from .embeddings import load_embedding_model
+from .embedding_cache import EmbeddingCache, cache_key
+from .geo import get_geo_index, haversine_km, reset_geo_index
+from .ingest import encode_tasks, request_document, shard_id_ranges
+from .matching import (
+    compatible_donor_groups,
+    get_match_index,
+    reset_match_index,
+)
+from .models import (
+    BloodDemandAggregate,
+    Donation,
+    Donor,
+    DonorSupplyAggregate,
+    Hospital,
+    Request,
+)
+from .local_store import LocalVectorStore
+from .prefork import PreforkServer
+from .profiling import make_profile_token
+from .projection import Projection, retrieval_agreement
+from .query_cache import get_query_cache
 from .serializers import RequestSerializer
+from .suggest import get_suggest_index, reset_suggest_index
+from .time_index import reset_time_index
+from .utils import extract_eligibility, extract_time_window, vector_bulk_upsert, vector_search
+from .vectorstore import get_vector_store, reset_vector_store
+
+# Throwaway embedded vector store so tests never need MongoDB
+LOCAL_VECTOR_STORE = {
+    "BACKEND": "core.local_store.LocalVectorStore",
+    "OPTIONS": {"PATH": ":memory:"},
+}
 
 
 class CoreAppTests(TestCase):
@@ -40,6 +96,20 @@ class CoreAppTests(TestCase):
 
         self.client = APIClient()
 
+        # Process-wide indexes must not leak between test cases
+        reset_match_index()
+        reset_geo_index()
+        reset_time_index()
+        reset_eligibility_index()
+        reset_admission_controller()
+        reset_suggest_index()
+        reset_data_version_watcher()
+        # Prime the cursor so the middleware's next version read is a
+        # CHECK_INTERVAL away and query-count assertions hold
+        get_data_version_watcher().check(force=True)
+        get_query_cache().clear()
+        cache.clear()
+
     # MODEL TESTS
 
     def test_models_str(self):
@@ -49,6 +119,181 @@ class CoreAppTests(TestCase):
         self.assertIn(self.request_record.patient_name, str(self.request_record))
         self.assertIn(str(self.request_record.patient_age), str(self.request_record))
 
+    # INGESTION TESTS
+
+    def test_shard_id_ranges_cover_range_without_overlap(self):
+        """Primary-key shards are contiguous and cover every id once."""
+        ranges = shard_id_ranges(1, 10, 3)
+
+        self.assertEqual(ranges, [(1, 4), (5, 7), (8, 10)])
+        self.assertEqual(shard_id_ranges(5, 6, 4), [(5, 5), (6, 6)])
+        self.assertEqual(shard_id_ranges(None, None, 4), [])
+
+    def test_ingest_with_two_workers_matches_single_worker(self):
+        """Spawned workers encode every record exactly as the in-process path does."""
+        for i in range(4):
+            Donor.objects.create(
+                name=f"Donor {i}", age=30 + i, blood_group="B+", contact=f"600000000{i}", city="Jaipur",
+            )
+        Hospital.objects.create(name="Pink City Hospital", location="Jaipur", contact="7", capacity=80)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Workers are fresh interpreters: give them a file copy of the test database
+            connection.ensure_connection()
+            copy = sqlite3.connect(os.path.join(tmp, "db.sqlite3"))
+            copy.executescript("\n".join(connection.connection.iterdump()))
+            copy.close()
+
+            store = {
+                "BACKEND": "core.local_store.LocalVectorStore",
+                "OPTIONS": {"PATH": os.path.join(tmp, "vectors.sqlite3")},
+            }
+            env = {"DATABASE_PATH": os.path.join(tmp, "db.sqlite3"), "EMBEDDING_MODEL": "stub"}
+            runs = []
+            with patch.dict(os.environ, env), override_settings(
+                EMBEDDING_MODEL="stub", EMBEDDING_CACHE_DIR="", VECTOR_STORE=store,
+            ), patch(
+                "core.management.commands.ingest_vectors.embedding_model", load_embedding_model("stub"),
+            ):
+                reset_vector_store()
+                try:
+                    for workers in ("1", "2"):
+                        out = StringIO()
+                        call_command("ingest_vectors", "--workers", workers, "--no-projection", stdout=out)
+                        records, matrix = get_vector_store().load_vectors()
+                        runs.append({
+                            (r["type"], r["record_id"]): (vec.copy(), r["metadata"])
+                            for r, vec in zip(records, matrix)
+                        })
+                        self.assertEqual(get_vector_store().count(), 8)
+                finally:
+                    reset_vector_store()
+
+        self.assertIn("with 2 worker(s)", out.getvalue())
+        single, multi = runs
+        self.assertEqual(set(single), set(multi))
+        self.assertEqual(len(single), 8)
+        for key in [("donor", self.donor.id), ("hospital", self.hospital.id), ("request", self.request_record.id)]:
+            np.testing.assert_allclose(multi[key][0], single[key][0], rtol=1e-6)
+            self.assertEqual(multi[key][1], single[key][1])
+
+    def test_request_document_includes_hospital(self):
+        """Request documents carry the hospital name in text and metadata."""
+        doc, metadata = request_document(self.request_record)
+
+        self.assertIn(self.hospital.name, doc)
+        self.assertEqual(metadata["hospital"], self.hospital.name)
+        self.assertEqual(metadata["units_requested"], 45)
+
+    # AGGREGATE TESTS
+
+    def test_demand_aggregate_follows_request_lifecycle(self):
+        """Pending units move with status, units and deletes."""
+        bucket = BloodDemandAggregate.objects.get(hospital=self.hospital, blood_group="A-")
+        self.assertEqual((bucket.pending_requests, bucket.pending_units), (1, 45))
+
+        self.request_record.units_requested = 5
+        self.request_record.save()
+        bucket.refresh_from_db()
+        self.assertEqual(bucket.pending_units, 5)
+
+        self.request_record.status = "fulfilled"
+        self.request_record.save()
+        bucket.refresh_from_db()
+        self.assertEqual((bucket.pending_requests, bucket.pending_units), (0, 0))
+
+    def test_supply_aggregate_moves_donor_between_cities(self):
+        """Changing a donor's city moves one count between buckets."""
+        self.donor.city = "Jaipur"
+        self.donor.save()
+
+        counts = dict(
+            DonorSupplyAggregate.objects.values_list("city", "donor_count")
+        )
+        self.assertEqual(counts, {"Udaipur": 0, "Jaipur": 1})
+
+        self.donor.delete()
+        self.assertEqual(
+            DonorSupplyAggregate.objects.get(city="Jaipur").donor_count, 0
+        )
+
+    def test_deleting_a_stale_instance_updates_the_stored_buckets(self):
+        """Deletes decrement the buckets of the row as stored, not of a stale copy."""
+        stale_donor = Donor.objects.get(pk=self.donor.pk)
+        stale_request = Request.objects.get(pk=self.request_record.pk)
+        self.donor.city = "Jaipur"
+        self.donor.save()
+        self.request_record.blood_group = "B+"
+        self.request_record.save()
+
+        stale_donor.delete()
+        stale_request.delete()
+
+        counts = dict(DonorSupplyAggregate.objects.values_list("city", "donor_count"))
+        self.assertEqual(counts, {"Udaipur": 0, "Jaipur": 0})
+        pending = dict(BloodDemandAggregate.objects.values_list("blood_group", "pending_units"))
+        self.assertEqual(pending, {"A-": 0, "B+": 0})
+
+    def test_summary_endpoint_and_reconcile(self):
+        """Summary serves aggregates; reconcile repairs bulk-update drift."""
+        Request.objects.filter(pk=self.request_record.pk).update(units_requested=10)
+        call_command("reconcile_aggregates", stdout=StringIO())
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse("stats-summary"))
+
+        body = resp.json()
+        self.assertEqual(body["demand"][0]["pending_units"], 10)
+        self.assertEqual(body["demand"][0]["hospital"], self.hospital.name)
+        self.assertEqual(
+            body["supply"], [{"city": "Udaipur", "blood_group": "O+", "donor_count": 1}]
+        )
+
+    def test_embedding_cache_roundtrip_and_gc(self):
+        """Cached vectors survive reopen; gc keeps the most recent entries."""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(tmp)
+            keys = [cache_key("m", f"doc {i}") for i in range(3)]
+            cache.put_many(keys, np.eye(3, dtype=np.float32))
+            cache.touch(keys[2:])
+            cache.close()
+
+            cache = EmbeddingCache(tmp)
+            found = cache.get_many(keys + [cache_key("other-model", "doc 0")])
+            self.assertEqual(len(found), 3)
+            np.testing.assert_array_equal(found[keys[1]], [0, 1, 0])
+            self.assertAlmostEqual(cache.hit_rate(), 0.75)
+
+            self.assertEqual(cache.gc(max_entries=1), 2)
+            self.assertEqual(list(cache.get_many(keys)), [keys[2]])
+            self.assertEqual(os.path.getsize(cache.vectors_path), 3 * 4)
+            cache.close()
+
+    def test_encode_tasks_only_encodes_cache_misses(self):
+        """Documents already in the cache never reach the model."""
+        class CountingModel:
+            encoded = []
+
+            def encode(self, docs, batch_size=32):
+                self.encoded.extend(docs)
+                return np.ones((len(docs), 2), dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(tmp)
+            doc, _ = request_document(self.request_record)
+            cache.put_many([cache_key("m", doc)], np.array([[5, 5]], dtype=np.float32))
+
+            model, chunks = CountingModel(), []
+            tasks = [("donor", self.donor.id, self.donor.id),
+                     ("request", self.request_record.id, self.request_record.id)]
+            encode_tasks(model, tasks, 10, chunks.append, model_name="m", cache=cache)
+            cache.close()
+
+        self.assertEqual(len(model.encoded), 1)
+        self.assertIn("Donor:", model.encoded[0])
+        self.assertEqual(chunks[1][5], [True])
+        np.testing.assert_array_equal(chunks[1][2][0], [5, 5])
+
     # SERIALIZER TESTS
 
     def test_request_serializer_hospital_name(self):
@@ -70,8 +315,443 @@ class CoreAppTests(TestCase):
         names = [d["name"] for d in resp.json()]
         self.assertIn(self.donor.name, names)
 
+    def test_hospital_update_survives_a_vector_store_outage(self):
+        """A failed request-vector sync is logged; the committed hospital update still succeeds."""
+        url = reverse("hospital-detail", args=[self.hospital.id])
+        payload = {"name": "City Hospital", "location": "Jaipur", "contact": "9999999999", "capacity": 200}
+        store_down = patch("core.vectorstore.get_vector_store", side_effect=ConnectionError("store down"))
+        with store_down, self.assertLogs("core.signals", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.put(url, payload, format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        self.hospital.refresh_from_db()
+        self.assertEqual(self.hospital.location, "Jaipur")
+
+    # EXPORT TESTS
+
+    def test_export_donors_csv_applies_parsed_filters(self):
+        """CSV export streams only donors matching filters parsed from q."""
+        Donor.objects.create(
+            name="Other Donor", age=30, blood_group="A+",
+            contact="7777777777", city="Jaipur",
+        )
+        url = reverse("export", args=["donors"])
+        resp = self.client.get(url, {"q": "O+ donors in Udaipur", "format": "csv"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        lines = b"".join(resp.streaming_content).decode().strip().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "name", "age"])
+        self.assertEqual(len(lines), 2)
+        self.assertIn(self.donor.name, lines[1])
+
+    def test_export_requests_ndjson_filters_by_hospital_city(self):
+        """NDJSON export maps the city filter onto the request's hospital."""
+        url = reverse("export", args=["requests"])
+        resp = self.client.get(url, {"city": "Udaipur,Jaipur", "format": "ndjson"})
+
+        self.assertEqual(resp.status_code, 200)
+        rows = [
+            json.loads(line)
+            for line in b"".join(resp.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["hospital"], self.hospital.name)
+
+        resp = self.client.get(url, {"city": "Jaipur", "format": "ndjson"})
+        self.assertEqual(b"".join(resp.streaming_content), b"")
+
+    def test_export_keeps_commas_in_a_place_named_in_q(self):
+        """A location parsed from q is one place even when it contains a comma."""
+        hospital = Hospital.objects.create(
+            name="Sector Clinic", location="Sector 5, Jodhpur", contact="5555555555", capacity=10,
+        )
+        url = reverse("export", args=["hospitals"])
+        resp = self.client.get(url, {"q": "hospitals in Sector 5, Jodhpur", "format": "ndjson"})
+
+        self.assertEqual(resp.status_code, 200)
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [hospital.id])
+
+    def test_export_rejects_bad_numeric_filter(self):
+        """Malformed numeric filters return 400 instead of streaming."""
+        url = reverse("export", args=["donors"])
+        resp = self.client.get(url, {"age_gt": "old"})
+
+        self.assertEqual(resp.status_code, 400)
+
+    # PROFILING TESTS
+
+    def test_profiling_middleware_and_report(self):
+        """Signed X-Profile requests are profiled; profile_report aggregates them."""
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            PROFILING={"ENABLED": True, "DIR": tmp, "SAMPLE_RATE": 0, "PATHS": ("/api/",)}
+        ):
+            client = APIClient()
+            url = reverse("donor-list")
+
+            resp = client.get(url, HTTP_X_PROFILE="forged:token")
+            self.assertNotIn("X-Profile-File", resp)
+
+            resp = client.get(url, HTTP_X_PROFILE=make_profile_token())
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(os.path.exists(os.path.join(tmp, resp["X-Profile-File"])))
+            self.assertEqual(len(os.listdir(tmp)), 1)
+
+            out = StringIO()
+            call_command("profile_report", "--path", "donors", "--limit", "10", stdout=out)
+            self.assertIn("1 profile(s)", out.getvalue())
+            self.assertIn("(list)", out.getvalue())
+
+    # MATCHING TESTS
+
+    def test_loadtest_runs_offline_with_stub_model(self):
+        """The stub model is deterministic and loadtest reports every route."""
+        model = load_embedding_model("stub")
+        a, b = model.encode(["O+ donors in Udaipur", "O+ donors in Udaipur"])
+        self.assertTrue(np.allclose(a, b))
+        self.assertAlmostEqual(float(np.linalg.norm(a)), 1.0, places=5)
+
+        out = StringIO()
+        call_command(
+            "loadtest", "--concurrency", "1,2", "--requests", "8",
+            "--mix", "donors=1,hospitals=1", stdout=out,
+        )
+        report = out.getvalue()
+        self.assertIn("donors", report)
+        self.assertIn("hospitals", report)
+        self.assertIn("Peak throughput", report)
+
+    def test_prefork_server_serves_and_recycles_workers(self):
+        """Forked workers answer on the shared socket and are replaced after --max-requests."""
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [str(os.getpid()).encode()]
+
+        server = PreforkServer(app, port=0, workers=2, max_requests=1, log=lambda message: None)
+        server.bind()
+        supervisor = threading.Thread(target=server.serve)
+        supervisor.start()
+        try:
+            pids = set()
+            for _ in range(4):
+                with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/", timeout=10) as resp:
+                    pids.add(int(resp.read()))
+        finally:
+            server.stop()
+            supervisor.join(timeout=15)
+
+        self.assertEqual(len(pids), 4)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(server.children, {})
+
+    def test_geo_nearby_and_nearest_donors(self):
+        """Radius and k-nearest queries follow coordinates, writes and compatibility."""
+        self.hospital.latitude, self.hospital.longitude = 24.5854, 73.7125
+        self.hospital.save()
+        # ~4 km away in a neighbouring town, but a different city string
+        near = Donor.objects.create(
+            name="Near", age=30, blood_group="A-", contact="1", city="Debari",
+            latitude=24.6150, longitude=73.7300,
+        )
+        far = Donor.objects.create(
+            name="Far", age=30, blood_group="O-", contact="2", city="Jaipur",
+            latitude=26.9124, longitude=75.7873,
+        )
+        Donor.objects.create(
+            name="Incompatible", age=30, blood_group="B+", contact="3", city="Udaipur",
+            latitude=24.5860, longitude=73.7130,
+        )
+
+        url = reverse("hospital-nearby-donors", args=[self.hospital.id])
+        resp = self.client.get(url, {"radius_km": 10, "blood_group": "A-"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r["name"] for r in resp.data["results"]], ["Near"])
+        self.assertLess(resp.data["results"][0]["distance_km"], 5)
+
+        resp = self.client.get(
+            reverse("request-nearest-donors", args=[self.request_record.id]), {"k": 5}
+        )
+        self.assertEqual([r["name"] for r in resp.data["results"]], ["Near", "Far"])
+
+        # Moving a donor is picked up by the already-built index
+        far.latitude, far.longitude = 24.5900, 73.7100
+        with self.captureOnCommitCallbacks(execute=True):
+            far.save()
+        hits = get_geo_index().within("donor", 24.5854, 73.7125, 2)
+        self.assertIn(far.id, [donor_id for _, donor_id in hits])
+        self.assertNotIn(near.id, [donor_id for _, donor_id in hits])
+        self.assertAlmostEqual(haversine_km(24.5854, 73.7125, 24.6150, 73.7300), 3.77, places=1)
+
+        resp = self.client.get(url, {"radius_km": "x"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_extract_time_window(self):
+        """Relative and absolute time expressions become [start, end) windows."""
+        now = datetime(2024, 5, 15, 13, 30, tzinfo=dt_timezone.utc)  # a Wednesday
+
+        def day(*args):
+            return datetime(*args, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(
+            extract_time_window("pending requests in the last 24 hours", now),
+            (now - timedelta(hours=24), None),
+        )
+        self.assertEqual(
+            extract_time_window("donors from the past two weeks", now)[0],
+            now - timedelta(weeks=2),
+        )
+        self.assertEqual(
+            extract_time_window("donors registered this week", now), (day(2024, 5, 13), None)
+        )
+        self.assertEqual(
+            extract_time_window("requests yesterday", now), (day(2024, 5, 14), day(2024, 5, 15))
+        )
+        self.assertEqual(
+            extract_time_window("requests between 2024-01-01 and 2024-01-31", now),
+            (day(2024, 1, 1), day(2024, 2, 1)),
+        )
+        self.assertEqual(extract_time_window("donors before 2024-03-01", now), (None, day(2024, 3, 1)))
+        self.assertIsNone(extract_time_window("O+ donors in Udaipur", now))
+
+        # Export applies the same window on the indexed column
+        Donor.objects.filter(pk=self.donor.pk).update(created_at=now - timedelta(days=30))
+        recent = Donor.objects.create(
+            name="Recent", age=30, blood_group="O+", contact="1", city="Udaipur"
+        )
+        resp = self.client.get(
+            reverse("export", args=["donors"]),
+            {"q": "donors from the last 7 days", "format": "ndjson"},
+        )
+        rows = [json.loads(line) for line in b"".join(resp.streaming_content).splitlines()]
+        self.assertEqual([r["id"] for r in rows], [recent.id])
+
+    def test_compatible_donor_groups(self):
+        """ABO/Rh rules: AB+ receives from all, O- only from O-."""
+        self.assertEqual(len(compatible_donor_groups("AB+")), 8)
+        self.assertEqual(compatible_donor_groups("O-"), ["O-"])
+        self.assertEqual(compatible_donor_groups("A-"), ["A-", "O-"])
+        self.assertEqual(compatible_donor_groups("AB+")[0], "AB+")
+        self.assertEqual(compatible_donor_groups("AB+")[-1], "O-")
+
+    def test_request_matches_ranks_same_city_first(self):
+        """Compatible donors in the hospital's city come before others."""
+        local = Donor.objects.create(
+            name="Local O Neg", age=30, blood_group="O-",
+            contact="1111111111", city="Udaipur",
+        )
+        remote = Donor.objects.create(
+            name="Remote A Neg", age=31, blood_group="A-",
+            contact="2222222222", city="Jaipur",
+        )
+        Donor.objects.create(
+            name="Incompatible", age=32, blood_group="B+",
+            contact="3333333333", city="Udaipur",
+        )
+
+        url = reverse("request-matches", args=[self.request_record.id])
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual(body["total_compatible"], 2)
+        self.assertEqual([r["id"] for r in body["results"]], [local.id, remote.id])
+        self.assertTrue(body["results"][0]["same_city"])
+        self.assertFalse(body["results"][1]["same_city"])
+        self.assertTrue(body["results"][1]["exact_match"])
+
+        self.assertEqual([r["id"] for r in self.client.get(url, {"limit": 1}).json()["results"]], [local.id])
+        for bad in ("0", "-5", "many"):
+            self.assertEqual(self.client.get(url, {"limit": bad}).status_code, 400)
+
+    def test_match_index_follows_donor_writes(self):
+        """Signals keep a built index in sync after commit."""
+        index = get_match_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            donor = Donor.objects.create(
+                name="New A Neg", age=40, blood_group="A-",
+                contact="4444444444", city="Udaipur",
+            )
+        ranked = index.match("A-", "Udaipur")["ranked"]
+        self.assertEqual(ranked[0][0], donor.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            donor.delete()
+        self.assertEqual(index.match("A-", "Udaipur")["ranked"], [])
+
+    def test_data_version_brings_other_workers_indexes_up_to_date(self):
+        """Writes whose on_commit ran elsewhere reach this worker as a delta."""
+        match, eligibility = get_match_index(), get_eligibility_index()
+        watcher = get_data_version_watcher()
+        self.assertFalse(watcher.check(force=True))
+
+        # Written by "another worker": no on_commit callbacks run here
+        donor = Donor.objects.create(
+            name="Remote A Neg", age=40, blood_group="A-", contact="4444444444", city="Udaipur",
+        )
+        self.assertEqual(match.match("A-", "Udaipur")["ranked"], [])
+        self.assertFalse(watcher.check())  # rate-limited
+
+        self.assertTrue(watcher.check(force=True))
+        self.assertEqual(match.match("A-", "Udaipur")["ranked"][0][0], donor.id)
+        self.assertEqual(watcher.stats["full_rebuilds"], 0)
+
+        Donation.objects.create(donor=donor)
+        self.assertTrue(watcher.check(force=True))
+        self.assertEqual(eligibility.count({"A-"}, "Udaipur"), {"eligible": 0, "deferred": 1})
+
+        donor.delete()
+        self.assertTrue(watcher.check(force=True))
+        self.assertEqual(match.match("A-", "Udaipur")["ranked"], [])
+        self.assertEqual(len(eligibility), 1)
+
+        # Too many changes at once: drop the indexes and rebuild lazily
+        watcher.max_delta = 1
+        pune = {
+            Donor.objects.create(name=name, age=30, blood_group="B-", contact="", city="Pune").id
+            for name in ("B", "C")
+        }
+        with override_settings(VECTOR_STORE=LOCAL_VECTOR_STORE):
+            self.assertTrue(watcher.check(force=True))
+        self.assertEqual(watcher.stats["full_rebuilds"], 1)
+        self.assertIsNot(get_match_index(), match)
+        self.assertEqual({d for d, _, _ in get_match_index().match("B-", "Pune")["ranked"]}, pune)
+
+    def test_allocate_conserves_universal_donors_across_the_queue(self):
+        """The batch plan sends O- to the O- patient; greedy would double-book it."""
+        Request.objects.filter(pk=self.request_record.pk).update(status="fulfilled")
+        jaipur = Hospital.objects.create(
+            name="Pink City Hospital", location="Jaipur", contact="7", capacity=80,
+        )
+        older = Request.objects.create(
+            patient_name="A Neg Patient", patient_age=40, hospital=self.hospital,
+            blood_group="A-", units_requested=1, status="pending",
+        )
+        o_neg = Request.objects.create(
+            patient_name="O Neg Patient", patient_age=35, hospital=self.hospital,
+            blood_group="O-", units_requested=1, status="pending",
+        )
+        universal = Donor.objects.create(
+            name="Local O Neg", age=30, blood_group="O-", contact="1", city="Udaipur",
+        )
+        remote = Donor.objects.create(
+            name="Remote A Neg", age=30, blood_group="A-", contact="2", city="Jaipur",
+        )
+        deferred = Donor.objects.create(
+            name="Rested Later", age=30, blood_group="O-", contact="3", city="Udaipur",
+        )
+        Donation.objects.create(donor=deferred)
+        self.assertEqual(jaipur.location, remote.city)
+
+        url = reverse("request-allocate")
+        body = self.client.get(url).json()
+        self.assertEqual(
+            [(r["request_id"], r["donors"]) for r in body["results"]],
+            [(older.id, [remote.id]), (o_neg.id, [universal.id])],
+        )
+        self.assertEqual(
+            (body["units_allocated"], body["fully_met"], body["units_cross_city"]), (2, 2, 1)
+        )
+
+        # Per-request greedy gives the local O- donor to the older request
+        greedy = greedy_allocation(
+            [(older.id, "A-", "udaipur", 1), (o_neg.id, "O-", "udaipur", 1)],
+            [(universal.id, "O-", "udaipur"), (remote.id, "A-", "jaipur")],
+        )
+        self.assertEqual(greedy.tolist(), [1, 0])
+
+        # Same city only: the single O- unit goes where nothing else can
+        body = self.client.get(url, {"cross_city": "0"}).json()
+        self.assertEqual(
+            [(r["request_id"], r["units_allocated"]) for r in body["results"]],
+            [(older.id, 0), (o_neg.id, 1)],
+        )
+        self.assertEqual(self.client.get(url, {"limit": "0"}).status_code, 400)
+
+    def test_donations_defer_donors_from_eligibility_and_matching(self):
+        """A donation starts a deferral that the index, endpoint and matching honour."""
+        rested = Donor.objects.create(
+            name="Rested O Neg", age=30, blood_group="O-", contact="1111111111", city="Udaipur",
+        )
+        donated = Donor.objects.create(
+            name="Recent O Neg", age=31, blood_group="O-", contact="2222222222", city="Udaipur",
+        )
+        index = get_eligibility_index()
+
+        url = reverse("donor-donations", args=[donated.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(url, {"kind": "whole_blood"}, format="json")
+        self.assertEqual(resp.status_code, 201)
+        donated.refresh_from_db()
+        self.assertEqual(
+            donated.next_eligible_at, donated.last_donation_at + timedelta(days=56)
+        )
+        self.assertFalse(donated.is_eligible())
+        self.assertEqual(len(self.client.get(url).json()["results"]), 1)
+
+        eligible_url = reverse("donor-eligible")
+        body = self.client.get(eligible_url, {"blood_group": "O-"}).json()
+        self.assertEqual([d["id"] for d in body["results"]], [rested.id])
+        self.assertEqual((body["eligible"], body["deferred"]), (1, 1))
+        later = (donated.next_eligible_at + timedelta(days=1)).date().isoformat()
+        body = self.client.get(eligible_url, {"blood_group": "O-", "date": later}).json()
+        self.assertEqual({d["id"] for d in body["results"]}, {rested.id, donated.id})
+        self.assertEqual(self.client.get(eligible_url, {"date": "soon"}).status_code, 400)
+
+        matches = reverse("request-matches", args=[self.request_record.id])
+        self.assertEqual([r["id"] for r in self.client.get(matches).json()["results"]], [rested.id])
+        body = self.client.get(matches, {"include_deferred": "1"}).json()
+        self.assertEqual({r["id"] for r in body["results"]}, {rested.id, donated.id})
+
+        # Deleting the donation (e.g. recorded in error) lifts the deferral
+        with self.captureOnCommitCallbacks(execute=True):
+            Donation.objects.filter(donor=donated).delete()
+        donated.refresh_from_db()
+        self.assertIsNone(donated.next_eligible_at)
+        self.assertEqual(index.count({"O-"}, "Udaipur"), {"eligible": 2, "deferred": 0})
+
     # AI SEARCH TESTS
 
+    def test_ai_suggest_completes_from_memory_and_follows_writes(self):
+        """Prefix completions rank label starts and counts, with no SQL per request."""
+        Donor.objects.create(
+            name="Jackie Rao", age=29, blood_group="O-", contact="1231231234", city="Jaipur",
+        )
+        get_suggest_index()
+        url = reverse("ai-suggest")
+
+        with self.assertNumQueries(0):
+            body = self.client.get(url, {"q": "jac"}).json()
+        self.assertEqual(
+            [(r["text"], r["type"]) for r in body["results"]],
+            [("Jackie Rao", "donor"), ("Dino Jackson", "donor")],
+        )
+        self.assertEqual(body["results"][1]["ids"], [self.donor.id])
+
+        body = self.client.get(url, {"q": "UDAI"}).json()
+        self.assertEqual(body["results"], [{"text": "Udaipur", "type": "city", "count": 2}])
+        body = self.client.get(url, {"q": "o", "type": "blood_group"}).json()
+        self.assertEqual([r["text"] for r in body["results"]], ["O+", "O-"])
+        self.assertEqual(self.client.get(url, {"q": "o", "type": "planet"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"q": ""}).json()["results"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request_record.patient_name = "Rohan Mehta"
+            self.request_record.save()
+        body = self.client.get(url, {"q": "ro"}).json()
+        self.assertEqual(
+            [(r["text"], r["type"], r["ids"]) for r in body["results"]],
+            [("Rohan Mehta", "patient", [self.request_record.id])],
+        )
+
+        # Deleting the hospital cascades to its request
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hospital.delete()
+        self.assertEqual(self.client.get(url, {"q": "ro"}).json()["results"], [])
+        body = self.client.get(url, {"q": "udaipur"}).json()
+        self.assertEqual(body["results"], [{"text": "Udaipur", "type": "city", "count": 1}])
+
     def test_ai_search_requires_query(self):
         """Query is mandatory for AI search."""
         url = reverse("ai-search")
@@ -161,3 +841,638 @@ class CoreAppTests(TestCase):
         self.assertEqual(body["results"][0]["type"], "request")
         self.assertIn("ai_summary", body)
         self.assertIn(self.request_record.patient_name, body["ai_summary"])
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    def test_ai_search_pages_through_a_server_side_cursor(self, mock_vector_search, mock_generate_embedding):
+        """
+        The first paged call ranks once; later pages are cursor slices
+        carrying only the requested metadata fields.
+        """
+        mock_generate_embedding.return_value = [0.0]
+        mock_vector_search.return_value = [
+            {"type": "donor", "record_id": i, "score": 1 - i / 100,
+             "metadata": {"name": f"d{i}", "contact": "555", "blood_group": "O+"}}
+            for i in range(25)
+        ]
+        url = reverse("ai-search")
+
+        body = self.client.post(
+            url, {"query": "O+ donors", "page_size": 10, "fields": ["name"]}, format="json"
+        ).json()
+        self.assertEqual(mock_vector_search.call_args.kwargs["top_k"], 200)
+        self.assertEqual(body["total"], 25)
+        self.assertEqual([r["record_id"] for r in body["results"]], list(range(10)))
+        self.assertEqual(body["results"][0]["metadata"], {"name": "d0"})
+
+        seen = [r["record_id"] for r in body["results"]]
+        cursor = body["next_cursor"]
+        while cursor:
+            body = self.client.post(url, {"cursor": cursor, "page_size": 10, "fields": "name,contact"},
+                                    format="json").json()
+            seen += [r["record_id"] for r in body["results"]]
+            cursor = body["next_cursor"]
+        self.assertEqual(seen, list(range(25)))
+        self.assertEqual(body["results"][-1]["metadata"], {"name": "d24", "contact": "555"})
+        mock_vector_search.assert_called_once()
+
+        resp = self.client.post(url, {"cursor": "nope:10"}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+        # Without paging parameters the response is unchanged
+        body = self.client.post(url, {"query": "O+ donors"}, format="json").json()
+        self.assertNotIn("next_cursor", body)
+        self.assertEqual(body["results"][0]["metadata"]["contact"], "555")
+
+    def test_admission_controller_queues_sheds_and_expires(self):
+        """Bounded slots, a short queue, per-client caps and stage deadlines."""
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5, per_client=2)
+        first = controller.acquire("a")
+
+        # A queued search is admitted as soon as the slot frees up
+        queued = {}
+        waiter = threading.Thread(target=lambda: queued.setdefault("ticket", controller.acquire("b")))
+        waiter.start()
+        while controller.stats()["waiting"] == 0:
+            pass
+        with self.assertRaises(Overloaded) as full:
+            controller.acquire("c")
+        self.assertEqual((full.exception.status, full.exception.reason), (503, "queue_full"))
+        per_client = AdmissionController(max_concurrent=4, per_client=1)
+        per_client.acquire("a")
+        with self.assertRaises(Overloaded) as capped:
+            per_client.acquire("a")
+        self.assertEqual(capped.exception.status, 429)
+        per_client.acquire("b")
+        controller.release(first)
+        waiter.join()
+        controller.release(queued["ticket"])
+
+        timed_out = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        timed_out.acquire()
+        with self.assertRaises(Overloaded) as waited:
+            timed_out.acquire()
+        self.assertEqual(waited.exception.reason, "queue_timeout")
+        self.assertGreaterEqual(waited.exception.retry_after, 1)
+
+        expiring = AdmissionController(deadline=0.0001).acquire()
+        time.sleep(0.001)
+        with self.assertRaises(DeadlineExceeded) as expired:
+            expiring.check("embed")
+        self.assertEqual(expired.exception.stage, "embed")
+
+        stats = controller.stats()
+        self.assertEqual((stats["admitted"], stats["completed"], stats["queued"]), (2, 2, 1))
+        self.assertEqual(stats["rejected_queue_full"], 1)
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    @override_settings(
+        AI_ADMISSION={"ENABLED": True, "MAX_CONCURRENT": 1, "MAX_QUEUE": 0, "DEADLINE": 2},
+        VECTOR_STORE=LOCAL_VECTOR_STORE,
+    )
+    def test_ai_search_sheds_load_when_saturated(self, mock_vector_search, mock_generate_embedding):
+        """A saturated or late search fails fast with Retry-After; CRUD is unaffected."""
+        mock_generate_embedding.return_value = [0.1, 0.2]
+        mock_vector_search.return_value = []
+        url = reverse("ai-search")
+
+        controller = get_admission_controller()
+        busy = controller.acquire()
+        resp = self.client.post(url, {"query": "O+ donors"}, format="json")
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()["reason"], "queue_full")
+        self.assertGreaterEqual(int(resp["Retry-After"]), 1)
+        self.assertEqual(self.client.get(reverse("donor-list")).status_code, 200)
+        controller.release(busy)
+
+        # Queued behind a proxy past the whole deadline: rejected before any work
+        late = f"t={time.time() - 3:.3f}"
+        resp = self.client.post(url, {"query": "O+ donors"}, format="json", HTTP_X_REQUEST_START=late)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()["reason"], "deadline_exceeded")
+        mock_generate_embedding.assert_not_called()
+
+        self.assertEqual(self.client.post(url, {"query": "O+ donors"}, format="json").status_code, 200)
+        stats = self.client.get(reverse("ai-stats")).json()["admission"]
+        self.assertEqual(stats["rejected_queue_full"], 1)
+        self.assertEqual(stats["expired"], {"queue": 1})
+        self.assertEqual(stats["completed"], 2)
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    def test_ai_search_answers_aggregates_from_sql(self, mock_vector_search, mock_generate_embedding):
+        """
+        Count, sum and group-by questions are answered exactly by SQL,
+        never by counting vector search hits.
+        """
+        Donor.objects.create(name="B", age=30, blood_group="O+", contact="1", city="Udaipur")
+        Donor.objects.create(name="C", age=40, blood_group="O+", contact="2", city="Jaipur")
+        Request.objects.create(patient_name="P", patient_age=30, hospital=self.hospital,
+                               blood_group="A-", units_requested=5, status="fulfilled")
+        url = reverse("ai-search")
+
+        body = self.client.post(url, {"query": "How many O+ donors are in Udaipur?"}, format="json").json()
+        self.assertEqual(body["aggregate"]["value"], 2)
+        self.assertEqual(body["ai_summary"], "2 donors match (blood group O+, city Udaipur).")
+
+        body = self.client.post(url, {"query": "total units pending for A- requests"}, format="json").json()
+        self.assertEqual(body["aggregate"]["value"], 45)
+
+        body = self.client.post(url, {"query": "number of requests by status"}, format="json").json()
+        self.assertEqual(body["aggregate"]["groups"], [["fulfilled", 1], ["pending", 1]])
+
+        body = self.client.post(url, {"query": "count donors older than 25 by city"}, format="json").json()
+        self.assertEqual(body["aggregate"]["groups"], [["Jaipur", 1], ["Udaipur", 1]])
+
+        # Cached for the TTL: a new donor is not visible until it expires
+        Donor.objects.create(name="D", age=50, blood_group="O+", contact="3", city="Udaipur")
+        body = self.client.post(url, {"query": "How many O+ donors are in Udaipur?"}, format="json").json()
+        self.assertEqual(body["aggregate"]["value"], 2)
+
+        mock_vector_search.assert_not_called()
+        mock_generate_embedding.assert_not_called()
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    def test_ai_search_query_log_and_replay(self, mock_vector_search, mock_generate_embedding):
+        """
+        Sampled searches are logged with plan, ids and timings, and
+        replay_queries reports result sets that changed since.
+        """
+        hit = {"type": "donor", "record_id": self.donor.id, "metadata": {"name": "x"}, "score": 0.9}
+        mock_generate_embedding.return_value = [0.0]
+        mock_vector_search.return_value = [hit]
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(QUERY_LOG={
+            "ENABLED": True,
+            "PATH": os.path.join(tmp, "queries.jsonl"),
+            "SAMPLE_RATE": 1.0,
+            "MAX_BYTES": 1024 * 1024,
+            "BACKUP_COUNT": 1,
+        }):
+            query = "O+ donors in Udaipur"
+            resp = self.client.post(reverse("ai-search"), {"query": query}, format="json")
+            self.assertEqual(resp.status_code, 200)
+
+            with open(os.path.join(tmp, "queries.jsonl")) as fh:
+                entry = json.loads(fh.readline())
+            self.assertEqual(entry["query"], query)
+            self.assertEqual(entry["results"], [["donor", self.donor.id]])
+            self.assertEqual(entry["plan"]["filters"], {"blood_group": "O+", "city": "Udaipur"})
+            self.assertEqual(
+                set(entry["timings_ms"]), {"embed", "filters", "search", "summary", "total"}
+            )
+
+            out = StringIO()
+            call_command("replay_queries", stdout=out)
+            self.assertIn("1 identical, 0 changed", out.getvalue())
+
+            mock_vector_search.return_value = []
+            out = StringIO()
+            with self.assertRaises(CommandError):
+                call_command("replay_queries", "--fail-on-diff", stdout=out)
+            self.assertIn("0 identical, 1 changed", out.getvalue())
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    def test_replay_plans_of_relative_queries_stay_equal(self, mock_vector_search, mock_generate_embedding):
+        """Plans logged for "last 7 days" compare equal when replayed on a later day."""
+        mock_generate_embedding.return_value = [0.0]
+        mock_vector_search.return_value = []
+        queries = [
+            "donors registered in the last 7 days", "hospitals added this week", "eligible O+ donors today",
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(QUERY_LOG={
+            "ENABLED": True,
+            "PATH": os.path.join(tmp, "queries.jsonl"),
+            "SAMPLE_RATE": 1.0,
+            "MAX_BYTES": 1024 * 1024,
+            "BACKUP_COUNT": 1,
+        }):
+            for query in queries:
+                self.client.post(reverse("ai-search"), {"query": query}, format="json")
+
+            out = StringIO()
+            later = timezone.now() + timedelta(days=8, hours=5)
+            with patch("django.utils.timezone.now", return_value=later):
+                call_command("replay_queries", "--json", stdout=out)
+            rows = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual([row["query"] for row in rows], queries)
+            self.assertEqual([row["plan_changed"] for row in rows], [False, False, False])
+
+    @patch("core.views_ai.generate_embedding")
+    @patch("core.views_ai.vector_search")
+    def test_replay_keeps_the_ranking_depth_of_paged_queries(self, mock_vector_search, mock_generate_embedding):
+        """A logged paged search is replayed at its own top_k, not TOP_K."""
+        hits = [
+            {"type": "donor", "record_id": i, "metadata": {"name": f"d{i}"}, "score": 1 - i / 100}
+            for i in range(25)
+        ]
+        mock_generate_embedding.return_value = [0.0]
+        mock_vector_search.side_effect = lambda **kwargs: hits[:kwargs["top_k"]]
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(QUERY_LOG={
+            "ENABLED": True,
+            "PATH": os.path.join(tmp, "queries.jsonl"),
+            "SAMPLE_RATE": 1.0,
+            "MAX_BYTES": 1024 * 1024,
+            "BACKUP_COUNT": 1,
+        }):
+            resp = self.client.post(reverse("ai-search"), {"query": "O+ donors", "page_size": 10}, format="json")
+            self.assertEqual(resp.json()["total"], 25)
+
+            out = StringIO()
+            call_command("replay_queries", "--fail-on-diff", "--json", stdout=out)
+            row = json.loads(out.getvalue())
+            self.assertEqual((row["old_count"], row["new_count"]), (25, 25))
+            self.assertFalse(row["changed"])
+
+    @patch("core.views_ai.generate_embeddings")
+    @patch("core.vectorstore.VectorStore.search_many")
+    def test_ai_batch_search_keeps_order_and_guards(
+        self,
+        mock_search_many,
+        mock_generate_embeddings,
+    ):
+        """
+        Batch search answers guards without embedding, embeds the rest
+        in one call and applies each query's filters in order.
+        """
+        donor_hit = {
+            "type": "donor",
+            "record_id": self.donor.id,
+            "metadata": {"name": self.donor.name, "blood_group": "O+", "city": "Udaipur"},
+            "score": 0.9,
+        }
+        hospital_hit = {
+            "type": "hospital",
+            "record_id": self.hospital.id,
+            "metadata": {"name": self.hospital.name, "location": "Udaipur"},
+            "score": 0.8,
+        }
+        mock_generate_embeddings.return_value = [[0.0], [0.0]]
+        mock_search_many.return_value = [[donor_hit, hospital_hit], [hospital_hit]]
+
+        url = reverse("ai-search-batch")
+        payload = {"queries": ["", "weather today", "O+ donors in Udaipur", "hospital with donors"]}
+        with override_settings(VECTOR_STORE=LOCAL_VECTOR_STORE):
+            resp = self.client.post(url, payload, format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()["results"]
+        self.assertEqual(len(body), 4)
+        self.assertIn("error", body[0])
+        self.assertIn("only supports", body[1]["ai_summary"])
+        self.assertEqual([r["record_id"] for r in body[2]["results"]], [self.donor.id])
+        self.assertEqual(body[3]["results"], [])
+
+        mock_generate_embeddings.assert_called_once_with(
+            ["O+ donors in Udaipur", "hospital with donors"]
+        )
+        mock_search_many.assert_called_once()
+
+
+@override_settings(VECTOR_STORE=LOCAL_VECTOR_STORE)
+class VectorStoreTests(TestCase):
+    """
+    VectorStore interface, exercised through the local backend.
+    """
+
+    def setUp(self):
+        self.store = get_vector_store()
+        get_query_cache().clear()
+        reset_geo_index()
+        reset_time_index()
+        reset_eligibility_index()
+        reset_data_version_watcher()
+        get_data_version_watcher().check(force=True)
+
+    def tearDown(self):
+        reset_vector_store()
+
+    def test_search_many_ranks_by_cosine(self):
+        """One matrix product scores every query against every vector."""
+        self.store.bulk_upsert([
+            ("donor", 0, [1, 0], {}),
+            ("donor", 1, [0, 1], {}),
+            ("donor", 2, [1, 1], {}),
+        ])
+
+        ranked = self.store.search_many([[1, 0], [0, 2]], top_k=2)
+
+        self.assertEqual([r["record_id"] for r in ranked[0]], [0, 2])
+        self.assertEqual([r["record_id"] for r in ranked[1]], [1, 2])
+        self.assertAlmostEqual(ranked[0][0]["score"], 1.0, places=5)
+
+    def test_upsert_delete_count_and_persistence(self):
+        """Writes persist to disk and update the in-memory matrix."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vectors.sqlite3")
+            store = LocalVectorStore({"PATH": path})
+            store.insert("donor", 1, [1, 0], {"name": "A"})
+            store.insert("hospital", 1, [0, 1], {"name": "H"})
+            store.insert("donor", 1, [0, 1], {"name": "A2"})
+
+            self.assertEqual(store.count(), 2)
+            self.assertEqual(store.count("donor"), 1)
+            top = store.search([0, 1], top_k=1)[0]
+            self.assertEqual(top["metadata"]["name"], "A2")
+
+            self.assertTrue(store.delete("hospital", 1))
+            self.assertFalse(store.delete("hospital", 1))
+            store.close()
+
+            reopened = LocalVectorStore({"PATH": path})
+            records, matrix = reopened.load_vectors()
+            self.assertEqual([r["metadata"]["name"] for r in records], ["A2"])
+            self.assertEqual(matrix.shape, (1, 2))
+            reopened.close()
+
+    def test_snapshots_survive_later_writes(self):
+        """A snapshot handed out keeps its rows while writes replace them."""
+        self.store.bulk_upsert([("donor", 1, [1, 0], {"name": "A"}), ("donor", 2, [0, 1], {"name": "B"})])
+        records, matrix = self.store.load_vectors()
+
+        self.store.insert("donor", 1, [5, 5], {"name": "A2"})
+        self.store.update_metadata("donor", [2], {"name": "B2"})
+        self.store.insert("donor", 3, [1, 1], {"name": "C"})
+
+        self.assertEqual(matrix.tolist(), [[1, 0], [0, 1]])
+        self.assertEqual([r["metadata"]["name"] for r in records], ["A", "B"])
+        records, matrix = self.store.load_vectors()
+        self.assertEqual(matrix.tolist(), [[5, 5], [0, 1], [1, 1]])
+        self.assertEqual([r["metadata"]["name"] for r in records], ["A2", "B2", "C"])
+
+    def test_refresh_loads_only_other_processes_writes(self):
+        """A second store on the same file catches up by change-sequence delta."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vectors.sqlite3")
+            writer, reader = LocalVectorStore({"PATH": path}), LocalVectorStore({"PATH": path})
+            writer.insert("donor", 1, [1, 0], {"name": "A"})
+            writer.insert("donor", 2, [0, 1], {"name": "B"})
+            writer.insert("donor", 3, [1, 1], {"name": "C"})
+            self.assertEqual(reader.count(), 3)
+            reader.search([1, 0], top_k=1)  # load the mirror
+
+            # Delete + insert would reuse the freed rowid; in-place updates keep theirs
+            writer.delete("donor", 3)
+            writer.insert("donor", 9, [-1, 1], {"name": "I"})
+            writer.insert("donor", 2, [0, 2], {"name": "B2"})
+            writer.update_metadata("donor", [1], {"city": "Pune"})
+            before = reader.version
+            with patch.object(reader, "_load", wraps=reader._load) as load:
+                reader.refresh(deleted=[("donor", 3)])
+            load.assert_not_called()
+            self.assertGreater(reader.version, before)
+
+            records, matrix = reader.load_vectors()
+            by_id = {r["record_id"]: r["metadata"] for r in records}
+            self.assertEqual(sorted(by_id), [1, 2, 9])
+            self.assertEqual(by_id[1], {"name": "A", "city": "Pune"})
+            self.assertEqual(by_id[2], {"name": "B2"})
+            self.assertEqual(matrix.shape, (3, 2))
+            self.assertEqual(reader.search([-1, 1], top_k=1)[0]["record_id"], 9)
+
+            # A late delete notice for a record inserted again is ignored
+            writer.delete("donor", 9)
+            writer.insert("donor", 9, [-1, 2], {"name": "I2"})
+            reader.refresh(deleted=[("donor", 9)])
+            self.assertEqual(reader.search([-1, 2], top_k=1)[0]["metadata"], {"name": "I2"})
+
+            # Neither store re-reads what it already has
+            for store in (reader, writer):
+                version = store.version
+                with patch.object(store, "_mirror", wraps=store._mirror) as mirror:
+                    store.refresh()
+                mirror.assert_not_called()
+                self.assertEqual(store.version, version)
+            writer.close()
+            reader.close()
+
+    def test_sharded_search_matches_single_process(self):
+        """Scatter-gather over shard workers returns the same top-k."""
+        rng = np.random.default_rng(7)
+        matrix = rng.standard_normal((40, 8)).astype(np.float32)
+        self.store.bulk_upsert([("donor", i, matrix[i], {}) for i in range(40)])
+        queries = rng.standard_normal((3, 8))
+
+        expected = self.store.search_many(queries, top_k=5)
+        with override_settings(VECTOR_SEARCH_SHARDS=3):
+            try:
+                sharded = self.store.search_many(queries, top_k=5)
+            finally:
+                self.store.reset_shards()
+
+        for want, got in zip(expected, sharded):
+            self.assertEqual(
+                [r["record_id"] for r in want], [r["record_id"] for r in got]
+            )
+            self.assertAlmostEqual(want[0]["score"], got[0]["score"], places=4)
+
+    def test_semantic_cache_reuses_near_duplicate_queries(self):
+        """Same plan + near-identical embedding hits; other plans or writes miss."""
+        self.store.bulk_upsert([
+            ("donor", 1, [1, 0, 0], {"blood_group": "O+", "city": "Udaipur", "age": 30}),
+            ("donor", 2, [0, 1, 0], {"blood_group": "A+", "city": "Jaipur", "age": 40}),
+        ])
+        cache = get_query_cache()
+
+        first = vector_search([1, 0, 0], top_k=5, filters={"blood_group": "O+"}, query="O+ donors")
+        again = vector_search([0.99, 0.05, 0], top_k=5, filters={"blood_group": "O+"}, query="donors O+")
+        self.assertEqual(first, again)
+        self.assertEqual([r["record_id"] for r in again], [1])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        # Near-identical sentence, different structured filter: no reuse
+        other = vector_search([1, 0, 0], top_k=5, filters={"blood_group": "A+"}, query="A+ donors")
+        self.assertEqual([r["record_id"] for r in other], [2])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        # A store write invalidates every entry
+        self.store.insert("donor", 3, [1, 0, 0], {"blood_group": "O+", "city": "Udaipur", "age": 22})
+        fresh = vector_search([1, 0, 0], top_k=5, filters={"blood_group": "O+"}, query="O+ donors")
+        self.assertEqual(sorted(r["record_id"] for r in fresh), [1, 3])
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+        stats = self.client.get(reverse("ai-stats")).json()["semantic_cache"]
+        self.assertEqual(stats["hits"], 1)
+
+    def test_vector_search_geo_prefilter(self):
+        """"within R km of <hospital>" restricts the scan to nearby records."""
+        hospital = Hospital.objects.create(
+            name="Lake Hospital", location="Udaipur", contact="1", capacity=50,
+            latitude=24.58, longitude=73.71,
+        )
+        near = Donor.objects.create(
+            name="Near", age=30, blood_group="O+", contact="1", city="Debari",
+            latitude=24.60, longitude=73.73,
+        )
+        far = Donor.objects.create(
+            name="Far", age=30, blood_group="O+", contact="2", city="Jaipur",
+            latitude=26.91, longitude=75.79,
+        )
+        self.store.bulk_upsert([
+            ("donor", far.id, [1, 0], {"blood_group": "O+", "city": "Jaipur"}),
+            ("donor", near.id, [0.8, 0.6], {"blood_group": "O+", "city": "Debari"}),
+            ("hospital", hospital.id, [0, 1], {"location": "Udaipur"}),
+        ])
+
+        query = "O+ donors within 25 km of Lake Hospital"
+        results = vector_search([1, 0], top_k=5, filters={"blood_group": "O+"}, query=query)
+        self.assertEqual([r["record_id"] for r in results], [near.id])
+
+        unfiltered = vector_search([1, 0], top_k=5, filters={"blood_group": "O+"}, query="O+ donors")
+        self.assertEqual([r["record_id"] for r in unfiltered], [far.id, near.id])
+
+    def test_vector_search_time_window_prefilter(self):
+        """Recent-window queries only score records in the timestamp slice."""
+        old = Donor.objects.create(name="Old", age=30, blood_group="O+", contact="1", city="Udaipur")
+        new = Donor.objects.create(name="New", age=30, blood_group="O+", contact="2", city="Udaipur")
+        Donor.objects.filter(pk=old.pk).update(created_at=old.created_at - timedelta(days=10))
+        self.store.bulk_upsert([
+            ("donor", old.id, [1, 0], {"blood_group": "O+", "city": "Udaipur"}),
+            ("donor", new.id, [0.6, 0.8], {"blood_group": "O+", "city": "Udaipur"}),
+        ])
+
+        results = vector_search([1, 0], top_k=5, query="donors registered in the last 24 hours")
+        self.assertEqual([r["record_id"] for r in results], [new.id])
+
+        # A donor created later enters the window through the signal-maintained index
+        with self.captureOnCommitCallbacks(execute=True):
+            newest = Donor.objects.create(
+                name="Newest", age=30, blood_group="O+", contact="3", city="Udaipur"
+            )
+        self.store.insert("donor", newest.id, [1, 0], {"blood_group": "O+", "city": "Udaipur"})
+        results = vector_search([1, 0], top_k=5, query="donors registered in the last 24 hours")
+        self.assertEqual([r["record_id"] for r in results], [newest.id, new.id])
+
+    def test_vector_search_eligibility_prefilter(self):
+        """"Eligible O- donors today" only scores donors out of their deferral."""
+        rested = Donor.objects.create(name="Rested", age=30, blood_group="O-", contact="1", city="Udaipur")
+        deferred = Donor.objects.create(name="Deferred", age=30, blood_group="O-", contact="2", city="Udaipur")
+        Donation.objects.create(donor=deferred, kind="platelets")
+        self.store.bulk_upsert([
+            ("donor", rested.id, [0.6, 0.8], {"blood_group": "O-", "city": "Udaipur"}),
+            ("donor", deferred.id, [1, 0], {"blood_group": "O-", "city": "Udaipur"}),
+        ])
+
+        results = vector_search([1, 0], top_k=5, query="eligible O- donors today")
+        self.assertEqual([r["record_id"] for r in results], [rested.id])
+        # Platelet deferral is a week: both can give in eight days
+        results = vector_search(
+            [1, 0], top_k=5,
+            query=f"O- donors eligible on {(timezone.now() + timedelta(days=8)).date()}",
+        )
+        self.assertEqual([r["record_id"] for r in results], [deferred.id, rested.id])
+
+        # Other entities are not narrowed to eligible donor ids
+        clinic = Hospital.objects.create(name="Camp Clinic", location="Udaipur", contact="3", capacity=10)
+        self.store.insert("hospital", clinic.id, [1, 0], {"city": "Udaipur"})
+        query = "hospitals in Udaipur where people can donate today"
+        self.assertIsNone(extract_eligibility(query))
+        self.assertIsNotNone(extract_time_window(query))
+        results = vector_search([1, 0], top_k=5, query="hospitals where people can donate")
+        self.assertEqual([(r["type"], r["record_id"]) for r in results], [("hospital", clinic.id)])
+
+    def test_request_vectors_follow_hospital_location(self):
+        """Requests filter by hospital city; a move rewrites only that hospital's request vectors."""
+        moving = Hospital.objects.create(name="City Hospital", location="Udaipur", contact="1", capacity=50)
+        staying = Hospital.objects.create(name="Lake Clinic", location="Udaipur", contact="2", capacity=20)
+        here = Request.objects.create(
+            patient_name="A", patient_age=40, hospital=moving, blood_group="A-", units_requested=2
+        )
+        there = Request.objects.create(
+            patient_name="B", patient_age=41, hospital=staying, blood_group="A-", units_requested=1
+        )
+        self.store.bulk_upsert([
+            ("request", req.id, [1, i], request_document(req)[1]) for i, req in enumerate([here, there])
+        ])
+
+        query = "pending requests at hospitals in Udaipur"
+        results = vector_search([1, 0], top_k=5, filters={"city": "Udaipur"}, query=query)
+        self.assertEqual([r["record_id"] for r in results], [here.id, there.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moving.location = "Jaipur"
+            moving.save()
+        records = {r["record_id"]: r["metadata"] for r in self.store.load_vectors()[0]}
+        self.assertEqual(records[here.id]["city"], "Jaipur")
+        self.assertEqual(records[there.id]["city"], "Udaipur")
+        results = vector_search([1, 0], top_k=5, filters={"city": "Udaipur"}, query=query)
+        self.assertEqual([r["record_id"] for r in results], [there.id])
+
+        # Requests also filter by their hospital's capacity
+        query = "pending requests at hospitals with capacity above 30"
+        results = vector_search([1, 0], top_k=5, query=query)
+        self.assertEqual([r["record_id"] for r in results], [here.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            staying.capacity = 100
+            staying.save()
+        results = vector_search([1, 0], top_k=5, query=query)
+        self.assertEqual([r["record_id"] for r in results], [here.id, there.id])
+
+    def test_find_duplicate_donors_clusters_blocked_pairs(self):
+        """LSH and contact blocks surface near-duplicates; verification keeps lookalikes apart."""
+        rng = np.random.default_rng(0)
+        base, other = rng.standard_normal(32), rng.standard_normal(32)
+        first = Donor.objects.create(
+            name="Dino Jackson", age=24, blood_group="O+", contact="98765 43210", city="Udaipur"
+        )
+        typo = Donor.objects.create(
+            name="Dino Jakson", age=24, blood_group="O+", contact="9876543211", city="Udaipur"
+        )
+        reformatted = Donor.objects.create(
+            name="Jackson, Dino", age=24, blood_group="O+", contact="+91-98765-43210", city="Jaipur"
+        )
+        relative = Donor.objects.create(
+            name="Asha Verma", age=50, blood_group="O+", contact="9876543210", city="Udaipur"
+        )
+        self.store.bulk_upsert([
+            ("donor", first.id, base, {}),
+            ("donor", typo.id, base + 0.01 * rng.standard_normal(32), {}),
+            # No embedding for `reformatted`: found through its contact alone
+            ("donor", relative.id, other, {}),
+        ])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clusters.json")
+            out = StringIO()
+            call_command("find_duplicate_donors", json_path=path, stdout=out)
+            with open(path) as fh:
+                report = json.load(fh)
+
+        self.assertEqual(report["stats"]["embedded"], 3)
+        self.assertEqual(len(report["clusters"]), 1)
+        self.assertEqual(report["clusters"][0]["keep"], first.id)
+        self.assertEqual(report["clusters"][0]["duplicates"], [typo.id, reformatted.id])
+        self.assertIn("1 cluster(s), 2 duplicate record(s)", out.getvalue())
+
+    def test_pca_projection_is_stored_with_the_index(self):
+        """Reduced vectors are stored, queries projected, and the projection persisted."""
+        rng = np.random.default_rng(3)
+        # 24-d vectors that really live in 6 dimensions
+        corpus = rng.standard_normal((300, 6)) @ rng.standard_normal((6, 24))
+        projection = Projection.fit(corpus, 6, model="test")
+        self.assertGreater(projection.explained_variance, 0.99)
+        self.assertGreater(retrieval_agreement(projection, corpus, corpus[:20])[10], 0.95)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vectors.sqlite3")
+            store = LocalVectorStore({"PATH": path})
+            store.set_projection(projection)
+            with patch("core.utils.get_vector_store", return_value=store):
+                vector_bulk_upsert([("donor", i, corpus[i], {}) for i in range(50)])
+
+            _, matrix = store.load_vectors()
+            self.assertEqual(matrix.shape, (50, 6))
+            top = store.search(corpus[7], top_k=1)[0]
+            self.assertEqual(top["record_id"], 7)
+            store.close()
+
+            reopened = LocalVectorStore({"PATH": path})
+            self.assertEqual(reopened.projection.version, projection.version)
+            reopened.clear()
+            self.assertIsNone(reopened.projection)
+            reopened.close()
@@ -0,0 +1,113 @@
+# core/time_index.py
+"""
+Sorted creation-time index for donors, hospitals and requests.
+
+Each record type keeps one list of (created_at epoch seconds, id)
+sorted ascending, so a time window such as "last 24 hours" is two
+bisects and a slice: the cost follows the size of the window, not the
+table. Built once per process from the indexed `created_at` columns
+and kept current by model signals (see core/signals.py).
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+KINDS = ("donor", "hospital", "request")
+
+
+class TimestampIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = {kind: [] for kind in KINDS}  # sorted (ts, id)
+        self.stamps = {kind: {} for kind in KINDS}   # id -> ts
+        # Bumped on every change; part of cached search plans
+        self.version = 0
+
+    @classmethod
+    def build(cls, rows_by_kind: dict):
+        """
+        Build from {kind: iterable of (id, created_at datetime)}.
+        """
+        index = cls()
+        for kind, rows in rows_by_kind.items():
+            for record_id, created_at in rows:
+                ts = created_at.timestamp()
+                index.entries[kind].append((ts, record_id))
+                index.stamps[kind][record_id] = ts
+            index.entries[kind].sort()
+        return index
+
+    def upsert(self, kind: str, record_id: int, created_at):
+        ts = created_at.timestamp()
+        with self._lock:
+            old = self.stamps[kind].get(record_id)
+            if old == ts:
+                return
+            if old is not None:
+                self._discard(kind, record_id, old)
+            insort(self.entries[kind], (ts, record_id))
+            self.stamps[kind][record_id] = ts
+            self.version += 1
+
+    def remove(self, kind: str, record_id: int):
+        with self._lock:
+            old = self.stamps[kind].pop(record_id, None)
+            if old is not None:
+                self._discard(kind, record_id, old)
+                self.version += 1
+
+    def _discard(self, kind, record_id, ts):
+        entries = self.entries[kind]
+        pos = bisect_left(entries, (ts, record_id))
+        if pos < len(entries) and entries[pos] == (ts, record_id):
+            del entries[pos]
+
+    def between(self, kind: str, start=None, end=None) -> list:
+        """
+        Ids created in [start, end), oldest first; None leaves a side open.
+        """
+        with self._lock:
+            entries = self.entries[kind]
+            lo = bisect_left(entries, (start.timestamp(), -1)) if start else 0
+            hi = bisect_left(entries, (end.timestamp(), -1)) if end else len(entries)
+            return [record_id for _, record_id in entries[lo:hi]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_time_index() -> TimestampIndex:
+    """
+    Process-wide index, built from the created_at columns on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from core.models import Donor, Hospital, Request
+
+                models = {"donor": Donor, "hospital": Hospital, "request": Request}
+                _index = TimestampIndex.build({
+                    kind: model.objects.order_by("created_at")
+                    .values_list("id", "created_at")
+                    .iterator(chunk_size=10000)
+                    for kind, model in models.items()
+                })
+    return _index
+
+
+def peek_time_index():
+    """
+    The index if it has been built, else None (signals skip unbuilt indexes).
+    """
+    return _index
+
+
+def reset_time_index():
+    """
+    Drop the process-wide index so the next use rebuilds it.
+    """
+    global _index
+    with _index_lock:
+        _index = None
@@ -2,8 +2,9 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DonorViewSet, HospitalViewSet, RequestViewSet
-from .views_ai import AISearchView
+from .views import DonorViewSet, HospitalViewSet, RequestViewSet, SummaryView
+from .views_ai import AIBatchSearchView, AISearchView, AIStatsView, AISuggestView
+from .views_export import export_records
 
 router = DefaultRouter()
 router.register(r'donors', DonorViewSet)
@@ -13,4 +14,9 @@ router.register(r'requests', RequestViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('ai/search/', AISearchView.as_view(), name='ai-search'),
+    path('ai/search/batch/', AIBatchSearchView.as_view(), name='ai-search-batch'),
+    path('ai/suggest/', AISuggestView.as_view(), name='ai-suggest'),
+    path('ai/stats/', AIStatsView.as_view(), name='ai-stats'),
+    path('export/<str:entity>/', export_records, name='export'),
+    path('stats/summary/', SummaryView.as_view(), name='stats-summary'),
 ]
@@ -1,12 +1,21 @@
 # core/utils.py
 
 import re
-from sentence_transformers import SentenceTransformer
-from core import mongo
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from core.eligibility import get_eligibility_index
+from core.embeddings import load_embedding_model
+from core.geo import get_geo_index
+from core.models import Donor, Hospital
+from core.query_cache import get_query_cache
+from core.time_index import KINDS as TIME_INDEX_KINDS, get_time_index
+from core.vectorstore import get_vector_store
 
 # EMBEDDING MODEL (loaded once at startup)
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+embedding_model = load_embedding_model(settings.EMBEDDING_MODEL)
 
 
 def generate_embedding(text: str) -> list:
@@ -16,24 +25,39 @@ def generate_embedding(text: str) -> list:
     embedding = embedding_model.encode(text)
     return embedding.tolist()
 
+
+def generate_embeddings(texts: list, batch_size: int = 64):
+    """
+    Generate embeddings for many texts in a single batched forward pass.
+
+    Returns a float32 numpy array of shape (len(texts), dim).
+    """
+    return embedding_model.encode(list(texts), batch_size=batch_size).astype("float32")
+
 # QUERY PARSING HELPERS
 
 def extract_entity_type(query: str):
     """
     Detect primary entity intent from query.
+
+    Donors win outright; between hospitals and requests the one named
+    first is the subject ("pending requests at hospitals in Udaipur" is
+    about requests, "hospitals with capacity above 100" about hospitals).
     """
     q = query.lower()
     if "donor" in q:
         return "donor"
-    if "hospital" in q:
-        return "hospital"
-    if "request" in q or "patient" in q:
-        return "request"
-    return None
+    mentions = {
+        "hospital": q.find("hospital"),
+        "request": min((i for i in (q.find("request"), q.find("patient")) if i >= 0), default=-1),
+    }
+    mentioned = [(i, entity) for entity, i in mentions.items() if i >= 0]
+    return min(mentioned)[1] if mentioned else None
 
 
 def extract_blood_group(query: str):
-    blood_groups = ["a+", "a-", "b+", "b-", "ab+", "ab-", "o+", "o-"]
+    # AB groups first so "ab+" is not read as "b+"
+    blood_groups = ["ab+", "ab-", "a+", "a-", "b+", "b-", "o+", "o-"]
     q = query.lower()
     for bg in blood_groups:
         if bg in q:
@@ -93,6 +117,243 @@ def extract_status_filter(query: str):
             return status
     return None
 
+def extract_city(query: str):
+    """
+    Detect a known donor city or hospital location mentioned in the query.
+    """
+    q = query.lower()
+
+    donor_cities = Donor.objects.values_list("city", flat=True).distinct()
+    hospital_locations = Hospital.objects.values_list("location", flat=True).distinct()
+    all_places = set(donor_cities) | set(hospital_locations)
+
+    for place in all_places:
+        if place and place.lower() in q:
+            return place
+    return None
+
+
+def extract_geo_filter(query: str):
+    """
+    Detect "within <R> km of <hospital name>".
+
+    Returns (latitude, longitude, radius_km) for a hospital with
+    coordinates, else None.
+    """
+    match = re.search(r"within\s+(\d+(?:\.\d+)?)\s*km\s+(?:of|from)\s+(.+)", query.lower())
+    if not match:
+        return None
+    radius, anchor = float(match.group(1)), match.group(2)
+
+    hospitals = Hospital.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list("name", "latitude", "longitude")
+
+    # Longest name wins so "City Hospital North" beats "City Hospital"
+    best = None
+    for name, lat, lon in hospitals:
+        if name and name.lower() in anchor and (best is None or len(name) > len(best[0])):
+            best = (name, lat, lon)
+    return (best[1], best[2], radius) if best else None
+
+
+def geo_candidates(geo_filter) -> set:
+    """
+    (type, record_id) pairs of donors and hospitals inside a geo filter.
+    """
+    lat, lon, radius = geo_filter
+    index = get_geo_index()
+    return {
+        (kind, point_id)
+        for kind in ("donor", "hospital")
+        for _, point_id in index.within(kind, lat, lon, radius)
+    }
+
+
+TIME_UNITS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+WORD_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4,
+                "five": 5, "six": 6, "seven": 7, "ten": 10, "twelve": 12}
+DATE_RE = r"(\d{4}-\d{2}-\d{2})"
+
+
+def _parse_day(text: str):
+    try:
+        return timezone.make_aware(datetime.strptime(text, "%Y-%m-%d"))
+    except ValueError:
+        return None
+
+
+ELIGIBLE_RE = r"\b(?:eligible|(?:available|able) to donate|can donate)\b"
+ELIGIBLE_DATE_RE = rf"\b(?:today|tomorrow|on\s+{DATE_RE})\b"
+
+
+def _asks_eligibility(query: str) -> bool:
+    """
+    Eligibility wording in a query about donors (or no entity): other
+    entities ("hospitals where people can donate") are never narrowed
+    to eligible donor ids.
+    """
+    return bool(re.search(ELIGIBLE_RE, query.lower())) and extract_entity_type(query) in ("donor", None)
+
+
+def extract_eligibility(query: str, now=None):
+    """
+    Detect a donor eligibility question ("eligible O- donors today",
+    "who can donate on 2024-06-01").
+
+    Returns the instant eligibility is checked at: the end of the named
+    day ("today", "tomorrow", "on YYYY-MM-DD"), i.e. donors who can give
+    at some point that day, else now. None when the query does not ask
+    about donor eligibility.
+    """
+    q = query.lower()
+    if not _asks_eligibility(query):
+        return None
+    now = now or timezone.now()
+    midnight = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    one_day = timedelta(days=1)
+
+    on = re.search(rf"\bon\s+{DATE_RE}", q)
+    if on and _parse_day(on.group(1)):
+        return _parse_day(on.group(1)) + one_day
+    if "tomorrow" in q:
+        return midnight + 2 * one_day
+    if "today" in q:
+        return midnight + one_day
+    return now
+
+
+def eligible_candidates(query: str, eligible_at) -> set:
+    """
+    ("donor", id) pairs of donors eligible at `eligible_at`, narrowed by
+    the query's blood group and city.
+    """
+    blood_group = extract_blood_group(query)
+    donor_ids = get_eligibility_index().eligible(
+        {blood_group} if blood_group else None, extract_city(query), when=eligible_at
+    )
+    return {("donor", donor_id) for donor_id in donor_ids}
+
+
+def extract_time_window(query: str, now=None):
+    """
+    Detect a creation-time window.
+
+    - Relative: "last 24 hours", "past 3 days", "last week", "today",
+      "yesterday", "this week", "this month"
+    - Absolute (YYYY-MM-DD): "since", "after", "before", "on",
+      "between ... and ..." (end dates inclusive)
+
+    Returns (start, end) aware datetimes, end exclusive and either side
+    possibly None, or None when the query has no time constraint.
+    In eligibility questions the day named belongs to the eligibility
+    check (`extract_eligibility`), not to the creation time.
+    """
+    q = query.lower()
+    if _asks_eligibility(query):
+        q = re.sub(ELIGIBLE_DATE_RE, " ", q)
+    now = now or timezone.now()
+    midnight = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    one_day = timedelta(days=1)
+
+    between = re.search(rf"between\s+{DATE_RE}\s+and\s+{DATE_RE}", q)
+    if between:
+        start, end = _parse_day(between.group(1)), _parse_day(between.group(2))
+        if start and end:
+            return (start, end + one_day)
+
+    on = re.search(rf"\bon\s+{DATE_RE}", q)
+    if on and _parse_day(on.group(1)):
+        day = _parse_day(on.group(1))
+        return (day, day + one_day)
+
+    since = re.search(rf"\b(?:since|after|from)\s+{DATE_RE}", q)
+    before = re.search(rf"\bbefore\s+{DATE_RE}", q)
+    start = _parse_day(since.group(1)) if since else None
+    end = _parse_day(before.group(1)) if before else None
+    if start or end:
+        return (start, end)
+
+    relative = re.search(
+        r"\b(?:last|past|previous)\s+(?:(\d+|[a-z]+)\s+)?(minute|hour|day|week|month|year)s?\b", q
+    )
+    if relative:
+        amount = relative.group(1)
+        if amount is None:
+            n = 1
+        elif amount.isdigit():
+            n = int(amount)
+        else:
+            n = WORD_NUMBERS.get(amount)
+        if n:
+            return (now - n * TIME_UNITS[relative.group(2)], None)
+
+    if "yesterday" in q:
+        return (midnight - one_day, midnight)
+    if "today" in q:
+        return (midnight, None)
+    if "this week" in q:
+        return (midnight - timedelta(days=midnight.weekday()), None)
+    if "this month" in q:
+        return (midnight.replace(day=1), None)
+    if "this year" in q:
+        return (midnight.replace(month=1, day=1), None)
+
+    return None
+
+
+def time_candidates(time_window, entity_type=None) -> set:
+    """
+    (type, record_id) pairs created inside a time window.
+    """
+    start, end = time_window
+    index = get_time_index()
+    kinds = [entity_type] if entity_type else TIME_INDEX_KINDS
+    return {
+        (kind, record_id)
+        for kind in kinds
+        for record_id in index.between(kind, start, end)
+    }
+
+
+def prefilter_candidates(query: str, geo_filter, time_window, eligible_at=None):
+    """
+    (type, record_id) pairs allowed by the index-backed pre-filters, or
+    None when the query has no geo, time or eligibility constraint.
+    """
+    candidates = geo_candidates(geo_filter) if geo_filter else None
+    if time_window:
+        in_window = time_candidates(time_window, extract_entity_type(query))
+        candidates = in_window if candidates is None else candidates & in_window
+    if eligible_at:
+        eligible = eligible_candidates(query, eligible_at)
+        candidates = eligible if candidates is None else candidates & eligible
+    return candidates
+
+
+def extract_structured_filters(query: str) -> dict:
+    """
+    Exact-match metadata filters (blood group, city) detected in a query.
+    """
+    filters = {}
+
+    blood_group = extract_blood_group(query)
+    if blood_group:
+        filters["blood_group"] = blood_group
+
+    city = extract_city(query)
+    if city:
+        filters["city"] = city
+
+    return filters
+
 # VECTOR SEARCH (HYBRID: STRUCTURED + SEMANTIC)
 
 def vector_search(
@@ -101,13 +362,104 @@ def vector_search(
     filters: dict | None = None,
     strict: bool = True,
     query: str | None = None,
+    raw_results: list | None = None,
+    ticket=None,
 ) -> list:
+    """
+    Hybrid retrieval: semantic candidates narrowed by structured filters.
+
+    `raw_results` lets callers that already scored the query (see
+    `vector_search_many`) skip the vector scan. An admission `ticket`
+    (core/admission.py) has its deadline checked between scan and filter.
 
-    raw_results = mongo.search(embedding, top_k=50) or []
+    Results are memoized in the semantic query cache: a later query
+    with the same structured plan and a near-identical embedding reuses
+    them without scanning.
+
+    "within <R> km of <hospital>", time windows ("last 24 hours",
+    "this week") and eligibility ("eligible O- donors today") pre-filter
+    the scan through the geo, creation-time and eligibility indexes
+    (core/geo.py, core/time_index.py, core/eligibility.py).
+    """
 
     if not query:
         return []
 
+    store = get_vector_store()
+    cache = get_query_cache() if embedding is not None else None
+    geo_filter = extract_geo_filter(query)
+    time_window = extract_time_window(query)
+    eligible_at = extract_eligibility(query)
+    plan_key = search_plan_key(query, filters, top_k, strict, geo_filter, time_window, eligible_at)
+    version = store.cache_version
+    candidates = prefilter_candidates(query, geo_filter, time_window, eligible_at)
+
+    if raw_results is None:
+        if cache is not None:
+            cached = cache.lookup(embedding, plan_key, version)
+            if cached is not None:
+                return cached
+        raw_results = store.search(embedding, top_k=50, candidates=candidates) or []
+    elif candidates is not None:
+        raw_results = [r for r in raw_results if (r["type"], r["record_id"]) in candidates]
+
+    if ticket is not None:
+        ticket.check("filter")
+
+    results = _filter_candidates(raw_results, top_k, filters, strict, query)
+
+    if cache is not None:
+        cache.store(embedding, plan_key, version, results)
+    return results
+
+
+def search_plan_key(
+    query: str,
+    filters: dict | None,
+    top_k: int,
+    strict: bool,
+    geo_filter=None,
+    time_window=None,
+    eligible_at=None,
+) -> tuple:
+    """
+    Hashable summary of every structured constraint that shapes a
+    search result. Two queries may share cached results only if their
+    plan keys are equal.
+    """
+    return (
+        extract_entity_type(query),
+        tuple(sorted((filters or {}).items())),
+        extract_age_filter(query),
+        extract_capacity_filter(query),
+        extract_status_filter(query),
+        top_k,
+        strict,
+        # Geo / time index changes do not touch the vector store version
+        (geo_filter, get_geo_index().version) if geo_filter else None,
+        # Relative windows move with the clock: reuse within the minute
+        (
+            tuple(t and t.replace(second=0, microsecond=0) for t in time_window),
+            get_time_index().version,
+        ) if time_window else None,
+        (
+            eligible_at.replace(second=0, microsecond=0),
+            get_eligibility_index().version,
+        ) if eligible_at else None,
+    )
+
+
+def _filter_candidates(
+    raw_results: list,
+    top_k: int,
+    filters: dict | None,
+    strict: bool,
+    query: str,
+) -> list:
+    """
+    Apply entity-type and structured metadata filters to ranked candidates.
+    """
+
     entity_type = extract_entity_type(query)
     age_filter = extract_age_filter(query)
     capacity_filter = extract_capacity_filter(query)
@@ -158,12 +510,15 @@ def vector_search(
             if mode == "eq" and age != value:
                 continue
 
-        # CAPACITY FILTER (hospital only)
+        # CAPACITY FILTER (hospital / request, by its hospital's capacity)
         if capacity_filter:
-            if r.get("type") != "hospital":
+            if r.get("type") == "hospital":
+                capacity = meta.get("capacity")
+            elif r.get("type") == "request":
+                capacity = meta.get("hospital_capacity")
+            else:
                 continue
 
-            capacity = meta.get("capacity")
             if capacity is None:
                 continue
 
@@ -197,10 +552,76 @@ def vector_search(
     return filtered[:top_k]
 
 
+def vector_search_many(
+    embeddings,
+    queries: list,
+    filters_list: list,
+    top_k: int = 5,
+    strict: bool = True,
+) -> list:
+    """
+    Batched `vector_search`: one matrix-matrix scan for every query not
+    answered by the semantic cache, then each query's own structured
+    filters. Results keep input order.
+    """
+    store = get_vector_store()
+    cache = get_query_cache()
+    version = store.cache_version
+
+    results = [None] * len(queries)
+    misses = []
+    for i, (embedding, query, filters) in enumerate(zip(embeddings, queries, filters_list)):
+        if query and (
+            extract_geo_filter(query) or extract_time_window(query) or extract_eligibility(query)
+        ):
+            # Pre-filtered scans cannot share the batched product
+            results[i] = vector_search(
+                embedding=embedding, top_k=top_k, filters=filters, strict=strict, query=query,
+            )
+            continue
+        if cache is not None and query:
+            results[i] = cache.lookup(
+                embedding, search_plan_key(query, filters, top_k, strict), version
+            )
+        if results[i] is None:
+            misses.append(i)
+
+    if misses:
+        raw_batches = store.search_many([embeddings[i] for i in misses], top_k=50)
+        for i, raw in zip(misses, raw_batches):
+            results[i] = vector_search(
+                embedding=embeddings[i],
+                top_k=top_k,
+                filters=filters_list[i],
+                strict=strict,
+                query=queries[i],
+                raw_results=raw,
+            )
+
+    return results
+
+
 # VECTOR INSERT
 
 def vector_insert(record_type: str, record_id: int, embedding: list, metadata: dict):
-    mongo.insert(record_type, record_id, embedding, metadata)
+    store = get_vector_store()
+    if store.projection is not None:
+        embedding = store.project(embedding)[0]
+    store.insert(record_type, record_id, embedding, metadata)
+
+
+def vector_bulk_upsert(records: list) -> int:
+    """
+    Upsert many (record_type, record_id, embedding, metadata) tuples at once.
+
+    Embeddings are full model output; they are reduced here when the
+    store carries a PCA projection.
+    """
+    store = get_vector_store()
+    if store.projection is not None and records:
+        types, ids, embeddings, metas = zip(*records)
+        records = list(zip(types, ids, store.project(list(embeddings)), metas))
+    return store.bulk_upsert(records)
 
 
 # AI SUMMARY
@@ -0,0 +1,328 @@
+# core/vectorstore.py
+"""
+Pluggable vector-store backends.
+
+`VectorStore` defines the operations the AI layer needs (insert, bulk
+upsert, delete, search, count, clear). Backends only have to persist
+records and expose them through `load_vectors()`; cosine scoring,
+batched scoring and optional sharded scatter-gather are shared here.
+
+The active backend is chosen with settings.VECTOR_STORE:
+
+    VECTOR_STORE = {
+        "BACKEND": "core.mongo.MongoVectorStore",
+        "OPTIONS": {...},   # passed to the backend constructor
+    }
+
+Stores may carry a PCA projection (core/projection.py) in their info;
+vectors are then stored reduced and queries are projected before
+scoring.
+
+Shipped backends:
+- core.mongo.MongoVectorStore        MongoDB collection (default)
+- core.local_store.LocalVectorStore  SQLite file + in-memory matrix
+"""
+
+import atexit
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from core.data_version import record_change
+from core.projection import Projection
+from core.sharded import ShardPool, normalize_rows
+
+
+class VectorStore:
+    """
+    Base class for vector-store backends.
+
+    Subclasses implement the storage methods and call `mark_written()`
+    after every successful write so in-process snapshots can refresh
+    and other worker processes learn about it (core/data_version.py).
+    """
+
+    def __init__(self, options: dict | None = None):
+        self.options = options or {}
+        # Bumped on every write made through this instance
+        self.version = 0
+        self._uid = uuid.uuid4().hex
+        self._shards = {"pool": None, "records": [], "version": None, "loaded_at": 0.0}
+        self._shards_lock = threading.Lock()
+        self._row_lookup = None
+        self._projection = (None, None)  # (info version, Projection)
+
+    # STORAGE (backend specific)
+
+    def insert(self, record_type: str, record_id: int, embedding, metadata: dict):
+        """
+        Insert or replace one record.
+        """
+        self.bulk_upsert([(record_type, record_id, embedding, metadata)])
+
+    def bulk_upsert(self, records: list) -> int:
+        """
+        Upsert (record_type, record_id, embedding, metadata) tuples.
+        Returns the number of records written.
+        """
+        raise NotImplementedError
+
+    def delete(self, record_type: str, record_id: int) -> bool:
+        """
+        Remove one record. Returns True if it existed.
+        """
+        raise NotImplementedError
+
+    def update_metadata(self, record_type: str, record_ids, values: dict) -> int:
+        """
+        Merge `values` into the metadata of the given records, leaving
+        their embeddings alone. Returns the number of records updated.
+        """
+        raise NotImplementedError
+
+    def count(self, record_type: str | None = None) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every stored vector.
+        """
+        raise NotImplementedError
+
+    def load_vectors(self):
+        """
+        (records, matrix): records are dicts with type, record_id and
+        metadata; matrix is float32 with one row per record.
+        """
+        raise NotImplementedError
+
+    def get_info(self) -> dict:
+        """
+        Store-level settings persisted next to the vectors (e.g. projection).
+        """
+        raise NotImplementedError
+
+    def set_info(self, **values):
+        """
+        Persist info keys; a value of None removes the key. Cleared by clear().
+        """
+        raise NotImplementedError
+
+    def mark_written(self, deleted=None, reload: bool = False):
+        """
+        Bump this instance's version and log the write for other
+        workers: `deleted` is the (record_type, record_id) removed,
+        `reload` marks writes other workers can only follow with a full
+        reload (clear, projection change).
+        """
+        self.version += 1
+        if deleted is not None:
+            record_change(f"vector.{deleted[0]}", deleted[1], deleted=True)
+        else:
+            record_change("vector.reload" if reload else "vector")
+
+    def refresh(self, deleted=(), full: bool = False):
+        """
+        Pick up writes made by other processes. `deleted` lists removed
+        (record_type, record_id) pairs; backends with an in-memory mirror
+        load only rows written since their last load unless `full`.
+        The default just bumps the version so snapshots and cached
+        search results are rebuilt from the backend.
+        """
+        self.version += 1
+
+    # PROCESS LIFECYCLE (pre-forking servers, see core/prefork.py)
+
+    def warm(self):
+        """
+        Load whatever searches read from memory, before workers fork.
+        """
+        self.projection
+
+    def after_fork(self):
+        """
+        Replace per-process resources (connections, shard pools) in a
+        forked worker; in-memory snapshots are kept and shared.
+        """
+        self._shards_lock = threading.Lock()
+        self._shards = {"pool": None, "records": [], "version": None, "loaded_at": 0.0}
+
+    # PROJECTION
+
+    @property
+    def projection(self):
+        """
+        The PCA projection this store's vectors were made with, or None.
+        """
+        # Re-read only after a write through this instance
+        if self._projection[0] != self.version:
+            data = self.get_info().get("projection")
+            self._projection = (self.version, Projection.from_dict(data) if data else None)
+        return self._projection[1]
+
+    def set_projection(self, projection):
+        """
+        Record the projection applied to every vector written from now on.
+        """
+        self.set_info(projection=projection.to_dict() if projection is not None else None)
+
+    def project(self, vectors):
+        """
+        Vectors in this store's space: reduced if a projection is set.
+        """
+        projection = self.projection
+        if projection is None:
+            return vectors
+        return projection.transform(vectors)
+
+    @property
+    def cache_version(self) -> str:
+        """
+        Token that changes whenever cached search results may be stale.
+        """
+        return f"{self._uid}:{self.version}"
+
+    # SEARCH (shared)
+
+    def search(self, embedding, top_k: int = 5, candidates=None) -> list:
+        """
+        Cosine similarity search for one query vector.
+        """
+        return self.search_many([embedding], top_k=top_k, candidates=candidates)[0]
+
+    def search_many(self, embeddings, top_k: int = 5, candidates=None) -> list:
+        """
+        Cosine similarity search for several query vectors at once.
+
+        All queries are scored with a single matrix-matrix product (or
+        scattered to shard workers when VECTOR_SEARCH_SHARDS > 1);
+        returns one ranked result list per query.
+
+        `candidates` is an optional set of (type, record_id) pairs: only
+        those rows are scored (pre-filter, e.g. from the geo index).
+        """
+        queries = np.atleast_2d(np.asarray(self.project(embeddings), dtype=np.float32))
+
+        # A pre-filtered subset is small; score it in-process
+        if settings.VECTOR_SEARCH_SHARDS > 1 and candidates is None:
+            return self._sharded_search_many(queries, top_k)
+
+        records, matrix = self.load_vectors()
+        if candidates is not None and len(records):
+            rows = self._candidate_rows(records, candidates)
+            records = [records[i] for i in rows]
+            matrix = matrix[rows]
+        if not len(records):
+            return [[] for _ in range(len(queries))]
+
+        scores = (queries @ matrix.T) / (
+            np.outer(np.linalg.norm(queries, axis=1), np.linalg.norm(matrix, axis=1)) + 1e-9
+        )
+
+        k = min(top_k, len(records))
+        output = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind="stable")]
+            output.append([
+                {**records[i], "score": float(row[i])}
+                for i in top
+            ])
+        return output
+
+    def _candidate_rows(self, records, candidates):
+        """
+        Snapshot row numbers of the (type, record_id) pairs in `candidates`.
+        The pair -> row map is rebuilt only when the snapshot changes.
+        """
+        if self._row_lookup is None or self._row_lookup[0] is not records:
+            self._row_lookup = (
+                records,
+                {(r["type"], r["record_id"]): i for i, r in enumerate(records)},
+            )
+        lookup = self._row_lookup[1]
+        return np.array(sorted(lookup[c] for c in candidates if c in lookup), dtype=np.int64)
+
+    # SHARDED SEARCH (scatter-gather across worker processes)
+
+    def _shard_pool(self):
+        """
+        Long-lived shard pool holding a snapshot of this store.
+
+        The snapshot is reloaded after a write through this instance or
+        once it is older than VECTOR_SNAPSHOT_MAX_AGE seconds.
+        """
+        state = self._shards
+        with self._shards_lock:
+            if state["pool"] is None:
+                state["pool"] = ShardPool(settings.VECTOR_SEARCH_SHARDS)
+                atexit.register(state["pool"].close)
+
+            age = time.monotonic() - state["loaded_at"]
+            if state["version"] != self.version or age > settings.VECTOR_SNAPSHOT_MAX_AGE:
+                version = self.version
+                records, matrix = self.load_vectors()
+                state["pool"].load(normalize_rows(matrix) if len(records) else matrix)
+                state.update(records=records, version=version, loaded_at=time.monotonic())
+
+            return state["pool"], state["records"]
+
+    def _sharded_search_many(self, queries, top_k: int) -> list:
+        pool, records = self._shard_pool()
+        return [
+            [{**records[i], "score": score} for score, i in zip(scores, rows)]
+            for scores, rows in pool.search_many(queries, top_k)
+        ]
+
+    def reset_shards(self):
+        """
+        Stop the shard workers; the next sharded search starts a fresh pool.
+        """
+        with self._shards_lock:
+            if self._shards["pool"] is not None:
+                self._shards["pool"].close()
+            self._shards.update(pool=None, records=[], version=None, loaded_at=0.0)
+
+    def close(self):
+        self.reset_shards()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Process-wide vector store configured by settings.VECTOR_STORE.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.VECTOR_STORE
+                backend = import_string(config["BACKEND"])
+                _store = backend(dict(config.get("OPTIONS", {})))
+    return _store
+
+
+def reset_vector_store():
+    """
+    Close the current store; the next `get_vector_store()` rebuilds it.
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+
+
+@receiver(setting_changed)
+def _vector_store_setting_changed(sender, setting, **kwargs):
+    if setting == "VECTOR_STORE":
+        reset_vector_store()
@@ -1,16 +1,89 @@
 # core/views.py
 
+from datetime import datetime, timedelta
+
 from django.http import JsonResponse
-from rest_framework import viewsets
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Donor, Hospital, Request
+from .allocation import allocate_pending
+from .eligibility import get_eligibility_index
+from .geo import get_geo_index
+from .matching import compatible_donor_groups, get_match_index
+from .models import (
+    BloodDemandAggregate,
+    Donor,
+    DonorSupplyAggregate,
+    Hospital,
+    Request,
+)
 from .serializers import (
+    DonationSerializer,
     DonorSerializer,
     HospitalSerializer,
     RequestSerializer,
 )
 
 
+def bounded_param(params, name, default, cast=int, maximum=None):
+    """
+    Positive numeric query parameter, capped at `maximum`.
+    Raises ValueError with a client-facing message.
+    """
+    try:
+        value = cast(params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if value <= 0:
+        raise ValueError(f"{name} must be positive")
+    return min(value, maximum) if maximum is not None else value
+
+
+def eligible_at(params):
+    """
+    Instant eligibility is checked at: the end of ?date= (YYYY-MM-DD),
+    i.e. donors who can give at some point that day, else now.
+    Raises ValueError with a client-facing message.
+    """
+    value = params.get("date")
+    if not value:
+        return timezone.now()
+    try:
+        day = timezone.make_aware(datetime.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        raise ValueError("date must be YYYY-MM-DD")
+    return day + timedelta(days=1)
+
+
+def deferred_donors(params):
+    """
+    Donors to leave out of match results: those still deferred, unless
+    ?include_deferred=1.
+    """
+    if params.get("include_deferred") in ("1", "true"):
+        return None
+    return get_eligibility_index().deferred()
+
+
+def donors_by_distance(hits):
+    """
+    Serialized donors for [(distance_km, donor_id)] hits, order kept.
+    """
+    donors = Donor.objects.in_bulk([donor_id for _, donor_id in hits])
+    results = []
+    for distance, donor_id in hits:
+        donor = donors.get(donor_id)
+        if donor is None:
+            continue
+        row = DonorSerializer(donor).data
+        row["distance_km"] = round(distance, 3)
+        results.append(row)
+    return results
+
+
 class DonorViewSet(viewsets.ModelViewSet):
     """
     CRUD API for Donors
@@ -18,6 +91,77 @@ class DonorViewSet(viewsets.ModelViewSet):
     queryset = Donor.objects.all()
     serializer_class = DonorSerializer
 
+    # Upper bound for ?limit= on eligible donors
+    MAX_ELIGIBLE_LIMIT = 500
+
+    @action(detail=False, methods=["get"], url_path="eligible")
+    def eligible(self, request):
+        """
+        Donors out of their deferral period, longest-rested first.
+
+        ?blood_group= and ?city= narrow the list, ?compatible_with= keeps
+        donors a recipient group can receive, ?date= checks a future day.
+        Served from the eligibility index; the donor table is only read
+        for the returned page.
+        """
+        try:
+            when = eligible_at(request.query_params)
+            limit = bounded_param(request.query_params, "limit", 50, int, self.MAX_ELIGIBLE_LIMIT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = None
+        if request.query_params.get("blood_group"):
+            groups = {request.query_params["blood_group"]}
+        if request.query_params.get("compatible_with"):
+            compatible = set(compatible_donor_groups(request.query_params["compatible_with"]))
+            groups = compatible if groups is None else groups & compatible
+        city = request.query_params.get("city")
+
+        index = get_eligibility_index()
+        donor_ids = index.eligible(groups, city, when=when, limit=limit)
+        donors = Donor.objects.in_bulk(donor_ids)
+        return Response(
+            {
+                "as_of": when,
+                "blood_groups": sorted(groups) if groups is not None else None,
+                "city": city,
+                **index.count(groups, city, when=when),
+                "results": [
+                    DonorSerializer(donors[donor_id]).data
+                    for donor_id in donor_ids if donor_id in donors
+                ],
+            }
+        )
+
+    @action(detail=True, methods=["get", "post"], url_path="donations")
+    def donations(self, request, pk=None):
+        """
+        GET: the donor's donation history, newest first.
+        POST: record a donation ({kind, donated_at, units}); the response
+        carries the donor's new next_eligible_at.
+        """
+        donor = self.get_object()
+        if request.method == "POST":
+            serializer = DonationSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(donor=donor)
+            donor.refresh_from_db(fields=["last_donation_at", "next_eligible_at"])
+            return Response(
+                {**serializer.data, "next_eligible_at": donor.next_eligible_at},
+                status=status.HTTP_201_CREATED,
+            )
+
+        return Response(
+            {
+                "donor_id": donor.id,
+                "last_donation_at": donor.last_donation_at,
+                "next_eligible_at": donor.next_eligible_at,
+                "eligible": donor.is_eligible(),
+                "results": DonationSerializer(donor.donations.all(), many=True).data,
+            }
+        )
+
 
 class HospitalViewSet(viewsets.ModelViewSet):
     """
@@ -26,6 +170,50 @@ class HospitalViewSet(viewsets.ModelViewSet):
     queryset = Hospital.objects.all()
     serializer_class = HospitalSerializer
 
+    # Upper bounds for ?radius_km= and ?limit= on nearby donors
+    MAX_RADIUS_KM = 500
+    MAX_NEARBY_LIMIT = 500
+
+    @action(detail=True, methods=["get"], url_path="nearby-donors")
+    def nearby_donors(self, request, pk=None):
+        """
+        Donors within ?radius_km= (default 10) of this hospital, nearest first.
+
+        ?blood_group= keeps only donors compatible with that recipient group.
+        Donors in a deferral period are left out unless ?include_deferred=1.
+        Served from the in-memory geo index; the donor table is only read
+        for the returned page.
+        """
+        hospital = self.get_object()
+        if hospital.latitude is None or hospital.longitude is None:
+            return Response(
+                {"error": "Hospital has no coordinates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            radius = bounded_param(request.query_params, "radius_km", 10, float, self.MAX_RADIUS_KM)
+            limit = bounded_param(request.query_params, "limit", 50, int, self.MAX_NEARBY_LIMIT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        recipient = request.query_params.get("blood_group")
+        tags = set(compatible_donor_groups(recipient)) if recipient else None
+
+        hits = get_geo_index().within(
+            "donor", hospital.latitude, hospital.longitude, radius, tags=tags,
+            exclude=deferred_donors(request.query_params),
+        )
+        return Response(
+            {
+                "hospital_id": hospital.id,
+                "radius_km": radius,
+                "compatible_groups": sorted(tags) if tags is not None else None,
+                "total": len(hits),
+                "results": donors_by_distance(hits[:limit]),
+            }
+        )
+
 
 class RequestViewSet(viewsets.ModelViewSet):
     """
@@ -34,6 +222,179 @@ class RequestViewSet(viewsets.ModelViewSet):
     queryset = Request.objects.all()
     serializer_class = RequestSerializer
 
+    # Upper bound for ?limit= on donor matching and ?k= on nearest donors
+    MAX_MATCH_LIMIT = 500
+
+    # Upper bound for ?limit= on the allocation plan
+    MAX_ALLOCATION_LIMIT = 10000
+
+    @action(detail=True, methods=["get"], url_path="matches")
+    def matches(self, request, pk=None):
+        """
+        Donors whose blood is ABO/Rh compatible with this request.
+
+        Ranked by same city as the requesting hospital, then exact
+        blood group before substitutes (universal O- donors last).
+        Donors in a deferral period are skipped unless ?include_deferred=1.
+        """
+        blood_request = self.get_object()
+
+        try:
+            limit = bounded_param(request.query_params, "limit", 50, int, self.MAX_MATCH_LIMIT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        location = blood_request.hospital.location
+        match = get_match_index().match(
+            blood_request.blood_group, location, limit=limit,
+            exclude=deferred_donors(request.query_params),
+        )
+
+        donors = Donor.objects.in_bulk([donor_id for donor_id, _, _ in match["ranked"]])
+        results = []
+        for donor_id, same_city, blood_group in match["ranked"]:
+            donor = donors.get(donor_id)
+            if donor is None:
+                continue
+            row = DonorSerializer(donor).data
+            row["same_city"] = same_city
+            row["exact_match"] = blood_group == blood_request.blood_group
+            results.append(row)
+
+        return Response(
+            {
+                "request_id": blood_request.id,
+                "blood_group": blood_request.blood_group,
+                "hospital_location": location,
+                "compatible_groups": match["groups"],
+                "total_compatible": match["total"],
+                "results": results,
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="allocate")
+    def allocate(self, request):
+        """
+        Allocation plan for every pending request at once.
+
+        Eligible donors (at ?date=, default now) are assigned to the
+        whole queue by min-cost max-flow: as many units as possible,
+        exact blood groups and same-city donors preferred, universal
+        donors conserved (core/allocation.py). Nothing is saved.
+        ?cross_city=0 keeps donors in their own city; ?limit= bounds
+        the per-request plan listed (oldest requests first).
+        """
+        try:
+            when = eligible_at(request.query_params)
+            limit = bounded_param(request.query_params, "limit", 100, int, self.MAX_ALLOCATION_LIMIT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cross_city = request.query_params.get("cross_city", "1") != "0"
+
+        allocation = allocate_pending(when, cross_city=cross_city)
+        plan = allocation.by_request()
+        results = [
+            {
+                "request_id": request_id,
+                "units_requested": int(requested),
+                "units_allocated": int(allocated),
+                "donors": plan.get(request_id, []),
+            }
+            for request_id, requested, allocated in zip(
+                allocation.request_ids[:limit].tolist(),
+                allocation.requested[:limit],
+                allocation.allocated[:limit],
+            )
+        ]
+        return Response({"eligible_at": when, **allocation.summary(), "results": results})
+
+    @action(detail=True, methods=["get"], url_path="nearest-donors")
+    def nearest_donors(self, request, pk=None):
+        """
+        The ?k= (default 10) nearest donors compatible with this request,
+        measured from the requesting hospital. ?radius_km= caps the search.
+        Donors in a deferral period are skipped unless ?include_deferred=1.
+        """
+        blood_request = self.get_object()
+        hospital = blood_request.hospital
+        if hospital.latitude is None or hospital.longitude is None:
+            return Response(
+                {"error": "Requesting hospital has no coordinates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            k = bounded_param(request.query_params, "k", 10, int, self.MAX_MATCH_LIMIT)
+            radius = None
+            if "radius_km" in request.query_params:
+                radius = bounded_param(request.query_params, "radius_km", None, float)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = compatible_donor_groups(blood_request.blood_group)
+        hits = get_geo_index().nearest(
+            "donor", hospital.latitude, hospital.longitude, k,
+            tags=set(groups), max_radius_km=radius,
+            exclude=deferred_donors(request.query_params),
+        )
+        return Response(
+            {
+                "request_id": blood_request.id,
+                "blood_group": blood_request.blood_group,
+                "compatible_groups": groups,
+                "results": donors_by_distance(hits),
+            }
+        )
+
+
+class SummaryView(APIView):
+    """
+    Read-only dashboard summary served from the aggregate tables.
+
+    - demand: pending requests and units per hospital and blood group
+    - supply: registered donors per city and blood group
+
+    Exactly two queries regardless of table size.
+    """
+
+    def get(self, request):
+        demand = (
+            BloodDemandAggregate.objects
+            .filter(pending_requests__gt=0)
+            .order_by("hospital__name", "blood_group")
+            .values(
+                "hospital_id",
+                "hospital__name",
+                "hospital__location",
+                "blood_group",
+                "pending_requests",
+                "pending_units",
+            )
+        )
+        supply = (
+            DonorSupplyAggregate.objects
+            .filter(donor_count__gt=0)
+            .order_by("city", "blood_group")
+            .values("city", "blood_group", "donor_count")
+        )
+
+        return Response(
+            {
+                "demand": [
+                    {
+                        "hospital_id": row["hospital_id"],
+                        "hospital": row["hospital__name"],
+                        "location": row["hospital__location"],
+                        "blood_group": row["blood_group"],
+                        "pending_requests": row["pending_requests"],
+                        "pending_units": row["pending_units"],
+                    }
+                    for row in demand
+                ],
+                "supply": list(supply),
+            }
+        )
+
 
 def health(request):
     """
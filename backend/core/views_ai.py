@@ -1,11 +1,27 @@
 # core/views_ai.py
 
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from core.models import Donor, Hospital
-from core.utils import generate_embedding, vector_search, llm_summarize
+from core.admission import Overloaded, admitted, get_admission_controller
+from core.data_version import get_data_version_watcher
+from core.query_aggregates import aggregate_summary, extract_aggregate_intent, run_aggregate
+from core.query_cache import get_query_cache
+from core.query_log import StageTimer, describe_plan, log_query, should_log
+from core.result_cursor import make_cursor, open_cursor, parse_fields, project, read_cursor
+from core.suggest import KINDS as SUGGEST_KINDS, get_suggest_index
+from core.vectorstore import get_vector_store
+from core.views import bounded_param
+from core.utils import (
+    extract_structured_filters,
+    generate_embedding,
+    generate_embeddings,
+    llm_summarize,
+    vector_search,
+    vector_search_many,
+)
 
 
 class AISearchView(APIView):
@@ -14,10 +30,17 @@ class AISearchView(APIView):
 
     - Accepts natural language query
     - Blocks out-of-domain queries
+    - Answers count / sum / group-by questions with SQL aggregates
     - Applies semantic retrieval + metadata constraints
     - Returns deterministic summary
+    - Optional paging (`page_size`, then `cursor`) over a server-side
+      ranking, and `fields` to return only some metadata fields
+    - Admission control: bounded concurrency, short queue, per-search
+      deadline; 503 / 429 with Retry-After when saturated
     """
 
+    TOP_K = 10
+
     # Hard safety controls
     MIN_RELEVANCE_SCORE = 0.30
     DOMAIN_KEYWORDS = {
@@ -31,8 +54,134 @@ class AISearchView(APIView):
         "units"
     }
 
+    @classmethod
+    def is_in_domain(cls, query: str) -> bool:
+        q_lower = query.lower()
+        return any(keyword in q_lower for keyword in cls.DOMAIN_KEYWORDS)
+
+    @staticmethod
+    def out_of_domain_payload(query: str) -> dict:
+        return {
+            "query": query,
+            "results": [],
+            "ai_summary": (
+                "This system only supports blood bank–related queries "
+                "about donors, hospitals, and blood requests."
+            ),
+        }
+
+    @classmethod
+    def search(cls, query: str, with_plan: bool = False, top_k: int | None = None, ticket=None):
+        """
+        Run the search pipeline for one in-domain query.
+
+        Returns (payload, plan, raw results, stage timings in ms); plan
+        is only built when `with_plan` is set (query logging / replay).
+        An admission `ticket` has its deadline checked before every
+        stage (parse, embed, scan, filter, summarize).
+        """
+        timer = StageTimer()
+
+        def check(stage):
+            if ticket is not None:
+                ticket.check(stage)
+
+        # COUNT / SUM / GROUP-BY INTENT (SQL aggregate, no vector scan)
+        check("parse")
+        with timer.stage("filters"):
+            intent = extract_aggregate_intent(query)
+        if intent is not None:
+            with timer.stage("aggregate"):
+                payload = cls.aggregate_payload(query, intent)
+            plan = {"aggregate": intent} if with_plan else None
+            return payload, plan, [], timer.finish()
+
+        # EMBEDDING
+        check("embed")
+        with timer.stage("embed"):
+            embedding = generate_embedding(query)
+
+        # STRUCTURED FILTERS (blood group, city / location)
+        with timer.stage("filters"):
+            filters = extract_structured_filters(query)
+
+        # VECTOR SEARCH
+        check("scan")
+        with timer.stage("search"):
+            results = vector_search(
+                embedding=embedding,
+                top_k=top_k or cls.TOP_K,
+                filters=filters,
+                strict=True,
+                query=query,
+                ticket=ticket,
+            )
+
+        # RELEVANCE THRESHOLD GUARD + AI SUMMARY (deterministic)
+        check("summarize")
+        with timer.stage("summary"):
+            payload = cls.results_payload(query, results)
+
+        timings = timer.finish()
+        plan = describe_plan(query, filters) if with_plan else None
+        return payload, plan, results, timings
+
+    @staticmethod
+    def overloaded_response(error: Overloaded) -> Response:
+        return Response(
+            {
+                "error": "AI search is overloaded; retry later",
+                "reason": error.reason,
+                "retry_after": error.retry_after,
+            },
+            status=error.status,
+            headers={"Retry-After": str(error.retry_after)},
+        )
+
+    @staticmethod
+    def aggregate_payload(query: str, intent: dict) -> dict:
+        answer = run_aggregate(intent)
+        return {
+            "query": query,
+            "results": [],
+            "aggregate": {**intent, **answer},
+            "ai_summary": aggregate_summary(intent, answer),
+        }
+
+    @classmethod
+    def results_payload(cls, query: str, results: list) -> dict:
+        """
+        Apply the relevance threshold guard and build the response body.
+        """
+        if not results or results[0].get("score", 0) < cls.MIN_RELEVANCE_SCORE:
+            return {
+                "query": query,
+                "results": [],
+                "ai_summary": "No relevant results found for this query.",
+            }
+
+        return {
+            "query": query,
+            "results": results,
+            "ai_summary": llm_summarize(query, results),
+        }
+
     def post(self, request):
-        query = request.data.get("query", "").strip()
+        query = str(request.data.get("query") or "").strip()
+        cursor = request.data.get("cursor")
+        paged = cursor is not None or request.data.get("page_size") is not None
+
+        try:
+            fields = parse_fields(request.data.get("fields"))
+            page_size = bounded_param(
+                request.data, "page_size", self.TOP_K,
+                maximum=settings.AI_SEARCH_CURSOR["MAX_PAGE_SIZE"],
+            )
+            if cursor is not None:
+                # NEXT PAGE: a slice of the saved ranking, no search
+                return Response(self.cursor_page(cursor, page_size, fields), status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         if not query:
             return Response(
@@ -41,78 +190,235 @@ class AISearchView(APIView):
             )
 
         # DOMAIN INTENT GUARD
-        q_lower = query.lower()
-        if not any(keyword in q_lower for keyword in self.DOMAIN_KEYWORDS):
+        if not self.is_in_domain(query):
             return Response(
-                {
-                    "query": query,
-                    "results": [],
-                    "ai_summary": (
-                        "This system only supports blood bank–related queries "
-                        "about donors, hospitals, and blood requests."
-                    ),
-                },
+                self.out_of_domain_payload(query),
                 status=status.HTTP_200_OK,
             )
 
         try:
-            # EMBEDDING
-            embedding = generate_embedding(query)
+            # A paged search ranks everything up to MAX_RESULTS once
+            top_k = settings.AI_SEARCH_CURSOR["MAX_RESULTS"] if paged else self.TOP_K
+            sampled = should_log()
+            with admitted(request) as ticket:
+                payload, plan, results, timings = self.search(
+                    query, with_plan=sampled, top_k=top_k, ticket=ticket
+                )
+            if sampled:
+                log_query(query, top_k, plan, results, timings)
 
-            # STRUCTURED FILTERS (lightweight)
-            filters = {}
+            if paged and "aggregate" not in payload:
+                payload = self.first_page(payload, page_size)
+            payload["results"] = project(payload["results"], fields)
+            return Response(payload, status=status.HTTP_200_OK)
 
-            # Blood group
-            blood_groups = {"A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"}
-            for bg in blood_groups:
-                if bg.lower() in q_lower:
-                    filters["blood_group"] = bg
-                    break
+        except Overloaded as e:
+            return self.overloaded_response(e)
 
-            # City / Location
-            donor_cities = Donor.objects.values_list("city", flat=True).distinct()
-            hospital_locations = Hospital.objects.values_list("location", flat=True).distinct()
-            all_places = set(donor_cities) | set(hospital_locations)
+        except Exception as e:
+            return Response(
+                {"error": f"AI search failed: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-            for place in all_places:
-                if place and place.lower() in q_lower:
-                    filters["city"] = place
-                    break
+    @staticmethod
+    def first_page(payload: dict, page_size: int) -> dict:
+        """
+        First page of a ranking; the rest is kept under a cursor.
+        """
+        results = payload["results"]
+        next_cursor = None
+        if len(results) > page_size:
+            token = open_cursor(payload["query"], results, payload["ai_summary"])
+            next_cursor = make_cursor(token, page_size, len(results))
+        return {
+            **payload,
+            "results": results[:page_size],
+            "total": len(results),
+            "next_cursor": next_cursor,
+        }
 
-            # VECTOR SEARCH
-            results = vector_search(
-                embedding=embedding,
-                top_k=10,
-                filters=filters,
-                strict=True,
-                query=query,
-            )
+    @staticmethod
+    def cursor_page(cursor, page_size: int, fields) -> dict:
+        token, saved, offset = read_cursor(cursor)
+        results = saved["results"]
+        end = offset + page_size
+        return {
+            "query": saved["query"],
+            "results": project(results[offset:end], fields),
+            "ai_summary": saved["ai_summary"],
+            "total": len(results),
+            "next_cursor": make_cursor(token, end, len(results)),
+        }
 
-            # RELEVANCE THRESHOLD GUARD
-            if not results or results[0].get("score", 0) < self.MIN_RELEVANCE_SCORE:
-                return Response(
-                    {
-                        "query": query,
-                        "results": [],
-                        "ai_summary": "No relevant results found for this query.",
-                    },
-                    status=status.HTTP_200_OK,
-                )
 
-            # AI SUMMARY (deterministic)
-            ai_summary = llm_summarize(query, results)
+class AIBatchSearchView(APIView):
+    """
+    Batch AI Semantic Search endpoint
+
+    - Accepts a list of natural language queries
+    - Answers count / sum / group-by questions with SQL aggregates
+    - Embeds every other in-domain query in one batched forward pass
+    - Scores all of them with a single matrix-matrix product
+    - Applies each query's own filters and relevance guard
+    - Returns per-query results in input order
+    - Takes one admission slot for the whole batch (see AISearchView)
+    """
+
+    MAX_QUERIES = 100
 
+    def post(self, request):
+        queries = request.data.get("queries")
+
+        if not isinstance(queries, list) or not queries:
             return Response(
-                {
-                    "query": query,
-                    "results": results,
-                    "ai_summary": ai_summary,
-                },
-                status=status.HTTP_200_OK,
+                {"error": "queries must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(queries) > self.MAX_QUERIES:
+            return Response(
+                {"error": f"At most {self.MAX_QUERIES} queries per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
+        queries = [str(q or "").strip() for q in queries]
+        responses = [None] * len(queries)
+
+        # Guards that need no embedding are answered up front
+        pending = []
+        for i, query in enumerate(queries):
+            if not query:
+                responses[i] = {"query": query, "error": "Query is required"}
+            elif not AISearchView.is_in_domain(query):
+                responses[i] = AISearchView.out_of_domain_payload(query)
+            else:
+                pending.append(i)
+
+        try:
+            with admitted(request) as ticket:
+                self.search(queries, pending, responses, ticket)
+            return Response({"results": responses}, status=status.HTTP_200_OK)
+
+        except Overloaded as e:
+            return AISearchView.overloaded_response(e)
+
         except Exception as e:
             return Response(
-                {"error": f"AI search failed: {str(e)}"},
+                {"error": f"AI batch search failed: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+    @staticmethod
+    def search(queries: list, pending: list, responses: list, ticket=None):
+        """
+        Fill `responses` for the in-domain queries at `pending` positions.
+        """
+        def check(stage):
+            if ticket is not None:
+                ticket.check(stage)
+
+        # Count / sum / group-by questions never reach the vector scan
+        check("parse")
+        searched = []
+        for i in pending:
+            intent = extract_aggregate_intent(queries[i])
+            if intent is None:
+                searched.append(i)
+            else:
+                responses[i] = AISearchView.aggregate_payload(queries[i], intent)
+        pending = searched
+
+        if pending:
+            texts = [queries[i] for i in pending]
+
+            # EMBEDDING (one batched forward pass)
+            check("embed")
+            embeddings = generate_embeddings(texts)
+
+            # STRUCTURED FILTERS + VECTOR SEARCH (one scan)
+            check("scan")
+            filters_list = [extract_structured_filters(q) for q in texts]
+            batch_results = vector_search_many(
+                embeddings=embeddings,
+                queries=texts,
+                filters_list=filters_list,
+                top_k=10,
+                strict=True,
+            )
+
+            check("summarize")
+            for i, results in zip(pending, batch_results):
+                responses[i] = AISearchView.results_payload(queries[i], results)
+
+
+class AISuggestView(APIView):
+    """
+    Autocomplete for the search box
+
+    - GET ?q=<prefix>: donor, patient and hospital names, cities and
+      blood groups completing the prefix (any word of the label)
+    - `limit` (default 8, at most 20), `type` to restrict the kinds
+      (comma-separated, e.g. type=donor,city)
+    - Served from the in-memory suggest index: no SQL, vector store or
+      embedding model on the request path
+    """
+
+    def get(self, request):
+        prefix = request.query_params.get("q", "")
+        try:
+            limit = bounded_param(request.query_params, "limit", 8, maximum=20)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = None
+        if request.query_params.get("type"):
+            kinds = {kind.strip() for kind in request.query_params["type"].split(",") if kind.strip()}
+            unknown = kinds - set(SUGGEST_KINDS)
+            if unknown:
+                return Response(
+                    {"error": f"Unknown type: {', '.join(sorted(unknown))}", "types": list(SUGGEST_KINDS)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        return Response(
+            {"query": prefix, "results": get_suggest_index().suggest(prefix, limit, kinds)},
+            status=status.HTTP_200_OK,
+        )
+
+
+class AIStatsView(APIView):
+    """
+    Runtime statistics for the AI search layer
+
+    - Semantic query cache size, hit rate, evictions and invalidations
+    - Vector store backend and the PCA projection its vectors use
+    - Admission control: active / waiting searches, rejected and
+      expired counts (this process)
+    - Data version: the last change this worker applied, delta and
+      full-rebuild counts
+    """
+
+    def get(self, request):
+        cache = get_query_cache()
+        store = get_vector_store()
+        projection = store.projection
+        admission = get_admission_controller()
+        watcher = get_data_version_watcher()
+        return Response(
+            {
+                "semantic_cache": cache.stats() if cache is not None else {"enabled": False},
+                "admission": admission.stats() if admission is not None else {"enabled": False},
+                "data_version": (
+                    {"applied": watcher.cursor, "pending_gaps": len(watcher.gaps), **watcher.stats}
+                    if watcher is not None else {"enabled": False}
+                ),
+                "vector_store": {
+                    "backend": type(store).__name__,
+                    "projection": {
+                        "version": projection.version,
+                        "dims": projection.dims,
+                        "input_dims": projection.input_dims,
+                        "explained_variance": projection.explained_variance,
+                    } if projection is not None else None,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,237 @@
+# core/views_export.py
+"""
+Streaming export endpoints for donors, hospitals and requests.
+
+GET /api/export/<entity>/?format=csv|ndjson
+
+Filters:
+- `q`: natural language, parsed with the same helpers as AI search
+  (blood group, city / location, age, capacity, request status,
+  creation time window such as "last 7 days")
+- Explicit parameters override anything parsed from `q`:
+  `blood_group`, `city` (comma-separated for several), `status`,
+  `age`, `age_gt`, `age_lt`, `capacity`, `capacity_gt`, `capacity_lt`
+
+Rows are read with `.values_list().iterator()` and written through
+`StreamingHttpResponse`, so memory stays constant regardless of how
+many records match.
+"""
+
+import csv
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from core.models import Donor, Hospital, Request
+from core.utils import (
+    extract_age_filter,
+    extract_blood_group,
+    extract_capacity_filter,
+    extract_city,
+    extract_status_filter,
+    extract_time_window,
+)
+
+# Rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+
+# Per-entity export definition:
+# - model:    source model
+# - columns:  (output column, ORM lookup) pairs
+# - city/age: ORM field the generic filter maps onto (None = unsupported)
+EXPORTS = {
+    "donors": {
+        "model": Donor,
+        "columns": [
+            ("id", "id"),
+            ("name", "name"),
+            ("age", "age"),
+            ("blood_group", "blood_group"),
+            ("contact", "contact"),
+            ("city", "city"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ],
+        "city": "city",
+        "age": "age",
+        "capacity": None,
+        "status": None,
+        "blood_group": "blood_group",
+        "created": "created_at",
+    },
+    "hospitals": {
+        "model": Hospital,
+        "columns": [
+            ("id", "id"),
+            ("name", "name"),
+            ("location", "location"),
+            ("contact", "contact"),
+            ("capacity", "capacity"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ],
+        "city": "location",
+        "age": None,
+        "capacity": "capacity",
+        "status": None,
+        "blood_group": None,
+        "created": "created_at",
+    },
+    "requests": {
+        "model": Request,
+        "columns": [
+            ("id", "id"),
+            ("patient_name", "patient_name"),
+            ("patient_age", "patient_age"),
+            ("blood_group", "blood_group"),
+            ("hospital", "hospital__name"),
+            ("hospital_location", "hospital__location"),
+            ("units_requested", "units_requested"),
+            ("status", "status"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ],
+        "city": "hospital__location",
+        "age": "patient_age",
+        "capacity": None,
+        "status": "status",
+        "blood_group": "blood_group",
+        "created": "created_at",
+    },
+}
+
+LOOKUP_SUFFIX = {"gt": "__gt", "lt": "__lt", "eq": ""}
+
+
+def _numeric_param(params, name: str):
+    """
+    Read `name`, `name_gt` or `name_lt` as a ("eq"|"gt"|"lt", int) filter.
+    """
+    for mode, key in (("eq", name), ("gt", f"{name}_gt"), ("lt", f"{name}_lt")):
+        raw = params.get(key)
+        if raw not in (None, ""):
+            return (mode, int(raw))
+    return None
+
+
+def parse_export_filters(params) -> dict:
+    """
+    Combine filters parsed from `q` with explicit query parameters.
+
+    Raises ValueError on malformed numeric parameters.
+    """
+    query = params.get("q", "").strip()
+
+    parsed = {
+        "blood_group": extract_blood_group(query) if query else None,
+        "city": None,
+        "age": extract_age_filter(query) if query else None,
+        "capacity": extract_capacity_filter(query) if query else None,
+        "status": extract_status_filter(query) if query else None,
+        "created": extract_time_window(query) if query else None,
+    }
+
+    # A place named in `q` may itself contain commas ("Sector 5, Udaipur");
+    # only the explicit parameter is a comma-separated list
+    if params.get("city"):
+        parsed["city"] = [p.strip() for p in params["city"].split(",") if p.strip()] or None
+    elif query:
+        city = extract_city(query)
+        parsed["city"] = [city] if city else None
+
+    if params.get("blood_group"):
+        parsed["blood_group"] = params["blood_group"].upper()
+    if params.get("status"):
+        parsed["status"] = params["status"].lower()
+
+    parsed["age"] = _numeric_param(params, "age") or parsed["age"]
+    parsed["capacity"] = _numeric_param(params, "capacity") or parsed["capacity"]
+
+    return {k: v for k, v in parsed.items() if v is not None}
+
+
+def build_export_queryset(entity: str, filters: dict):
+    """
+    Filtered `values_list` queryset for an export definition.
+    """
+    spec = EXPORTS[entity]
+    qs = spec["model"].objects.all()
+
+    for key, value in filters.items():
+        field = spec.get(key)
+        if not field:
+            # Filter does not apply to this entity (e.g. capacity on donors)
+            continue
+
+        if key == "city":
+            qs = qs.filter(**{f"{field}__in": value})
+        elif key == "created":
+            start, end = value
+            if start:
+                qs = qs.filter(**{f"{field}__gte": start})
+            if end:
+                qs = qs.filter(**{f"{field}__lt": end})
+        elif key in ("age", "capacity"):
+            mode, number = value
+            qs = qs.filter(**{f"{field}{LOOKUP_SUFFIX[mode]}": number})
+        else:
+            qs = qs.filter(**{field: value})
+
+    lookups = [lookup for _, lookup in spec["columns"]]
+    return qs.order_by("id").values_list(*lookups)
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _stream_csv(header: list, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _stream_ndjson(header: list, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + "\n"
+
+
+@require_GET
+def export_records(request, entity: str):
+    """
+    Stream every record of `entity` that matches the filters.
+    """
+    if entity not in EXPORTS:
+        return JsonResponse({"error": f"Unknown export: {entity}"}, status=404)
+
+    fmt = request.GET.get("format", "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return JsonResponse({"error": "format must be 'csv' or 'ndjson'"}, status=400)
+
+    try:
+        filters = parse_export_filters(request.GET)
+    except ValueError:
+        return JsonResponse({"error": "Numeric filters must be integers"}, status=400)
+
+    header = [column for column, _ in EXPORTS[entity]["columns"]]
+    rows = build_export_queryset(entity, filters).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if fmt == "csv":
+        response = StreamingHttpResponse(_stream_csv(header, rows), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{entity}.csv"'
+    else:
+        response = StreamingHttpResponse(
+            _stream_ndjson(header, rows),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{entity}.ndjson"'
+
+    return response
@@ -1,6 +1,12 @@
 "use client";
 
-import { useState } from "react";
+import { useEffect, useState } from "react";
+
+type Suggestion = {
+  text: string;
+  type: "donor" | "patient" | "hospital" | "city" | "blood_group";
+  count: number;
+};
 
 type SearchResult = {
   type: "donor" | "hospital" | "request";
@@ -13,6 +19,37 @@ export default function AISearchPage() {
   const [results, setResults] = useState<SearchResult[]>([]);
   const [summary, setSummary] = useState("");
   const [loading, setLoading] = useState(false);
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+  // Completions for the word being typed come from the in-memory
+  // suggest index, so typing never triggers a full AI search
+  useEffect(() => {
+    const word = query.split(/\s+/).pop() || "";
+    if (word.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(
+          `/api/ai/suggest/?q=${encodeURIComponent(word)}&limit=8`,
+          { signal: controller.signal }
+        );
+        const data = await res.json();
+        setSuggestions(data.results || []);
+      } catch {
+        // Aborted by the next keystroke, or suggestions unavailable
+      }
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query]);
+
+  const completed = (text: string) =>
+    query.replace(/\S*$/, "") + text;
 
   const handleSearch = async () => {
     if (!query.trim()) return;
@@ -60,7 +97,15 @@ export default function AISearchPage() {
               onChange={(e) => setQuery(e.target.value)}
               placeholder="e.g. O+ donors in Udaipur"
               className="input flex-1"
+              list="ai-search-suggestions"
             />
+            <datalist id="ai-search-suggestions">
+              {suggestions.map((s) => (
+                <option key={`${s.type}:${s.text}`} value={completed(s.text)}>
+                  {s.type.replace("_", " ")}
+                </option>
+              ))}
+            </datalist>
             <button
               onClick={handleSearch}
               className="btn btn-primary whitespace-nowrap"